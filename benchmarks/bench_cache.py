@@ -0,0 +1,58 @@
+"""
+Parse a directory of IDL files sharing a guarded header, without the cache,
+with an empty cache (cold: parse and store) and with a filled one (warm: load).
+
+    python benchmarks/bench_cache.py [num_files]
+"""
+import os, shutil, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import parser
+
+
+def write_files(idl_dir, num_files):
+    with open(os.path.join(idl_dir, 'common.idl'), 'w') as f:
+        f.write('\n'.join(['#ifndef COMMON_IDL', '#define COMMON_IDL',
+                           'module bench { interface common { public: {',
+                           'struct Time { long @0 sec; long @1 nsec; };',
+                           'typedef sequence<double> Doubles;',
+                           '}; }; };', '#endif']))
+    for i in range(num_files):
+        lines = ['#include "common.idl"', 'module bench {', 'interface I%d {' % i, 'public: {']
+        for j in range(10):
+            lines.append('struct S%d { Time @0 t; Doubles @1 d; long @2 a; sequence<S%d> @3 s; };'
+                         % (j, max(j - 1, 0)))
+            lines.append('enum E%d { A, B, C };' % j)
+            lines.append('long m%d @0 (in S%d a, out Time b);' % (j, j))
+        lines += ['};', '};', '};']
+        with open(os.path.join(idl_dir, 'f%d.idl' % i), 'w') as f:
+            f.write('\n'.join(lines))
+
+
+def measure(idl_dir, cache_dir=None):
+    parser_ = parser.IDLParser(cache_dir=cache_dir)
+    start = time.time()
+    parser_.parse(idl_dirs=[idl_dir])
+    elapsed = time.time() - start
+    return elapsed, parser_.cache_stats
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    root = tempfile.mkdtemp()
+    try:
+        idl_dir = os.path.join(root, 'idls')
+        cache_dir = os.path.join(root, 'cache')
+        os.mkdir(idl_dir)
+        write_files(idl_dir, num_files)
+        sys.stdout.write('%-10s %10s %14s  %s\n' % ('run', 'total ms', 'ms / file', 'cache'))
+        for run, directory in [('no cache', None), ('cold', cache_dir), ('warm', cache_dir)]:
+            elapsed, stats = measure(idl_dir, directory)
+            sys.stdout.write('%-10s %10.2f %14.3f  %s\n' % (run, elapsed * 1000, elapsed * 1000 / (num_files + 1),
+                                                           stats if directory else ''))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
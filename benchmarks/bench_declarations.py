@@ -0,0 +1,45 @@
+"""
+Parse IDL with many declarations in a single scope: structs, unions, enums,
+consts, typedefs and methods in one interface section, and members, enum
+values and arguments in one declaration. Every declaration is checked for
+duplicates by name, so time per declaration should stay flat as their
+number grows.
+
+    python benchmarks/bench_declarations.py [max_declarations]
+"""
+import os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import parser
+
+
+def make_idl(n):
+    lines = ['module bench_module {', 'interface bench_interface {', 'public: {']
+    for i in range(n):
+        lines.append('struct S%d { long @0 a; };' % i)
+        lines.append('union U%d { long @0 a; };' % i)
+        lines.append('enum E%d { A%d, B%d };' % (i, i, i))
+        lines.append('const long C%d = %d;' % (i, i))
+        lines.append('typedef sequence<S%d> T%d;' % (i, i))
+        lines.append('long method%d @0 (in long a);' % i)
+    lines.append('struct Wide { %s };' % ' '.join(['long @%d m%d;' % (i, i) for i in range(n)]))
+    lines.append('enum Many { %s };' % ', '.join(['V%d' % i for i in range(n)]))
+    lines.append('long wide @0 (%s);' % ', '.join(['in long a%d' % i for i in range(n)]))
+    lines += ['};', '};', '};']
+    return '\n'.join(lines)
+
+
+def main():
+    max_declarations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    sys.stdout.write('%14s %10s %14s\n' % ('declarations', 'parse ms', 'us / decl'))
+    for n in [max_declarations // 4, max_declarations // 2, max_declarations]:
+        text = make_idl(n)
+        start = time.time()
+        parser.IDLParser().load(text)
+        parsed = time.time() - start
+        count = n * 9
+        sys.stdout.write('%14d %10.2f %14.1f\n' % (count, parsed * 1000, parsed * 1e6 / count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Generate the Python constructor of every struct of an IDL with nested
+structs, sequences, arrays and typedefs. The generator dispatches on the
+kind of every type it meets.
+
+    python benchmarks/bench_dispatch.py [num_structs]
+"""
+import os, sys, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import parser
+
+
+def make_idl(num_structs):
+    lines = ['module bench_module {', 'interface bench_interface {', 'public: {',
+             'struct S0 { long @0 a; };']
+    for i in range(1, num_structs):
+        lines.append('typedef double D%d[3];' % i)
+        lines.append('typedef S%d T%d;' % (i // 2, i))
+        lines.append('struct S%d { T%d @0 prev; D%d @1 d; sequence<long> @2 s; long @3 a; };' % (i, i, i))
+    lines += ['};', '};', '};']
+    return '\n'.join(lines)
+
+
+def main():
+    num_structs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    parser_ = parser.IDLParser()
+    m = parser_.load(make_idl(num_structs))
+    structs = [m.find_types('S%d' % i)[0] for i in range(num_structs)]
+
+    def generate():
+        return [parser_.generate_constructor_python(s) for s in structs]
+    if '--print' in sys.argv:
+        sys.stdout.write('\n'.join(generate()[:3]) + '\n')
+    number = 3
+    elapsed = min(timeit.repeat(generate, number=number, repeat=3)) / number
+    sys.stdout.write('%d structs : %8.2f ms\n' % (num_structs, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Resolve includes among many include directories, as _find_idl does.
+
+    python benchmarks/bench_find_idl.py [num_dirs] [num_files]
+"""
+import os, shutil, sys, tempfile, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import parser
+
+
+def legacy_find(dirs, filename):
+    basenames_ = []
+    idls_ = []
+    for idl_dir in dirs:
+        for f in os.listdir(idl_dir):
+            if f.endswith('.idl'):
+                path = os.path.join(idl_dir, f)
+                if not f in basenames_:
+                    idls_.append(path)
+                    basenames_.append(f)
+    for path in idls_:
+        if os.path.basename(path) == filename:
+            return path
+
+
+def main():
+    num_dirs = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    num_files = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    root = tempfile.mkdtemp()
+    try:
+        dirs = []
+        for i in range(num_dirs):
+            d = os.path.join(root, 'dir%d' % i)
+            os.mkdir(d)
+            for j in range(num_files):
+                open(os.path.join(d, 'f%d_%d.idl' % (i, j)), 'w').close()
+            dirs.append(d)
+        names = ['f%d_%d.idl' % (i % num_dirs, i % num_files) for i in range(1000)]
+        parser_ = parser.IDLParser(idl_dirs=dirs)
+        for n in names:
+            assert parser_._find_idl(n, lambda p: p) == legacy_find(dirs, n)
+
+        legacy = min(timeit.repeat(lambda: [legacy_find(dirs, n) for n in names], number=1, repeat=3))
+        indexed = min(timeit.repeat(lambda: [parser_._find_idl(n, lambda p: p) for n in names], number=1, repeat=3))
+    finally:
+        shutil.rmtree(root)
+    sys.stdout.write('%d includes, %d dirs of %d files\n' % (len(names), num_dirs, num_files))
+    sys.stdout.write('listdir per include : %8.2f ms\n' % (legacy * 1000))
+    sys.stdout.write('directory index     : %8.2f ms\n' % (indexed * 1000))
+
+
+if __name__ == '__main__':
+    main()
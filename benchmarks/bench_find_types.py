@@ -0,0 +1,45 @@
+"""
+Parse IDL where every struct refers to the previous one, and look every
+type up by short and fully-qualified name. Time per struct should stay
+flat as the number of structs grows.
+
+    python benchmarks/bench_find_types.py [max_structs]
+"""
+import os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import parser
+
+
+def make_idl(num_structs):
+    lines = ['module bench_module {', 'interface bench_interface {', 'public: {',
+             'struct S0 { long @0 a; };']
+    for i in range(1, num_structs):
+        lines.append('struct S%d { S%d @0 prev; double @1 b; };' % (i, i - 1))
+        lines.append('typedef sequence<S%d> S%dSeq;' % (i, i))
+    lines += ['};', '};', '};']
+    return '\n'.join(lines)
+
+
+def main():
+    max_structs = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    sys.stdout.write('%8s %10s %14s %14s\n' % ('structs', 'parse ms', 'us / struct', 'us / lookup'))
+    for n in [max_structs // 4, max_structs // 2, max_structs]:
+        text = make_idl(n)
+        parser_ = parser.IDLParser()
+        start = time.time()
+        m = parser_.load(text)
+        parsed = time.time() - start
+
+        names = ['S%d' % i for i in range(n)]
+        names = names + ['bench_module::bench_interface::public::' + name for name in names]
+        start = time.time()
+        for name in names:
+            assert len(m.find_types(name)) == 1
+        lookup = time.time() - start
+        sys.stdout.write('%8d %10.2f %14.1f %14.2f\n' % (n, parsed * 1000, parsed * 1e6 / n,
+                                                       lookup * 1e6 / len(names)))
+
+
+if __name__ == '__main__':
+    main()
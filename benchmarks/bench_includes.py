@@ -0,0 +1,60 @@
+"""
+Parse a file including many IDL headers and check that the time per
+include stays flat as the number of includes grows.
+
+    python benchmarks/bench_includes.py [max_includes]
+"""
+import os, shutil, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import parser
+
+
+def write_headers(idl_dir, num_includes, nested):
+    """ Write num_includes guarded headers and a main file including them,
+    either all from main.idl or as a chain where each header includes the next.
+    """
+    for i in range(num_includes):
+        lines = ['#ifndef H%d_IDL' % i, '#define H%d_IDL' % i]
+        if nested and i + 1 < num_includes:
+            lines.append('#include "h%d.idl"' % (i + 1))
+        lines += ['module bench {', 'interface h%d {' % i, 'public: {',
+                  'struct S%d { long @0 a; double @1 b; };' % i,
+                  '};', '};', '};', '#endif']
+        with open(os.path.join(idl_dir, 'h%d.idl' % i), 'w') as f:
+            f.write('\n'.join(lines))
+    if nested:
+        includes = ['#include "h0.idl"']
+    else:
+        includes = ['#include "h%d.idl"' % i for i in range(num_includes)]
+    with open(os.path.join(idl_dir, 'main.idl'), 'w') as f:
+        f.write('\n'.join(includes + ['module bench { };']))
+
+
+def measure(num_includes, nested, streaming=False):
+    idl_dir = tempfile.mkdtemp()
+    try:
+        write_headers(idl_dir, num_includes, nested)
+        parser_ = parser.IDLParser(idl_dirs=[idl_dir], streaming=streaming)
+        start = time.time()
+        parser_.parse_idl(os.path.join(idl_dir, 'main.idl'))
+        elapsed = time.time() - start
+        assert len(parser_.global_module.module_by_name('bench').interfaces) == num_includes
+    finally:
+        shutil.rmtree(idl_dir)
+    return elapsed
+
+
+def main():
+    max_includes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    sys.stdout.write('%-14s %8s %10s %14s\n' % ('layout', 'includes', 'total ms', 'us / include'))
+    for nested, counts in [(False, [max_includes // 4, max_includes // 2, max_includes]),
+                           (True, [25, 50, 100])]:
+        for n in counts:
+            elapsed = measure(n, nested)
+            sys.stdout.write('%-14s %8d %10.2f %14.1f\n' % ('nested chain' if nested else 'flat',
+                                                           n, elapsed * 1000, elapsed * 1e6 / n))
+
+
+if __name__ == '__main__':
+    main()
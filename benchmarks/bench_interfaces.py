@@ -0,0 +1,69 @@
+"""
+Parse IDL made of many interfaces, each with public, protected and private
+sections holding methods and type declarations, then look declarations up
+by name in every interface.
+
+    python benchmarks/bench_interfaces.py [num_interfaces]
+"""
+import os, sys, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import parser
+
+
+def make_idl(num_interfaces):
+    lines = ['module bench_module {']
+    for i in range(num_interfaces):
+        lines.append('interface I%d {' % i)
+        for section in ['public', 'protected', 'private']:
+            p = section[:3]
+            lines.append('%s: {' % section)
+            lines.append('struct %sS%d { long @0 a; double @1 b; };' % (p, i))
+            lines.append('union %sU%d { long @0 a; double @1 b; };' % (p, i))
+            lines.append('enum %sE%d { A, B, C };' % (p, i))
+            lines.append('const long %sC%d = %d;' % (p, i, i))
+            lines.append('typedef sequence<%sS%d> %sT%d;' % (p, i, p, i))
+            lines.append('long %sm%d @0 (in long a, out %sS%d b);' % (p, i, p, i))
+            lines.append('};')
+        lines.append('};')
+    lines.append('};')
+    return '\n'.join(lines)
+
+
+def main():
+    num_interfaces = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    text = make_idl(num_interfaces)
+    number = 3
+    parse = min(timeit.repeat(lambda: parser.IDLParser().load(text), number=number, repeat=3)) / number
+
+    m = parser.IDLParser().load(text).module_by_name('bench_module')
+    interfaces = [m.interface_by_name('I%d' % i) for i in range(num_interfaces)]
+    names = [p + n for p in ['pub', 'pro', 'pri'] for n in ['S', 'U', 'E', 'C', 'T', 'm']]
+
+    def lookup():
+        for i, interface in enumerate(interfaces):
+            for name in names:
+                name = name + str(i)
+                for section in interface.publics + interface.protecteds + interface.privates:
+                    for find in [section.method_by_name, section.struct_by_name, section.union_by_name,
+                                 section.enum_by_name, section.const_by_name, section.typedef_by_name]:
+                        if find(name) is not None:
+                            break
+                    else:
+                        continue
+                    break
+
+    def merged_lookup():
+        for i, interface in enumerate(interfaces):
+            for name in names:
+                interface.declaration_by_name(name + str(i))
+    found = min(timeit.repeat(lookup, number=1, repeat=3))
+    merged = min(timeit.repeat(merged_lookup, number=1, repeat=3))
+    count = num_interfaces * len(names)
+    sys.stdout.write('%d interfaces : parse %8.2f ms\n' % (num_interfaces, parse * 1000))
+    sys.stdout.write('lookup through sections : %6.2f us / name\n' % (found * 1e6 / count))
+    sys.stdout.write('declaration_by_name     : %6.2f us / name\n' % (merged * 1e6 / count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Compare the single-pass lexer with the former
+_clear_comments -> _clear_ifdef -> TokenBuffer split pipeline.
+
+    python benchmarks/bench_lexer.py [num_structs]
+"""
+import os, sys, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import lexer, parser, token_buffer
+
+
+def make_idl(num_structs):
+    lines = ['/* generated benchmark IDL */', 'channel bench {', 'module bench_module {',
+             'interface bench_interface {', 'public: {']
+    for i in range(num_structs):
+        lines.append('// struct number %d' % i)
+        lines.append('#ifndef SKIP_S%d' % i)
+        lines.append('struct S%d {' % i)
+        lines.append('    long @0 a; /* first */')
+        lines.append('    double @1 b;')
+        lines.append('    sequence<long> @2 c;')
+        lines.append('};')
+        lines.append('#endif')
+        lines.append('long method%d @%d (in long x, out double y);' % (i, i))
+    lines += ['};', '};', '};', '}']
+    return '\n'.join(lines)
+
+
+def legacy_clear_comments(lines):
+    output_lines = []
+    in_comment = False
+    for line in lines:
+        line = line.strip()
+        output_line = ''
+        if line.find('//') >= 0:
+            line = line[:line.find('//')]
+        for token in line.split(' '):
+            if in_comment and token.find('*/') >= 0:
+                in_comment = False
+                output_line = output_line + ' ' + token[token.find('*/')+2:].strip()
+            elif in_comment:
+                continue
+            elif token.startswith('//'):
+                break
+            elif token.find('/*') >= 0:
+                in_comment = True
+                output_line = output_line + ' ' + token[0: token.find('/*')]
+            else:
+                if token.find('{') >= 0:
+                    token = token.replace('{', ' { ')
+                if token.find(';') >= 0:
+                    token = token.replace(';', ' ;')
+                if token.find('(') >= 0:
+                    token = token.replace('(', ' ( ')
+                token = token.replace(',', ' , ')
+                token = token.replace(')', ' ) ')
+                token = token.replace('}', ' } ')
+                output_line = output_line + ' ' + token.strip()
+        if len(output_line.strip()) > 0:
+            output_lines.append(output_line.strip() + '\n')
+    return output_lines
+
+
+def legacy_clear_ifdef(lines):
+    output_lines = []
+    def_tokens = []
+    offset = [0]
+    def _parse(flag):
+        while offset[0] < len(lines):
+            line = lines[offset[0]]
+            offset[0] = offset[0] + 1
+            if line.startswith('#define'):
+                def_tokens.append(line.split(' ')[1])
+            elif line.startswith('#ifdef'):
+                _parse(line.split(' ')[1] in def_tokens)
+            elif line.startswith('#ifndef'):
+                _parse(not line.split(' ')[1] in def_tokens)
+            elif line.startswith('#endif'):
+                return
+            elif flag:
+                output_lines.append(line)
+    _parse(True)
+    return output_lines
+
+
+def legacy_tokens(text):
+    lines = legacy_clear_comments(text.replace('\t', ' ').split('\n'))
+    lines = legacy_clear_ifdef(lines)
+    tokens = []
+    for line in lines:
+        for t in line.split(' '):
+            if len(t.strip()) != 0:
+                tokens.append(t.strip())
+    return tokens
+
+
+def lexer_tokens(text):
+    parser_ = parser.IDLParser()
+    tokens = list(parser_._clear_ifdef(lexer.tokenize(text)))
+    return token_buffer.TokenBuffer(tokens=tokens).t_debug
+
+
+def main():
+    num_structs = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+    text = make_idl(num_structs)
+    assert legacy_tokens(text) == lexer_tokens(text)
+
+    number = 5
+    legacy = min(timeit.repeat(lambda: legacy_tokens(text), number=number, repeat=3)) / number
+    single = min(timeit.repeat(lambda: lexer_tokens(text), number=number, repeat=3)) / number
+    sys.stdout.write('%d lines\n' % text.count('\n'))
+    sys.stdout.write('legacy pipeline : %8.2f ms\n' % (legacy * 1000))
+    sys.stdout.write('lexer           : %8.2f ms\n' % (single * 1000))
+    sys.stdout.write('speedup         : %8.2fx\n' % (legacy / single))
+
+
+if __name__ == '__main__':
+    main()
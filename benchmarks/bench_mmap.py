@@ -0,0 +1,50 @@
+"""
+Tokenizing a large IDL file read into a string versus through a memory map.
+
+    python benchmarks/bench_mmap.py [num_structs]
+"""
+import os, sys, tempfile, timeit, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import lexer, source
+from bench_lexer import make_idl
+
+
+def read_tokens(path):
+    with open(path, 'r') as f:
+        return lexer.tokenize(f.read())
+
+
+def mapped_tokens(path):
+    with source.open_mapped(path) as buf:
+        return lexer.tokenize(buf)
+
+
+def peak(func, path):
+    tracemalloc.start()
+    func(path)
+    size = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size
+
+
+def main():
+    num_structs = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+    fd, path = tempfile.mkstemp(suffix='.idl')
+    with os.fdopen(fd, 'w') as f:
+        f.write(make_idl(num_structs))
+    try:
+        assert read_tokens(path) == mapped_tokens(path)
+        number = 5
+        read = min(timeit.repeat(lambda: read_tokens(path), number=number, repeat=3)) / number
+        mapped = min(timeit.repeat(lambda: mapped_tokens(path), number=number, repeat=3)) / number
+        read_peak = peak(read_tokens, path)
+        mapped_peak = peak(mapped_tokens, path)
+    finally:
+        os.remove(path)
+    sys.stdout.write('read()  : %8.2f ms  peak %8.2f MB\n' % (read * 1000, read_peak / 1e6))
+    sys.stdout.write('mmap    : %8.2f ms  peak %8.2f MB\n' % (mapped * 1000, mapped_peak / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Memory held by a parsed tree: bytes per node, as traced by tracemalloc once
+the parser itself has been released, with the nodes declaring __slots__
+versus the same tree with nodes keeping their attributes in a __dict__.
+
+    python benchmarks/bench_node_memory.py [num_structs]
+"""
+import gc, os, sys, tempfile, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import node, parser
+
+
+def make_idl(num_structs):
+    lines = ['module bench_module {', 'interface bench_interface {', 'public: {']
+    for i in range(num_structs):
+        lines.append('struct S%d { long @0 a; double @1 b; S%d @2 c; sequence<long> @3 d; };'
+                     % (i, max(i - 1, 0)))
+        lines.append('enum E%d { A%d, B%d, C%d };' % (i, i, i, i))
+        lines.append('long method%d @0 (in long a, out S%d b);' % (i, i))
+    lines += ['};', '};', '};']
+    return '\n'.join(lines)
+
+
+def all_nodes():
+    return [o for o in gc.get_objects() if isinstance(o, node.IDLNode)]
+
+
+def slots(cls):
+    return [s for c in reversed(cls.__mro__) for s in c.__dict__.get('__slots__', ())]
+
+
+def legacy_size(nodes):
+    """ Memory taken by copies of nodes as instances of classes without
+    __slots__, their attributes set in the same order as by __init__().
+    """
+    classes = dict([(cls, (type(cls.__name__, (object,), {}), slots(cls))) for cls in set(map(type, nodes))])
+    copies = [None] * len(nodes)
+    gc.collect()
+    tracemalloc.start()
+    for i, n in enumerate(nodes):
+        legacy, attrs = classes[type(n)]
+        copy = copies[i] = legacy()
+        for attr in attrs:
+            if hasattr(n, attr):
+                setattr(copy, attr, getattr(n, attr))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+
+def main():
+    num_structs = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    fd, path = tempfile.mkstemp(suffix='.idl')
+    with os.fdopen(fd, 'w') as f:
+        f.write(make_idl(num_structs))
+    try:
+        gc.collect()
+        tracemalloc.start()
+        parser_ = parser.IDLParser()
+        parser_.parse(idls=[path])
+        m = parser_.global_module
+        del parser_
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    finally:
+        os.remove(path)
+    nodes = all_nodes()
+    # The tree of legacy nodes holds the same values, but other node objects.
+    legacy = size - sum([sys.getsizeof(n) for n in nodes]) + legacy_size(nodes)
+    sys.stdout.write('nodes %d\n' % len(nodes))
+    for name, total in [('__dict__', legacy), ('__slots__', size)]:
+        sys.stdout.write('%-10s: total %6.2f MB  %6.1f bytes / node\n'
+                         % (name, total / 1e6, float(total) / len(nodes)))
+    return m
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+full_path and root_node of a struct declared 10 modules deep, computed
+recursively on every access versus cached on the node.
+
+    python benchmarks/bench_node_paths.py [depth]
+"""
+import os, sys, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import parser
+
+
+def make_idl(depth):
+    opening = ' '.join(['module m%d {' % i for i in range(depth)])
+    closing = ' '.join(['};'] * depth)
+    return '%s interface i { public: { struct S { long @0 a; }; }; }; %s' % (opening, closing)
+
+
+def legacy_full_path(n):
+    if n.parent is None:
+        return ''
+    path = legacy_full_path(n.parent)
+    if len(path) == 0:
+        return n.name
+    return path + '::' + n.name
+
+
+def legacy_root_node(n):
+    roots = []
+    def find_root(n):
+        if n.is_root:
+            roots.append(n)
+        else:
+            find_root(n.parent)
+    find_root(n)
+    return roots[0]
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    m = parser.IDLParser().load(make_idl(depth))
+    s = m.find_types('S')[0]
+    assert legacy_full_path(s) == s.full_path
+    assert legacy_root_node(s) is s.root_node
+
+    number = 100000
+    results = [('full_path, recursive', lambda: legacy_full_path(s)),
+               ('full_path, cached', lambda: s.full_path),
+               ('root_node, recursive', lambda: legacy_root_node(s)),
+               ('root_node, cached', lambda: s.root_node)]
+    sys.stdout.write('struct %d modules deep: %s\n' % (depth, s.full_path))
+    for name, func in results:
+        t = min(timeit.repeat(func, number=number, repeat=3)) / number
+        sys.stdout.write('%-22s : %8.3f us\n' % (name, t * 1e6))
+
+
+if __name__ == '__main__':
+    main()
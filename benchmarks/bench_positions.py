@@ -0,0 +1,47 @@
+"""
+Cost of source positions: the pop() loop with and without a segment table,
+and resolving locations to file/line/column.
+
+    python benchmarks/bench_positions.py [num_structs]
+"""
+import os, sys, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import lexer, parser, token_buffer, source
+from bench_lexer import make_idl
+
+
+def pop_all(token_buf):
+    while token_buf.pop() is not None:
+        pass
+
+
+def main():
+    num_structs = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+    text = make_idl(num_structs)
+    parser_ = parser.IDLParser()
+    sources = source.SourceMap()
+    fileid = sources.add(text=text)
+    segments = []
+    tokens = list(parser_._clear_ifdef(parser_._source_tokens(fileid, lexer.tokenize(text)), segments))
+    sys.stdout.write('%d tokens, %d segments\n' % (len(tokens), len(segments)))
+
+    number = 5
+    plain = min(timeit.repeat(lambda: pop_all(token_buffer.TokenBuffer(tokens=tokens)), number=number, repeat=3)) / number
+    located = min(timeit.repeat(lambda: pop_all(token_buffer.TokenBuffer(tokens=tokens, segments=segments)), number=number, repeat=3)) / number
+    sys.stdout.write('pop() without segments : %6.1f ns/token\n' % (plain * 1e9 / len(tokens)))
+    sys.stdout.write('pop() with segments    : %6.1f ns/token\n' % (located * 1e9 / len(tokens)))
+
+    token_buf = token_buffer.TokenBuffer(tokens=tokens, segments=segments)
+    locations = []
+    while token_buf.pop() is not None:
+        locations.append(token_buf.location)
+    first = timeit.timeit(lambda: sources.position(locations[-1]), number=1)
+    cached = timeit.timeit(lambda: [sources.position(l) for l in locations], number=1) / len(locations)
+    sys.stdout.write('first position lookup  : %6.1f ms (lexes offsets and line starts)\n' % (first * 1e3))
+    sys.stdout.write('next position lookups  : %6.1f us each\n' % (cached * 1e6))
+    assert str(sources.position(locations[-1])) == '<string>:%d:1' % (text.count('\n') + 1)
+
+
+if __name__ == '__main__':
+    main()
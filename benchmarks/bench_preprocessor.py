@@ -0,0 +1,62 @@
+"""
+Parse an IDL file with #if blocks using the in-process preprocessor,
+versus running it through an external cpp first.
+
+    python benchmarks/bench_preprocessor.py [num_structs]
+"""
+import os, subprocess, sys, tempfile, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import parser
+
+
+def make_idl(num_structs):
+    lines = ['#define VERSION 4', 'module bench_module {', 'interface bench_interface {', 'public: {']
+    for i in range(num_structs):
+        lines.append('#if defined(FEATURE) && VERSION > %d' % (i % 8))
+        lines.append('struct S%d { long @0 a; double @1 b; };' % i)
+        lines.append('#else')
+        lines.append('struct T%d { long @0 a; };' % i)
+        lines.append('#endif')
+    lines += ['};', '};', '};']
+    return '\n'.join(lines)
+
+
+def in_process(path):
+    parser_ = parser.IDLParser()
+    parser_.parse(idls=[path], defines=['FEATURE'])
+    return parser_
+
+
+def with_cpp(path):
+    out = subprocess.check_output(['cpp', '-P', '-DFEATURE', path])
+    parser_ = parser.IDLParser()
+    parser_.load(out.decode('utf-8'))
+    return parser_
+
+
+def structs(parser_):
+    m = parser_.global_module.module_by_name('bench_module')
+    section = m.interface_by_name('bench_interface').public_by_name('public')
+    return sorted([s.name for s in section.structs])
+
+
+def main():
+    num_structs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    fd, path = tempfile.mkstemp(suffix='.idl')
+    with os.fdopen(fd, 'w') as f:
+        f.write(make_idl(num_structs))
+    try:
+        assert structs(in_process(path)) == structs(with_cpp(path))
+        number = 5
+        internal = min(timeit.repeat(lambda: in_process(path), number=number, repeat=3)) / number
+        external = min(timeit.repeat(lambda: with_cpp(path), number=number, repeat=3)) / number
+    finally:
+        os.remove(path)
+    sys.stdout.write('%d #if blocks\n' % num_structs)
+    sys.stdout.write('in-process preprocessor : %8.2f ms\n' % (internal * 1000))
+    sys.stdout.write('cpp subprocess + parse  : %8.2f ms\n' % (external * 1000))
+
+
+if __name__ == '__main__':
+    main()
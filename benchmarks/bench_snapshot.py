@@ -0,0 +1,74 @@
+"""
+Reload a parsed and linked tree: parse the IDL again, load a snapshot of the
+tree (see IDLChannel.save_snapshot) or unpickle it. The lazy lookup loads the
+snapshot lazily and only reads one struct of one interface from it.
+
+    python benchmarks/bench_snapshot.py [num_interfaces]
+"""
+import os, pickle, sys, tempfile, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import parser, channel
+
+
+def make_idl(num_interfaces):
+    lines = ['module bench_module {']
+    for i in range(num_interfaces):
+        lines.append('interface I%d {' % i)
+        lines.append('public: {')
+        lines.append('struct S%d { long @0 a; double @1 b; sequence<long> @2 c; };' % i)
+        lines.append('struct T%d { S%d @0 s; sequence<S%d> @1 l; string @2 n; };' % (i, i, i))
+        lines.append('union U%d { long @0 a; S%d @1 s; };' % (i, i))
+        lines.append('enum E%d { A, B, C };' % i)
+        lines.append('const long C%d = %d;' % (i, i))
+        lines.append('typedef sequence<T%d> L%d;' % (i, i))
+        lines.append('T%d m%d @0 (in S%d a, out L%d b, in E%d e);' % (i, i, i, i, i))
+        lines.append('};')
+        lines.append('};')
+    lines.append('};')
+    return '\n'.join(lines)
+
+
+def best(func, number=1):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+def main():
+    num_interfaces = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    fd, path = tempfile.mkstemp(suffix='.idl')
+    with os.fdopen(fd, 'w') as f:
+        f.write(make_idl(num_interfaces))
+    snapshot_path = path + '.snap'
+    try:
+        def parse():
+            parser_ = parser.IDLParser()
+            parser_.parse(idls=[path])
+            return parser_.global_module
+        def lookup():
+            m = channel.IDLChannel.load_snapshot(snapshot_path, lazy=True)
+            i = m.module_by_name('bench_module').interface_by_name('I%d' % (num_interfaces // 2))
+            s = i.public_by_name('public').struct_by_name('T%d' % (num_interfaces // 2))
+            return [member.type.obj.full_path for member in s.members if not member.type.is_primitive]
+        m = parse()
+        m.save_snapshot(snapshot_path)
+        data = pickle.dumps(m, pickle.HIGHEST_PROTOCOL)
+
+        rows = [('parse', best(parse), os.path.getsize(path)),
+                ('snapshot load', best(lambda: channel.IDLChannel.load_snapshot(snapshot_path)),
+                 os.path.getsize(snapshot_path)),
+                ('lazy lookup', best(lookup, number=10), None),
+                ('snapshot save', best(lambda: m.save_snapshot(snapshot_path)), None),
+                ('pickle load', best(lambda: pickle.loads(data)), len(data)),
+                ('pickle dump', best(lambda: pickle.dumps(m, pickle.HIGHEST_PROTOCOL)), None)]
+    finally:
+        os.remove(path)
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+    sys.stdout.write('%d interfaces\n' % num_interfaces)
+    sys.stdout.write('%-14s %10s %12s\n' % ('', 'ms', 'bytes'))
+    for name, elapsed, size in rows:
+        sys.stdout.write('%-14s %10.2f %12s\n' % (name, elapsed * 1000, '' if size is None else size))
+
+
+if __name__ == '__main__':
+    main()
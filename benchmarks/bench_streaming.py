@@ -0,0 +1,40 @@
+"""
+Peak memory while parsing a large IDL file, with and without streaming.
+
+    python benchmarks/bench_streaming.py [num_structs]
+"""
+import os, sys, tempfile, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import parser
+from bench_lexer import make_idl
+
+
+def peak(path, streaming):
+    """ Return the peak memory while parsing path, and the memory still held
+    once parsed, i.e. by the parsed model. """
+    tracemalloc.start()
+    parser_ = parser.IDLParser(streaming=streaming)
+    parser_.parse_idl(path)
+    current, size = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, current
+
+
+def main():
+    num_structs = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+    fd, path = tempfile.mkstemp(suffix='.idl')
+    with os.fdopen(fd, 'w') as f:
+        f.write(make_idl(num_structs))
+    try:
+        eager = peak(path, False)
+        streaming = peak(path, True)
+    finally:
+        os.remove(path)
+    sys.stdout.write('%-10s: %10s %10s %10s\n' % ('MB', 'peak', 'model', 'transient'))
+    for name, (size, model) in [('eager', eager), ('streaming', streaming)]:
+        sys.stdout.write('%-10s: %10.2f %10.2f %10.2f\n' % (name, size / 1e6, model / 1e6, (size - model) / 1e6))
+
+
+if __name__ == '__main__':
+    main()
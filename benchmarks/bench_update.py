@@ -0,0 +1,48 @@
+"""
+Bring a parsed directory of IDL files up to date after one of them changed:
+parse the whole directory again, or update the parser with the changed file
+(see IDLParser.update).
+
+    python benchmarks/bench_update.py [num_files]
+"""
+import os, shutil, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import parser
+from bench_cache import write_files
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    idl_dir = tempfile.mkdtemp()
+    try:
+        write_files(idl_dir, num_files)
+        changed = os.path.join(idl_dir, 'f%d.idl' % (num_files // 2))
+        parser_ = parser.IDLParser(idl_dirs=[idl_dir])
+        parser_.parse()
+
+        rows = []
+        for i in range(3):
+            with open(changed, 'a') as f:
+                f.write('\n// edit %d\n' % i)
+            start = time.time()
+            fresh = parser.IDLParser(idl_dirs=[idl_dir])
+            fresh.parse()
+            parse = time.time() - start
+
+            start = time.time()
+            reparsed = parser_.update([changed])
+            update = time.time() - start
+            rows.append((parse, update, len(reparsed)))
+        parse = min([r[0] for r in rows])
+        update = min([r[1] for r in rows])
+        count = rows[-1][2]
+        sys.stdout.write('%d files, 1 changed\n' % (num_files + 1))
+        sys.stdout.write('%-10s %10.2f ms\n' % ('parse', parse * 1000))
+        sys.stdout.write('%-10s %10.2f ms  (%d file parsed again)\n' % ('update', update * 1000, count))
+    finally:
+        shutil.rmtree(idl_dir)
+
+
+if __name__ == '__main__':
+    main()
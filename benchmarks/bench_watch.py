@@ -0,0 +1,54 @@
+"""
+Latency of the watch mode (see IDLParser.watch): time from writing one IDL
+file of a parsed directory to the callback reporting the changed declarations.
+
+    python benchmarks/bench_watch.py [num_files]
+"""
+import os, shutil, sys, tempfile, threading, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from idl_parser import parser
+from bench_cache import write_files
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    idl_dir = tempfile.mkdtemp()
+    stop = threading.Event()
+    thread = None
+    try:
+        write_files(idl_dir, num_files)
+        parser_ = parser.IDLParser(idl_dirs=[idl_dir])
+        parser_.parse()
+        updates = []
+        thread = threading.Thread(target=parser_.watch, kwargs={'stop': stop,
+                                  'callback': lambda declarations: updates.append((time.time(), declarations))})
+        thread.start()
+
+        latencies = []
+        path = os.path.join(idl_dir, 'f%d.idl' % (num_files // 2))
+        for i in range(10):
+            time.sleep(0.1)
+            with open(path) as f:
+                text = f.read()
+            count = len(updates)
+            start = time.time()
+            with open(path, 'w') as f:
+                f.write(text.replace('long @2 a;', 'double @2 a;') if i % 2 == 0
+                        else text.replace('double @2 a;', 'long @2 a;'))
+            while len(updates) == count:
+                time.sleep(0.001)
+            latencies.append(updates[-1][0] - start)
+        latencies.sort()
+        sys.stdout.write('%d files, one edited 10 times\n' % (num_files + 1))
+        sys.stdout.write('latency  min %.1f ms  median %.1f ms  max %.1f ms\n'
+                         % (latencies[0] * 1000, latencies[len(latencies) // 2] * 1000, latencies[-1] * 1000))
+    finally:
+        stop.set()
+        if thread is not None:
+            thread.join()
+        shutil.rmtree(idl_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+"""
+Persistent cache of parsed IDL files, see the cache_dir parameter of
+parser.IDLParser.
+
+With the cache, every IDL file is parsed into a unit: a tree of its own,
+rooted at a global IDLChannel, whose declarations are then grafted into the
+tree of the parser exactly where parsing the file there would have put them.
+Units are stored in the cache directory, along with what is needed to replay
+the rest of the parse of their file: the includes met, the macros defined
+and undefined, the include guard and the contents hashes of the files they
+depend on.
+"""
+import hashlib, io, os, pickle, sys, tempfile
+
+from . import node, channel, symbols, source
+from . import type as idl_type
+
+# Version of the entries, to be increased whenever they or the nodes they hold change.
+VERSION = 5
+
+
+class ParseCache(object):
+    """ Directory of cache entries, one file per parsed IDL file. """
+
+    def __init__(self, directory):
+        self._directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # Contents hash of the files seen, with their modification time and size.
+        self._hashes = {}
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def file_hash(self, path):
+        """ Hash of the contents of a file, computed again only once it changes. """
+        st = os.stat(path)
+        cached = self._hashes.get(path)
+        if cached is None or cached[0] != (st.st_mtime, st.st_size):
+            with open(path, 'rb') as f:
+                cached = ((st.st_mtime, st.st_size), hashlib.sha1(f.read()).hexdigest())
+            self._hashes[path] = cached
+        return cached[1]
+
+    def is_current(self, deps):
+        """ Return True if the files of deps, a dictionary of contents hashes by path, are unchanged. """
+        try:
+            for path, digest in deps.items():
+                if self.file_hash(path) != digest:
+                    return False
+        except (IOError, OSError):
+            return False
+        return True
+
+    def entry_name(self, path, context):
+        """ Name of the entry of the IDL file path, parsed with context,
+        e.g. the macros it is parsed with.
+        """
+        key = repr((VERSION, path, self.file_hash(path), context))
+        return hashlib.sha1(key.encode('utf-8')).hexdigest() + '.unit'
+
+    def read(self, name):
+        """ Return the entry stored under name, or None if there is none or it can not be read. """
+        try:
+            with open(os.path.join(self._directory, name), 'rb') as f:
+                return _Unpickler(f).load()
+        except Exception:
+            return None
+
+    def write(self, name, entry):
+        """ Store entry under name. Entries are written to a temporary file first,
+        so that parsers sharing the directory never read partial ones.
+        Failures are ignored: the file is just parsed again next time.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self._directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp, os.path.join(self._directory, name))
+        except (IOError, OSError):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def keywords():
+    """ Keywords of every scope class, as they change what parsing gives
+    (see node.IDLScope.register_keyword).
+    """
+    result = []
+    classes = [node.IDLScope]
+    while classes:
+        cls = classes.pop()
+        result.append((cls.__name__, sorted(cls.keywords())))
+        classes.extend(cls.__subclasses__())
+    return sorted(result)
+
+
+class UnitSymbolTable(symbols.SymbolTable):
+    """ Symbol table of a unit. Lookups from its root also see the declarations
+    of the tree the unit is parsed for, which come first.
+    The qualified names looked up that way are recorded with the declaration
+    found: they are baked into the unit (see node.refine_typename), so it
+    remains valid only while they resolve to the same declaration.
+    """
+
+    def __init__(self, outer):
+        super(UnitSymbolTable, self).__init__()
+        self._outer = outer
+        # Declarations, in the order they were added.
+        self.declarations = []
+        self.lookups = []
+
+    def add(self, node):
+        super(UnitSymbolTable, self).add(node)
+        self.declarations.append(node)
+
+    def find(self, name, scope=None):
+        nodes = super(UnitSymbolTable, self).find(name, scope=scope)
+        if scope is None or scope.is_root:
+            outer = self._outer.find(name)
+            if name.find('::') >= 0:
+                self.lookups.append((name, _first_path(outer)))
+            nodes = outer + nodes
+        return nodes
+
+
+def _first_path(nodes):
+    return nodes[0].full_path if nodes else None
+
+
+def new_unit(root):
+    """ Return an empty unit, to parse an IDL file for the tree of root. """
+    unit = channel.IDLChannel()
+    unit._symbols = UnitSymbolTable(root.symbols)
+    return unit
+
+
+def is_current(lookups, root):
+    """ Return True if the names looked up by a unit still resolve to the same declarations in root. """
+    symbols_ = root.symbols
+    for name, path in lookups:
+        if _first_path(symbols_.find(name)) != path:
+            return False
+    return True
+
+
+class _Pickler(pickle.Pickler):
+    # The root of the unit and its shared types are not stored, but replaced
+    # by the ones of the tree the unit is loaded into (see _Unpickler).
+
+    def __init__(self, f, unit):
+        pickle.Pickler.__init__(self, f, pickle.HIGHEST_PROTOCOL)
+        # Persistent ids by object id: 0 for the root, else the name of the type.
+        # Looked up for every object, so kept to one dictionary lookup.
+        ids = dict([(id(t), name) for name, t in unit.symbols._types.items()])
+        ids[id(unit)] = 0
+        self.persistent_id = lambda obj, get=ids.get: get(id(obj))
+
+
+class _Unpickler(pickle.Unpickler):
+    """ Unpickler of the entries and of the units of the cache. The cache
+    directory may be shared, so only the node classes and a few builtin types
+    can be loaded: any other callable could run arbitrary code.
+    """
+
+    def __init__(self, f, root=None):
+        pickle.Unpickler.__init__(self, f)
+        self._root = root
+
+    def persistent_load(self, pid):
+        if self._root is None:
+            raise pickle.UnpicklingError('Units must be loaded with loads()')
+        if pid == 0:
+            return self._root
+        return idl_type.IDLType(pid, self._root)
+
+    def find_class(self, module, name):
+        # Every unit refers to the same few node classes.
+        cls = _classes.get((module, name))
+        if cls is None:
+            if module in ('builtins', '__builtin__'):
+                cls = _builtins.get(name)
+            elif module == node.__name__ and name == 'IDLNodeList':
+                cls = node.IDLNodeList
+            else:
+                cls = node.node_class(module, name)
+            if cls is None:
+                raise pickle.UnpicklingError('Can not load %s.%s from the cache' % (module, name))
+            _classes[(module, name)] = cls
+        return cls
+
+
+_classes = {}
+_builtins = dict([(t.__name__, t) for t in (set, frozenset, bytearray, complex)])
+
+
+def dumps(unit, fileid):
+    """ Serialize a parsed unit. fileid is the id of its IDL file in the sources of the tree. """
+    f = io.BytesIO()
+    _Pickler(f, unit).dump((fileid, unit.filepath, unit._location, unit.channels, unit.modules,
+                            unit.symbols.declarations, unit.symbols._references))
+    return f.getvalue()
+
+
+def loads(data, root):
+    """ Deserialize a unit for the tree of root, to be passed to graft(). """
+    return _Unpickler(io.BytesIO(data), root).load()
+
+
+def graft(unit, root, fileid):
+    """ Move the declarations of a unit returned by loads() into the tree of root,
+    merging its channels, modules, interfaces and sections with the ones of the
+    same name as parsing would, and register them in the symbols of root.
+    :param fileid: Id of the IDL file of the unit in root.sources.
+    """
+    unit_fileid, filepath, location, channels, modules, declarations, references = unit
+    if unit_fileid != fileid:
+        _relocate(channels + modules, fileid)
+        location = _location(location, fileid)
+    root._filepath = filepath
+    root._location = location
+    if location is not None:
+        root._openings.append(location)
+    rejected = set()
+    _merge_children(root, channels, root._channels, rejected)
+    _merge_children(root, modules, root._modules, rejected)
+    symbols_ = root.symbols
+    for n in declarations:
+        if not id(n) in rejected:
+            symbols_.add(n)
+    for t in references:
+        symbols_.add_reference(t)
+
+
+def _location(location, fileid):
+    if location is None:
+        return None
+    return source.SourceMap.location(fileid, location & 0xffffffff)
+
+
+def _relocate(nodes, fileid):
+    """ Move the locations of nodes and of the nodes below them to the file fileid. """
+    stack = list(nodes)
+    while stack:
+        n = stack.pop()
+        n._location = _location(n._location, fileid)
+        if n._kind & _scopes:
+            n._openings = [_location(l, fileid) for l in n._openings]
+        for value in n._slot_values():
+            if isinstance(value, node.IDLNode):
+                value = [value]
+            elif not isinstance(value, list):
+                continue
+            stack.extend([c for c in value if isinstance(c, node.IDLNode) and c._parent is n])
+
+
+_scopes = node.CHANNEL | node.MODULE | node.INTERFACE | node.SECTION
+
+
+def _merge_children(parent, nodes, children, rejected):
+    """ Add nodes to children, the list of parent they belong to, merging each
+    one into the child of the same name if there is one.
+    """
+    for n in nodes:
+        existing = children.by_name(n.name)
+        if existing is None:
+            # Full paths and root nodes stay the same, there is no cache to clear.
+            n._parent = parent
+            children.append(n)
+        else:
+            _merge(n, existing, rejected)
+
+
+def _reopen(n, existing):
+    # Like parsing a scope again, which sets where it was opened last.
+    existing._filepath = n._filepath
+    existing._location = n._location
+    existing._openings.extend(n._openings)
+
+
+def _merge_channel(c, existing, rejected):
+    _reopen(c, existing)
+    _merge_children(existing, c.channels, existing._channels, rejected)
+    _merge_children(existing, c.modules, existing._modules, rejected)
+
+
+def _merge_module(m, existing, rejected):
+    _reopen(m, existing)
+    _merge_children(existing, m.modules, existing._modules, rejected)
+    _merge_children(existing, m.interfaces, existing._interfaces, rejected)
+
+
+def _merge_interface(i, existing, rejected):
+    _reopen(i, existing)
+    for visibility in ['public', 'protected', 'private']:
+        _merge_children(existing, i._section_list(visibility), existing._section_list(visibility), rejected)
+    # Declarations rejected as duplicates already have one of the same name there.
+    for name, n in i._declarations.items():
+        if not id(n) in rejected:
+            existing._add_declaration(n)
+
+
+def _merge_section(s, existing, rejected):
+    _reopen(s, existing)
+    for nodes, children, what in [(s.methods, existing._methods, None),
+                                  (s.typedefs, existing._typedefs, None),
+                                  (s.structs, existing._structs, 'Struct'),
+                                  (s.unions, existing._unions, 'Union'),
+                                  (s.enums, existing._enums, 'Enum'),
+                                  (s.consts, existing._consts, 'Const')]:
+        for n in nodes:
+            if what is not None and children.by_name(n.name) is not None:
+                if existing._verbose: sys.stdout.write('# Error. Same %s Defined (%s)\n' % (what, n.name))
+                rejected.add(id(n))
+                continue
+            n._parent = existing
+            children.append(n)
+
+
+_merge = node.Dispatcher({
+    node.CHANNEL : _merge_channel,
+    node.MODULE : _merge_module,
+    node.INTERFACE : _merge_interface,
+    node.SECTION : _merge_section,
+    })
@@ -6,7 +6,7 @@ Created on 10 nov 2016
 
 import sys
 
-from . import node, type, exception
+from . import node, type, exception, source, symbols, snapshot
 from . import module
 global_namespace = '__global__'
 sep = '::'
@@ -14,16 +14,22 @@ sep = '::'
 
 
 
-class IDLChannel(node.IDLNode):
+class IDLChannel(node.IDLScope):
+    __slots__ = ('_channels', '_modules', '_sources', '_symbols')
+
+    _classname = 'IDLChannel'
+    _kind = node.CHANNEL
+    _verbose = False
     
     def __init__(self, name=None, parent = None):
-        super(IDLChannel, self).__init__('IDLChannel', name, parent)
-        self._verbose = False
+        super(IDLChannel, self).__init__(name, parent)
         if name is None:
             self._name = global_namespace   
                      
-        self._channels = []
-        self._modules = []
+        self._channels = node.IDLNodeList()
+        self._modules = node.IDLNodeList()
+        self._sources = source.SourceMap() if parent is None else None
+        self._symbols = symbols.SymbolTable() if parent is None else None
 
 
     @property
@@ -31,7 +37,37 @@ class IDLChannel(node.IDLNode):
         return self.name == global_namespace
 
     @property
-    def full_path(self):
+    def sources(self):
+        """ source.SourceMap of the IDL sources parsed into this tree. Only set on the root. """
+        return self._sources
+
+    @property
+    def symbols(self):
+        """ symbols.SymbolTable of the types declared in this tree. Only set on the root. """
+        return self._symbols
+
+    def save_snapshot(self, path):
+        """ Save the whole tree of this channel, as parsed and linked, to the file path
+        (see snapshot).
+        """
+        snapshot.save(self.root_node, path)
+
+    @staticmethod
+    def load_snapshot(path, lazy=False):
+        """ Load a tree saved by save_snapshot().
+        :param lazy: If True, nodes are read from the memory-mapped file only when
+                     first accessed, e.g. by module_by_name() or struct_by_name().
+        :returns: The root channel of the tree.
+        """
+        return snapshot.load(path, lazy=lazy)
+
+    def link(self):
+        """ Resolve every type reference of the tree to its declaration once.
+        :returns: List of the type names that could not be resolved.
+        """
+        return self.root_node.symbols.link()
+
+    def _path(self):
         if self.parent is None:
             return '' # self.name
         else:
@@ -52,54 +88,53 @@ class IDLChannel(node.IDLNode):
         return dic
 
     def parse_tokens(self, token_buf, filepath=None):
-        self._filepath = filepath
+        self._open(token_buf, filepath)
         if not self.name == global_namespace:
             brace = token_buf.pop()
             if not brace == '{':
                 if self._verbose: sys.stdout.write('# Error. No brace "{".\n')
                 raise exception.InvalidIDLSyntaxError()
 
-        while True:
-            token = token_buf.pop()
-            if token == None:
-                if self.name == global_namespace:
-                    break
-                if self._verbose: sys.stdout.write('# Error. No brace "}".\n')
-                raise exception.InvalidIDLSyntaxError()
-            
-            elif token == 'channel':
-                name_ = token_buf.pop()
-                c = self.channel_by_name(name_)
-                if c == None:
-                    c = IDLChannel(name_, self)
-                    self._channels.append(c)
-                c.parse_tokens(token_buf, filepath=filepath)
-            
-            elif token == 'module':
-                name_ = token_buf.pop()
-                m = self.module_by_name(name_)
-                if m == None:
-                    m = module.IDLModule(name_, self)
-                    self._modules.append(m)
-                m.parse_tokens(token_buf, filepath=filepath)
-                
-            
-                
-            elif token == '}':
-                break
-            
+        self._parse_declarations(token_buf, filepath)
+        return True
+
+    def _parse_end(self):
+        if not self.name == global_namespace:
+            super(IDLChannel, self)._parse_end()
+
+    def _parse_channel(self, token_buf, filepath):
+        name_ = token_buf.pop()
+        c = self.channel_by_name(name_)
+        if c == None:
+            c = IDLChannel(name_, self)
+            self._channels.append(c)
+        c.parse_tokens(token_buf, filepath=filepath)
+
+    def _parse_module(self, token_buf, filepath):
+        name_ = token_buf.pop()
+        m = self.module_by_name(name_)
+        if m == None:
+            m = module.IDLModule(name_, self)
+            self._modules.append(m)
+        m.parse_tokens(token_buf, filepath=filepath)
+
+    def _parse_close(self, token_buf, filepath):
+        # Unlike modules, channels are not followed by a semi-colon.
         return True
 
+    _keywords = {
+        'channel' : _parse_channel,
+        'module' : _parse_module,
+        '}' : _parse_close,
+        }
+
 
     @property
     def channels(self):
         return self._channels
 
     def channel_by_name(self, name):
-        for m in self.channels:
-            if m.name == name:
-                return m
-        return None
+        return self._channels.by_name(name)
 
     def for_each_channel(self, func):
         retval = []
@@ -113,10 +148,7 @@ class IDLChannel(node.IDLNode):
         return self._modules
 
     def module_by_name(self, name):
-        for m in self.modules:
-            if m.name == name:
-                return m
-        return None
+        return self._modules.by_name(name)
 
     def for_each_module(self, func):
         retval = []
@@ -128,26 +160,7 @@ class IDLChannel(node.IDLNode):
     def find_types(self, full_typename):
         if type.is_primitive(full_typename):
             return [type.IDLType(full_typename, self)]
-        typenode = []
-
-        def parse_node(s, name=str(full_typename)):
-            if s.name == name.strip() or s.full_path == name.strip():
-                typenode.append(s)
-
-        def parse_module(m):
-            typefull = m.find_types(full_typename)
-            if (typefull.__len__() > 0):
-                typenode.append(typefull)
-                
-                
-        def parse_channel(c):
-            c.for_each_channel(parse_channel)
-            c.for_each_module(parse_module)
-            
-
-        parse_channel(self)
-
-        return typenode
+        return self.root_node.symbols.find(full_typename, scope=self)
 
 
 
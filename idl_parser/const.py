@@ -5,11 +5,14 @@ sep = '::'
 
 
 class IDLConst(node.IDLNode):
+    __slots__ = ('_typename', '_value')
+
+    _classname = 'IDLConst'
+    _kind = node.CONST
     
     def __init__(self, name, typename, value, parent, filepath=None):
-        super(IDLConst, self).__init__('IDLConst', name, parent)
+        super(IDLConst, self).__init__(name, parent)
         self._typename = typename
-        self._verbose = True
         self._value = value
         self._filepath= filepath
 
@@ -44,7 +47,6 @@ class IDLConst(node.IDLNode):
     def value_string(self):
         return self._value
 
-    @property
-    def full_path(self):
+    def _path(self):
         return self.parent.full_path + sep + self.name
     
@@ -4,9 +4,13 @@ from . import node, exception
 sep = '::'
 
 class IDLEnumValue(node.IDLNode):
+    __slots__ = ('_value', '_annotation')
+
+    _classname = 'IDLEnumValue'
+    _kind = node.ENUM_VALUE
+
     def __init__(self, value, parent):
-        super(IDLEnumValue, self).__init__('IDLEnumValue', '', parent)
-        self._verbose = True
+        super(IDLEnumValue, self).__init__('', parent)
         self._value = value
         self._annotation = ''
 
@@ -23,9 +27,8 @@ class IDLEnumValue(node.IDLNode):
         #self._name = name
         #self._type = type
 
-    @property
-    def full_path(self):
-        return self.full_path + '.' + self.name
+    def _path(self):
+        return self.parent.full_path + '.' + self.name
 
     def to_simple_dic(self):
         dic = {self.name : self.value }
@@ -49,11 +52,14 @@ class IDLEnumValue(node.IDLNode):
 
 
 class IDLEnum(node.IDLNode):
+    __slots__ = ('_values', '_counter')
+
+    _classname = 'IDLEnum'
+    _kind = node.ENUM
     
     def __init__(self, name, parent):
-        super(IDLEnum, self).__init__('IDLEnum', name, parent)
-        self._verbose = True
-        self._values = []
+        super(IDLEnum, self).__init__(name, parent)
+        self._values = node.IDLNodeList()
 
     def to_simple_dic(self, quiet=False, full_path=False, recursive=False, member_only=False):
         name = self.full_path if full_path else self.name
@@ -69,12 +75,12 @@ class IDLEnum(node.IDLNode):
                 'values' : [v.to_dic() for v in self.values] }
         return dic
 
-    @property
-    def full_path(self):
+    def _path(self):
         return self.parent.full_path + sep + self.name
     
     def parse_tokens(self, token_buf, filepath=None):
         self._filepath = filepath
+        self._location = token_buf.location
         self._counter = 0
         brace = token_buf.pop()
         if not brace == '{':
@@ -82,6 +88,7 @@ class IDLEnum(node.IDLNode):
             raise exception.InvalidIDLSyntaxError()
         
         block_tokens = []        
+        block_location = None
         while True:
             token = token_buf.pop()
             if token == None:
@@ -95,17 +102,20 @@ class IDLEnum(node.IDLNode):
                     raise exception.InvalidIDLSyntaxError()
 
                 if len(block_tokens) > 0:
-                    self._parse_block(block_tokens)
+                    self._parse_block(block_tokens, block_location)
                 break
             
             if token == ',':
-                self._parse_block(block_tokens)
+                self._parse_block(block_tokens, block_location)
                 block_tokens = []
                 continue
+            if not block_tokens:
+                block_location = token_buf.location
             block_tokens.append(token)
             
-    def _parse_block(self, blocks):
+    def _parse_block(self, blocks, location=None):
         v = IDLEnumValue(self._counter, self)
+        v._location = location
         self._counter = self._counter+ 1
         v.parse_blocks(blocks, self.filepath)
         self._values.append(v)
@@ -116,7 +126,4 @@ class IDLEnum(node.IDLNode):
 
 
     def value_by_name(self, name):
-        for m in self.values:
-            if m.name == name:
-                return m
-        return None
+        return self._values.by_name(name)
@@ -1,26 +1,48 @@
 
 
 class IDLFileNotFoundError(Exception):
-    def __init__(self, value):
+    def __init__(self, value=None, position=None):
         self.value = value
+        self.position = position
     def __str__(self):
+        if self.position is not None:
+            return '%s: %r' % (self.position, self.value)
         return repr(self.value)
 
 
 class IDLGenericException(Exception):
-    def __init__(self, value):
+    def __init__(self, value=None, position=None):
         self.value = value
+        self.position = position
     def __str__(self):
+        if self.position is not None:
+            return '%s: %r' % (self.position, self.value)
         return repr(self.value)
 
 class InvalidIDLSyntaxError(Exception):
-    def __init__(self, value):
+    def __init__(self, value=None, position=None):
         self.value = value
+        self.position = position
     def __str__(self):
+        if self.position is not None:
+            return '%s: %r' % (self.position, self.value)
         return repr(self.value)
     
 class InvalidDataTypeException(Exception):
-    def __init__(self, value):
+    def __init__(self, value=None, position=None):
         self.value = value
+        self.position = position
     def __str__(self):
+        if self.position is not None:
+            return '%s: %r' % (self.position, self.value)
+        return repr(self.value)
+
+
+class InvalidSnapshotError(Exception):
+    def __init__(self, value=None, position=None):
+        self.value = value
+        self.position = position
+    def __str__(self):
+        if self.position is not None:
+            return '%s: %r' % (self.position, self.value)
         return repr(self.value)
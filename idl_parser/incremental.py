@@ -0,0 +1,168 @@
+"""
+Removal of what some IDL files declared from a parsed tree, so that they can
+be parsed again without parsing the others, see parser.IDLParser.update().
+
+Declarations belong to the file of their location. Channels, modules,
+interfaces and sections can be opened by several files: they are kept as
+long as one of the remaining files opens them (see node.IDLScope).
+"""
+from . import node
+
+# Attributes holding the children of each kind of scope.
+_scopes = {
+    node.CHANNEL : ('_channels', '_modules'),
+    node.MODULE : ('_modules', '_interfaces'),
+    node.INTERFACE : ('_publicsection', '_protectedsection', '_privatesection'),
+    node.SECTION : ('_methods', '_typedefs', '_structs', '_unions', '_enums', '_consts'),
+    }
+
+# Attributes holding the nodes a declaration uses types with, by kind.
+_uses = {
+    node.STRUCT : ('_members',),
+    node.UNION : ('_members',),
+    node.MEMBER : ('_type',),
+    node.UNION_MEMBER : ('_type',),
+    node.METHOD : ('_returns', '_arguments'),
+    node.ARGUMENT : ('_type',),
+    node.TYPEDEF : ('_type',),
+    node.SEQUENCE : ('_type',),
+    node.ARRAY : ('_type',),
+    }
+
+
+# Kinds of the declarations in the symbol table.
+_symbols = node.STRUCT | node.UNION | node.ENUM | node.TYPEDEF
+
+
+def _fileid(location):
+    return None if location is None else location >> 32
+
+
+def _basic_types(n, types):
+    """ Append the IDLBasicTypes used by the declaration n to types. """
+    stack = [n]
+    while stack:
+        n = stack.pop()
+        if n._kind == node.BASIC_TYPE:
+            types.append(n)
+            continue
+        for attr in _uses.get(n._kind, ()):
+            value = getattr(n, attr, None)
+            if isinstance(value, list):
+                stack.extend(value)
+            elif value is not None:
+                stack.append(value)
+
+
+def _prune(scope, fileids, removed, kept):
+    """ Remove the declarations of the files fileids from scope and the scopes below it.
+    The declarations removed are added to removed, by id, and the ones left to kept.
+    :returns: True if no file left opens the scope, which must be removed too.
+    """
+    attrs = _scopes[scope._kind]
+    for attr in attrs:
+        children = getattr(scope, attr)
+        left = []
+        for c in children:
+            if c._kind in _scopes:
+                if not _prune(c, fileids, removed, kept):
+                    left.append(c)
+            elif _fileid(c._location) in fileids:
+                removed[id(c)] = c
+            else:
+                left.append(c)
+                kept.append(c)
+        if len(left) != len(children):
+            setattr(scope, attr, node.IDLNodeList(left))
+
+    if scope._kind == node.INTERFACE:
+        # The first declaration of a name wins, as when parsing.
+        declarations = dict([(name, n) for name, n in scope._declarations.items() if not id(n) in removed])
+        for attr in attrs:
+            for section in getattr(scope, attr):
+                for section_attr in _scopes[node.SECTION]:
+                    for n in getattr(section, section_attr):
+                        declarations.setdefault(n.name, n)
+        scope._declarations = declarations
+
+    scope._openings = [l for l in scope._openings if not _fileid(l) in fileids]
+    if _fileid(scope._location) in fileids:
+        # Opened last where a remaining file opens it.
+        scope._location = scope._openings[-1] if scope._openings else None
+    return not scope._openings and scope._parent is not None
+
+
+def prune(root, fileids):
+    """ Remove everything the files fileids declared from the tree of root.
+    The type references of the other declarations that were resolved to
+    removed declarations are reset, to be linked again by root.link().
+    :param fileids: Set of the ids of the files in root.sources.
+    :returns: List of the declarations removed.
+    """
+    removed = {}
+    kept = []
+    _prune(root, fileids, removed, kept)
+
+    symbols_ = root.symbols
+    types = []
+    for n in removed.values():
+        if n._kind & _symbols:
+            symbols_.remove(n)
+        _basic_types(n, types)
+    symbols_.remove_references(types)
+
+    types = []
+    for n in kept:
+        _basic_types(n, types)
+    for t in types:
+        if t._obj is not None and id(t._obj) in removed:
+            t._obj = None
+            symbols_.add_reference(t)
+    return list(removed.values())
+
+
+def declarations(root, fileids):
+    """ Return the declarations of the files fileids in the tree of root. """
+    result = []
+    stack = [root]
+    while stack:
+        scope = stack.pop()
+        for attr in _scopes[scope._kind]:
+            for c in getattr(scope, attr):
+                if c._kind in _scopes:
+                    stack.append(c)
+                elif _fileid(c._location) in fileids:
+                    result.append(c)
+    return result
+
+
+# Attributes that do not make a declaration differ: where it is, caches,
+# and the declarations its types are linked to.
+_ignored = ('_parent', '_filepath', '_location', '_root_node', '_full_path', '_full_path_name',
+            '_obj', '_block_tokens', '_block_location')
+
+def _signature(value):
+    if isinstance(value, list):
+        return tuple([_signature(v) for v in value])
+    if not isinstance(value, node.IDLNode):
+        return value
+    signature = [value.classname, value.name]
+    for cls in type(value).__mro__:
+        for attr in cls.__dict__.get('__slots__', ()):
+            if not attr in _ignored:
+                signature.append(_signature(getattr(value, attr, None)))
+    return tuple(signature)
+
+def _path(declaration):
+    # Methods have no full_path of their own.
+    return declaration.parent.full_path + declaration.sep + declaration.name
+
+def changes(removed, added):
+    """ Return the set of the full paths of the declarations that differ
+    between removed and added, e.g. before and after parsing files again:
+    the ones only in one of them, and the ones whose definition changed.
+    Declarations that only moved do not count.
+    """
+    before = dict([(_path(n), _signature(n)) for n in removed])
+    after = dict([(_path(n), _signature(n)) for n in added])
+    return set([path for path in set(before) | set(after) if before.get(path) != after.get(path)])
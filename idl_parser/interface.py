@@ -2,15 +2,18 @@ import sys
 from . import node, type, exception
 from . import struct, union, typedef, enum, const
 from . import type as idl_type
-from symbol import argument
 
 
 sep = '::'
 
 class IDLArgument(node.IDLNode):
+    __slots__ = ('_dir', '_type')
+
+    _classname = 'IDLArgument'
+    _kind = node.ARGUMENT
+
     def __init__(self, parent):
-        super(IDLArgument, self).__init__('IDLArgument', '', parent)
-        self._verbose = True
+        super(IDLArgument, self).__init__('', parent)
         self._dir = 'in'
         self._type = None
 
@@ -55,12 +58,17 @@ class IDLArgument(node.IDLNode):
 
         
 class IDLMethod(node.IDLNode):
+    __slots__ = ('_annotations', '_returns', '_arguments',
+                 '_oneway', '_constructor', '_destructor')
+
+    _classname = 'IDLValue'
+    _kind = node.METHOD
+
     def __init__(self, parent):
-        super(IDLMethod, self).__init__('IDLValue', '', parent)
-        self._verbose = True
+        super(IDLMethod, self).__init__('', parent)
         self._annotations = ''
         self._returns = None
-        self._arguments = []
+        self._arguments = node.IDLNodeList()
         
 
     def parse_blocks(self, blocks, filepath=None):
@@ -87,7 +95,7 @@ class IDLMethod(node.IDLNode):
         else:
             self._returns = idl_type.IDLType(blocks[0], self)
             self._name = blocks[1]
-        self._arguments = []
+        self._arguments = node.IDLNodeList()
 
         if not blocks[index-2].startswith('@'):
             print(' -- Invalid Method Annotation (%s) expected @',blocks[index-2])
@@ -108,8 +116,8 @@ class IDLMethod(node.IDLNode):
                     break
 
                 a = IDLArgument(self)
-                self._arguments.append(a)
                 a.parse_blocks(argument_blocks, self.filepath)
+                self._arguments.append(a)
 
                 argument_blocks = []
             else:
@@ -142,10 +150,7 @@ class IDLMethod(node.IDLNode):
         return self._arguments
 
     def argument_by_name(self, name):
-        for a in self.arguments:
-            if a.name == name:
-                return a
-        return None
+        return self._arguments.by_name(name)
 
 
     def forEachArgument(self, func):
@@ -160,17 +165,21 @@ class IDLMethod(node.IDLNode):
 
 
 
-class IDLInterface(node.IDLNode):
+class IDLInterface(node.IDLScope):
+    __slots__ = ('_publicsection', '_protectedsection', '_privatesection', '_declarations')
+
+    _classname = 'IDLInterface'
+    _kind = node.INTERFACE
     
     def __init__(self, name, parent):
-        super(IDLInterface, self).__init__('IDLInterface', name, parent)
-        self._verbose = True
-        self._publicsection = []
-        self._protectedsection = []
-        self._privatesection = []
+        super(IDLInterface, self).__init__(name, parent)
+        self._publicsection = node.IDLNodeList()
+        self._protectedsection = node.IDLNodeList()
+        self._privatesection = node.IDLNodeList()
+        # Methods and declarations of all the sections, by name.
+        self._declarations = {}
         
-    @property
-    def full_path(self):
+    def _path(self):
         return self.parent.full_path + sep + self.name
 
     def to_simple_dic(self, quiet=False, full_path=False, recursive=False, member_only=False):
@@ -191,69 +200,54 @@ class IDLInterface(node.IDLNode):
     
     
     def parse_tokens(self, token_buf, filepath=None):
-        self._filepath=filepath
+        self._open(token_buf, filepath)
         brace = token_buf.pop()
         if not brace == '{':
             if self._verbose: sys.stdout.write('# Error. No brace "{".\n')
             raise exception.InvalidIDLSyntaxError()
         
-        while True:
-
-            token = token_buf.pop()
-            if token == None:
-                if self._verbose: sys.stdout.write('# Error. No brace "}".\n')
-                raise exception.InvalidIDLSyntaxError()
-                
-            elif token == 'public:':
-                name_ = 'public'
-                a = self.public_by_name(name_)
-                if a == None:
-                    a = IDLPublicInterfaceSection(name_, self)
-                    self._publicsection.append(a)
-                a.parse_tokens(token_buf, filepath=filepath)
-                
-            
-            elif token == 'protected:':
-                name_ = 'protected'
-                b = self.protected_by_name(name_)
-                if b == None:
-                    b = IDLProtectedInterfaceSection(name_, self)
-                    self._protectedsection.append(b)
-                b.parse_tokens(token_buf, filepath=filepath)
-
-                
-            elif token == 'private:':
-                name_ = 'private'
-                c = self.private_by_name(name_)
-                if c == None:
-                    c = IDLPrivateInterfaceSection(name_, self)
-                    self._privatesection.append(c)
-                c.parse_tokens(token_buf, filepath=filepath)
-            
-               
-            
-    
-            elif token == '}':
-                token = token_buf.pop()
-                if not token == ';':
-                    if self._verbose: sys.stdout.write('# Error. No semi-colon after "}".\n')
-                    raise exception.InvalidIDLSyntaxError()
-                break
-            
+        self._parse_declarations(token_buf, filepath)
         return True
 
+    def _parse_section(self, visibility, token_buf, filepath):
+        sections = self._section_list(visibility)
+        a = sections.by_name(visibility)
+        if a == None:
+            a = _sections[visibility](visibility, self)
+            sections.append(a)
+        a.parse_tokens(token_buf, filepath=filepath)
 
+    _keywords = {
+        'public:' : lambda self, token_buf, filepath: self._parse_section('public', token_buf, filepath),
+        'protected:' : lambda self, token_buf, filepath: self._parse_section('protected', token_buf, filepath),
+        'private:' : lambda self, token_buf, filepath: self._parse_section('private', token_buf, filepath),
+        '}' : node.IDLScope._parse_close,
+        }
+
+
+
+    def _section_list(self, visibility):
+        if visibility == 'public':
+            return self._publicsection
+        if visibility == 'protected':
+            return self._protectedsection
+        return self._privatesection
+
+    def _add_declaration(self, n):
+        self._declarations.setdefault(n.name, n)
+
+    def declaration_by_name(self, name):
+        """ Return the method, struct, union, enum, const or typedef named name,
+        whatever its section, or None. The first one declared wins.
+        """
+        return self._declarations.get(name)
 
-    
     @property
     def publics(self):
         return self._publicsection
 
     def public_by_name(self, name):
-        for a in self.publics:
-            if name == a.name:
-                return a
-        return None
+        return self._publicsection.by_name(name)
 
     def for_each_public(self, func):
         for a in self.publics:
@@ -264,10 +258,7 @@ class IDLInterface(node.IDLNode):
         return self._protectedsection
 
     def protected_by_name(self, name):
-        for b in self.protecteds:
-            if name == b.name:
-                return b
-        return None
+        return self._protectedsection.by_name(name)
 
     def for_each_protected(self, func):
         for b in self.protecteds:
@@ -278,10 +269,7 @@ class IDLInterface(node.IDLNode):
         return self._privatesection
 
     def private_by_name(self, name):
-        for c in self.privates:
-            if name == c.name:
-                return c
-        return None
+        return self._privatesection.by_name(name)
 
     def for_each_private(self, func):
         for c in self.privates:
@@ -297,25 +285,7 @@ class IDLInterface(node.IDLNode):
     def find_types(self, full_typename):
         if type.is_primitive(full_typename):
             return [type.IDLType(full_typename, self)]
-        typenode = []
-
-        def parse_node(s, name=str(full_typename)):
-            if s.name == name.strip() or s.full_path == name.strip():
-                typenode.append(s)
-
-        def parse_module(i):
-            i.for_each_public(parse_function)
-            i.for_each_protected(parse_function)
-            i.for_each_private(parse_function)
-            
-        def parse_function(m):
-            typefull = m.find_types(full_typename)
-            if (typefull.__len__() > 0):
-                typenode.append(typefull)
-
-        parse_module(self)
-
-        return typenode
+        return self.root_node.symbols.find(full_typename, scope=self)
 
 
 
@@ -324,26 +294,35 @@ class IDLInterface(node.IDLNode):
 ############################################################################################################################################
 
 
+class IDLInterfaceSection(node.IDLScope):
+    """ Public, protected or private section of an interface, holding
+    methods and type declarations. Its name is its visibility.
+    """
+    __slots__ = ('_methods', '_typedefs', '_structs', '_unions', '_enums', '_consts',
+                 '_block_tokens', '_block_location')
 
-############################
-# CLASS FOR PUBLIC SECTION #
-############################
-class IDLPublicInterfaceSection(node.IDLNode):
+    _classname = 'IDLInterfaceSection'
+    _kind = node.SECTION
     
     def __init__(self, name, parent):
-        super(IDLPublicInterfaceSection, self).__init__('IDLPublicInterfaceSection', name, parent)
-        self._verbose = True
-        self._methods = []
-        self._typedefs = []
-        self._structs = []
-        self._unions = []
-        self._enums = []
-        self._consts = []
+        super(IDLInterfaceSection, self).__init__(name, parent)
+        self._methods = node.IDLNodeList()
+        self._typedefs = node.IDLNodeList()
+        self._structs = node.IDLNodeList()
+        self._unions = node.IDLNodeList()
+        self._enums = node.IDLNodeList()
+        self._consts = node.IDLNodeList()
+        # Tokens of the method being parsed.
+        self._block_tokens = None
+        self._block_location = None
         
-    @property
-    def full_path(self):
+    def _path(self):
         return self.parent.full_path + sep + self.name
 
+    @property
+    def visibility(self):
+        return self.name
+
     def to_simple_dic(self, quiet=False, full_path=False, recursive=False, member_only=False):
         if quiet:
             return 'interface %s' % self.name
@@ -368,728 +347,119 @@ class IDLPublicInterfaceSection(node.IDLNode):
         return dic
     
     def parse_tokens(self, token_buf, filepath=None):
-        self._filepath=filepath
+        self._open(token_buf, filepath)
         brace = token_buf.pop()
         if not brace == '{':
             if self._verbose: sys.stdout.write('# Error. No brace "{".\n')
             raise exception.InvalidIDLSyntaxError()
         
-        block_tokens = []        
-        while True:
-
-            token = token_buf.pop()
-            if token == None:
-                if self._verbose: sys.stdout.write('# Error. No brace "}".\n')
-                raise exception.InvalidIDLSyntaxError()
-                
-            elif token == 'typedef':
-                blocks = []
-                while True:
-                    t = token_buf.pop()
-                    if t == None:
-                        raise exception.InvalidIDLSyntaxError()
-                    elif t == ';':
-                        break
-                    else:
-                        blocks.append(t)
-                t = typedef.IDLTypedef(self)
-                self._typedefs.append(t)
-                t.parse_blocks(blocks, filepath=filepath)
-                
-                continue
-                
-            elif token == 'struct':
-                name_ = token_buf.pop()
-                s_ = self.struct_by_name(name_)
-                s = struct.IDLStruct(name_, self)
-                s.parse_tokens(token_buf, filepath=filepath)
-                if s_:
-                    if self._verbose: sys.stdout.write('# Error. Same Struct Defined (%s)\n' % name_)
-                #    raise exception.InvalidIDLSyntaxError
-                else:
-                    self._structs.append(s)
-                continue
-
-            elif token == 'union':
-                name_ = token_buf.pop()
-                u_ = self.union_by_name(name_)
-                u = union.IDLUnion(name_, self)
-                u.parse_tokens(token_buf, filepath=filepath)
-                if u_:
-                    if self._verbose: sys.stdout.write('# Error. Same Union Defined (%s)\n' % name_)
-                #    raise exception.InvalidIDLSyntaxError
-                else:
-                    self._unions.append(u)
-                continue
-
-            elif token == 'enum':
-                name_ = token_buf.pop()
-                s = enum.IDLEnum(name_, self)
-                s.parse_tokens(token_buf, filepath)
-                s_ = self.enum_by_name(name_)
-                if s_:
-                    if self._verbose: sys.stdout.write('# Error. Same Enum Defined (%s)\n' % name_)
-                #    raise InvalidIDLSyntaxError
-                else:
-                    self._enums.append(s)
-
-                continue
-
-            elif token == 'const':
-                values = []
-                while True:
-                    t = token_buf.pop()
-                    if t == ';':
-                        break
-                    values.append(t)
-                
-                if (values.__len__() < 3):
-                    raise exception.InvalidIDLSyntaxError("# Error Invalid syntax in constant definition")
-
-                value_ = values[-1]
-                name_ = values[-3]
-                typename = values[-2]
-                for t in values[:-3]:
-                    typename = typename + ' ' + t
-                typename = typename.strip()
-                s = const.IDLConst(name_, typename, value_, self, filepath=filepath)
-                s_ = self.const_by_name(name_)
-                if s_:
-                    if self._verbose: sys.stdout.write('# Error. Same Const Defined (%s)\n' % name_)
-                else:
-                    self._consts.append(s)
-                    
-                continue
-                                
-            elif token == '}':
-                token = token_buf.pop()
-                if not token == ';':
-                    if self._verbose: sys.stdout.write('# Error. No semi-colon after "}".\n')
-                    raise exception.InvalidIDLSyntaxError()
-                break
-            
-            if token == ';':
-                self._parse_block(block_tokens)
-                block_tokens = []
-                continue
-            
-            
-            block_tokens.append(token)
-            
+        self._block_tokens = []
+        self._parse_declarations(token_buf, filepath)
+        self._block_tokens = None
         self._post_process()
 
+    def _parse_token(self, token, token_buf):
+        if not self._block_tokens:
+            self._block_location = token_buf.location
+        self._block_tokens.append(token)
 
+    def _parse_method(self, token_buf, filepath):
+        self._parse_block(self._block_tokens, self._block_location)
+        self._block_tokens = []
 
-    def _post_process(self):
-        self.forEachMethod(lambda m : m.post_process())
-
-    def _parse_block(self, blocks):
-        v = IDLMethod(self)
-        v.parse_blocks(blocks, self.filepath)
-        self._methods.append(v)
-
-    @property
-    def methods(self):
-        return self._methods
-
-    def method_by_name(self, name):
-        for m in self.methods:
-            if name == m.name:
-                return m
-        return None
-
-    def forEachMethod(self, func):
-        for m in self.methods:
-            func(m)
-
-    @property
-    def structs(self):
-        return self._structs
-
-    def struct_by_name(self, name):
-        for s in self.structs:
-            if s.name == name:
-                return s
-        return None
-
-    def for_each_struct(self, func, filter=None):
-        retval = []
-        for m in self.structs:
-            if filter:
-                if filter(m):
-                    retval.append(func(m))
-                pass
-            else:
-                retval.append(func(m))
-        return retval
-    
-    @property
-    def unions(self):
-        return self._unions
-
-    def union_by_name(self, name):
-        for u in self.unions:
-            if u.name == name:
-                return u
-        return None
-
-    def for_each_union(self, func, filter=None):
-        retval = []
-        for u in self.unions:
-            if filter:
-                if filter(u):
-                    retval.append(func(u))
-                pass
-            else:
-                retval.append(func(u))
-        return retval
-
-    @property
-    def enums(self):
-        return self._enums
-
-    def enum_by_name(self, name):
-        for e in self.enums:
-            if e.name == name:
-                return e
-        return None
-
-    def for_each_enum(self, func):
-        retval = []
-        for m in self.enums:
-            retval.append(func(m))
-        return retval
-
-    @property
-    def consts(self):
-        return self._consts
-
-    def const_by_name(self, name):
-        for c in self.consts:
-            if c.name == name:
-                return c
-        return None
-
-    def for_each_const(self, func):
-        retval = []
-        for m in self.consts:
-            retval.append(func(m))
-        return retval
-            
-
-    @property
-    def typedefs(self):
-        return self._typedefs
-
-    def typedef_by_name(self, name):
-        for t in self.typedefs:
-            if t.name == name:
-                return t
-        return None
-
-    def for_each_typedef(self, func):
-        retval = []
-        for m in self.typedefs:
-            retval.append(func(m))
-
-    def find_types(self, full_typename):
-        if type.is_primitive(full_typename):
-            return [type.IDLType(full_typename, self)]
-        typenode = []
-
-        def parse_node(s, name=str(full_typename)):
-            if s.name == name.strip() or s.full_path == name.strip():
-                typenode.append(s)
-
-        def parse_module(m):
-            #m.for_each_module(parse_module)
-            m.for_each_struct(parse_node)
-            m.for_each_union(parse_node)
-            m.for_each_typedef(parse_node)
-            m.for_each_enum(parse_node)
-            #m.for_each_interface(parse_function)
-
-        parse_module(self)
-
-        return typenode
-
-
-
-
-
-
-
-
-
-###############################
-# CLASS FOR PROTECTED SECTION #
-###############################
-class IDLProtectedInterfaceSection(node.IDLNode):
-    
-    def __init__(self, name, parent):
-        super(IDLProtectedInterfaceSection, self).__init__('IDLProtectedInterfaceSection', name, parent)
-        self._verbose = True
-        self._methods = []
-        self._typedefs = []
-        self._structs = []
-        self._unions = []
-        self._enums = []
-        self._consts = []
-        
-        
-    @property
-    def full_path(self):
-        return self.parent.full_path + sep + self.name
+    def _add(self, nodes, n):
+        nodes.append(n)
+        self.parent._add_declaration(n)
 
-    def to_simple_dic(self, quiet=False, full_path=False, recursive=False, member_only=False):
-        if quiet:
-            return 'interface %s' % self.name
-        dic = { 'interface ' + self.name : [s.to_simple_dic(quiet) for s in self.structs] + 
-               [m.to_simple_dic() for m in self.methods] +
-               [e.to_simple_dic(quiet) for e in self.enums] + 
-               [u.to_simple_dic(quiet) for u in self.unions] + 
-               [t.to_simple_dic(quiet) for t in self.typedefs] + 
-               [t.to_simple_dic(quiet) for t in self.consts] }
-        return dic
+    def _add_unique(self, nodes, n, what):
+        if nodes.by_name(n.name) is not None:
+            if self._verbose: sys.stdout.write('# Error. Same %s Defined (%s)\n' % (what, n.name))
+            return False
+        self._add(nodes, n)
+        return True
 
-    def to_dic(self):
-        dic = { 'name' : self.name,
-                'filepath' : self.filepath, 
-                'classname' : self.classname,
-                'typedefs' : [t.to_dic() for t in self.typedefs],
-                'structs' : [s.to_dic() for s in self.structs],
-                'unions' : [u.to_dic() for u in self.structs],
-                'enums' : [e.to_dic() for e in self.enums],
-                'consts' : [c.to_dic() for c in self.consts],
-                'methods' : [m.to_dic() for m in self.methods] }
-        return dic
-    
-    def parse_tokens(self, token_buf, filepath=None):
-        self._filepath=filepath
-        brace = token_buf.pop()
-        if not brace == '{':
-            if self._verbose: sys.stdout.write('# Error. No brace "{".\n')
-            raise exception.InvalidIDLSyntaxError()
-        
-        block_tokens = []        
+    def _parse_typedef(self, token_buf, filepath):
+        location = token_buf.location
+        blocks = []
         while True:
-
-            token = token_buf.pop()
-            if token == None:
-                if self._verbose: sys.stdout.write('# Error. No brace "}".\n')
+            t = token_buf.pop()
+            if t == None:
                 raise exception.InvalidIDLSyntaxError()
-                
-            elif token == 'typedef':
-                blocks = []
-                while True:
-                    t = token_buf.pop()
-                    if t == None:
-                        raise exception.InvalidIDLSyntaxError()
-                    elif t == ';':
-                        break
-                    else:
-                        blocks.append(t)
-                t = typedef.IDLTypedef(self)
-                self._typedefs.append(t)
-                t.parse_blocks(blocks, filepath=filepath)
-                
-                continue
-                
-            elif token == 'struct':
-                name_ = token_buf.pop()
-                s_ = self.struct_by_name(name_)
-                s = struct.IDLStruct(name_, self)
-                s.parse_tokens(token_buf, filepath=filepath)
-                if s_:
-                    if self._verbose: sys.stdout.write('# Error. Same Struct Defined (%s)\n' % name_)
-                #    raise exception.InvalidIDLSyntaxError
-                else:
-                    self._structs.append(s)
-                continue
-            
-            elif token == 'union':
-                name_ = token_buf.pop()
-                u_ = self.union_by_name(name_)
-                u = union.IDLUnion(name_, self)
-                u.parse_tokens(token_buf, filepath=filepath)
-                if u_:
-                    if self._verbose: sys.stdout.write('# Error. Same Union Defined (%s)\n' % name_)
-                #    raise exception.InvalidIDLSyntaxError
-                else:
-                    self._unions.append(u)
-                continue
-
-            elif token == 'enum':
-                name_ = token_buf.pop()
-                s = enum.IDLEnum(name_, self)
-                s.parse_tokens(token_buf, filepath)
-                s_ = self.enum_by_name(name_)
-                if s_:
-                    if self._verbose: sys.stdout.write('# Error. Same Enum Defined (%s)\n' % name_)
-                #    raise InvalidIDLSyntaxError
-                else:
-                    self._enums.append(s)
-
-                continue
-
-            elif token == 'const':
-                values = []
-                while True:
-                    t = token_buf.pop()
-                    if t == ';':
-                        break
-                    values.append(t)
-                
-                if (values.__len__() < 3):
-                    raise exception.InvalidIDLSyntaxError("# Error Invalid syntax in constant definition")
-
-                value_ = values[-1]
-                name_ = values[-3]
-                typename = values[-2]
-                for t in values[:-3]:
-                    typename = typename + ' ' + t
-                typename = typename.strip()
-                s = const.IDLConst(name_, typename, value_, self, filepath=filepath)
-                s_ = self.const_by_name(name_)
-                if s_:
-                    if self._verbose: sys.stdout.write('# Error. Same Const Defined (%s)\n' % name_)
-                else:
-                    self._consts.append(s)
-                    
-                continue
-                                
-            elif token == '}':
-                token = token_buf.pop()
-                if not token == ';':
-                    if self._verbose: sys.stdout.write('# Error. No semi-colon after "}".\n')
-                    raise exception.InvalidIDLSyntaxError()
+            elif t == ';':
                 break
-            
-            if token == ';':
-                self._parse_block(block_tokens)
-                block_tokens = []
-                continue
-            
-            
-            block_tokens.append(token)
-            
-        self._post_process()
-
-
-
-    def _post_process(self):
-        self.forEachMethod(lambda m : m.post_process())
-
-    def _parse_block(self, blocks):
-        v = IDLMethod(self)
-        v.parse_blocks(blocks, self.filepath)
-        self._methods.append(v)
-
-    @property
-    def methods(self):
-        return self._methods
-
-    def method_by_name(self, name):
-        for m in self.methods:
-            if name == m.name:
-                return m
-        return None
-
-    def forEachMethod(self, func):
-        for m in self.methods:
-            func(m)
-
-    @property
-    def structs(self):
-        return self._structs
-
-    def struct_by_name(self, name):
-        for s in self.structs:
-            if s.name == name:
-                return s
-        return None
-
-    def for_each_struct(self, func, filter=None):
-        retval = []
-        for m in self.structs:
-            if filter:
-                if filter(m):
-                    retval.append(func(m))
-                pass
-            else:
-                retval.append(func(m))
-        return retval
-
-    @property
-    def unions(self):
-        return self._unions
-
-    def union_by_name(self, name):
-        for u in self.unionss:
-            if u.name == name:
-                return u
-        return None
-
-    def for_each_union(self, func, filter=None):
-        retval = []
-        for u in self.unions:
-            if filter:
-                if filter(u):
-                    retval.append(func(u))
-                pass
             else:
-                retval.append(func(u))
-        return retval
-    
-    @property
-    def enums(self):
-        return self._enums
-
-    def enum_by_name(self, name):
-        for e in self.enums:
-            if e.name == name:
-                return e
-        return None
-
-    def for_each_enum(self, func):
-        retval = []
-        for m in self.enums:
-            retval.append(func(m))
-        return retval
-
-    @property
-    def consts(self):
-        return self._consts
-
-    def const_by_name(self, name):
-        for c in self.consts:
-            if c.name == name:
-                return c
-        return None
-
-    def for_each_const(self, func):
-        retval = []
-        for m in self.consts:
-            retval.append(func(m))
-        return retval
-            
-
-    @property
-    def typedefs(self):
-        return self._typedefs
-
-    def typedef_by_name(self, name):
-        for t in self.typedefs:
-            if t.name == name:
-                return t
-        return None
-
-    def for_each_typedef(self, func):
-        retval = []
-        for m in self.typedefs:
-            retval.append(func(m))
-
-    def find_types(self, full_typename):
-        if type.is_primitive(full_typename):
-            return [type.IDLType(full_typename, self)]
-        typenode = []
-
-        def parse_node(s, name=str(full_typename)):
-            if s.name == name.strip() or s.full_path == name.strip():
-                typenode.append(s)
-
-        def parse_module(m):
-            #m.for_each_module(parse_module)
-            m.for_each_struct(parse_node)
-            m.for_each_typedef(parse_node)
-            m.for_each_enum(parse_node)
-            #m.for_each_interface(parse_function)
-
-        parse_module(self)
-
-        return typenode
-
-        
-        
-        
-        
-        
-        
-
-#############################
-# CLASS FOR PRIVATE SECTION #
-#############################
-class IDLPrivateInterfaceSection(node.IDLNode):
-    
-    def __init__(self, name, parent):
-        super(IDLPrivateInterfaceSection, self).__init__('IDLPrivateInterfaceSection', name, parent)
-        self._verbose = True
-        self._methods = []
-        self._typedefs = []
-        self._structs = []
-        self._unions = []
-        self._enums = []
-        self._consts = []
-
-
-        
-    @property
-    def full_path(self):
-        return self.parent.full_path + sep + self.name
-
-    def to_simple_dic(self, quiet=False, full_path=False, recursive=False, member_only=False):
-        if quiet:
-            return 'interface %s' % self.name
-        dic = { 'interface ' + self.name : [s.to_simple_dic(quiet) for s in self.structs] + 
-               [m.to_simple_dic() for m in self.methods] +
-               [e.to_simple_dic(quiet) for e in self.enums] + 
-               [u.to_simple_dic(quiet) for u in self.unions] + 
-               [t.to_simple_dic(quiet) for t in self.typedefs] + 
-               [t.to_simple_dic(quiet) for t in self.consts] }
-        return dic
-
-    def to_dic(self):
-        dic = { 'name' : self.name,
-                'filepath' : self.filepath, 
-                'classname' : self.classname,
-                'typedefs' : [t.to_dic() for t in self.typedefs],
-                'structs' : [s.to_dic() for s in self.structs],
-                'unions' : [u.to_dic() for u in self.structs],
-                'enums' : [e.to_dic() for e in self.enums],
-                'consts' : [c.to_dic() for c in self.consts],
-                'methods' : [m.to_dic() for m in self.methods] }
-        return dic
-    
-    def parse_tokens(self, token_buf, filepath=None):
-        self._filepath=filepath
-        brace = token_buf.pop()
-        if not brace == '{':
-            if self._verbose: sys.stdout.write('# Error. No brace "{".\n')
-            raise exception.InvalidIDLSyntaxError()
-        
-        block_tokens = []        
+                blocks.append(t)
+        t = typedef.IDLTypedef(self)
+        t._location = location
+        t.parse_blocks(blocks, filepath=filepath)
+        self._add(self._typedefs, t)
+        self.root_node.symbols.add(t)
+
+    def _parse_struct(self, token_buf, filepath):
+        s = struct.IDLStruct(token_buf.pop(), self)
+        s.parse_tokens(token_buf, filepath=filepath)
+        if self._add_unique(self._structs, s, 'Struct'):
+            self.root_node.symbols.add(s)
+
+    def _parse_union(self, token_buf, filepath):
+        u = union.IDLUnion(token_buf.pop(), self)
+        u.parse_tokens(token_buf, filepath=filepath)
+        if self._add_unique(self._unions, u, 'Union'):
+            self.root_node.symbols.add(u)
+
+    def _parse_enum(self, token_buf, filepath):
+        e = enum.IDLEnum(token_buf.pop(), self)
+        e.parse_tokens(token_buf, filepath)
+        if self._add_unique(self._enums, e, 'Enum'):
+            self.root_node.symbols.add(e)
+
+    def _parse_const(self, token_buf, filepath):
+        location = token_buf.location
+        values = []
         while True:
-
-            token = token_buf.pop()
-            if token == None:
-                if self._verbose: sys.stdout.write('# Error. No brace "}".\n')
-                raise exception.InvalidIDLSyntaxError()
-                
-            elif token == 'typedef':
-                blocks = []
-                while True:
-                    t = token_buf.pop()
-                    if t == None:
-                        raise exception.InvalidIDLSyntaxError()
-                    elif t == ';':
-                        break
-                    else:
-                        blocks.append(t)
-                t = typedef.IDLTypedef(self)
-                self._typedefs.append(t)
-                t.parse_blocks(blocks, filepath=filepath)
-                
-                continue
-                
-            elif token == 'struct':
-                name_ = token_buf.pop()
-                s_ = self.struct_by_name(name_)
-                s = struct.IDLStruct(name_, self)
-                s.parse_tokens(token_buf, filepath=filepath)
-                if s_:
-                    if self._verbose: sys.stdout.write('# Error. Same Struct Defined (%s)\n' % name_)
-                #    raise exception.InvalidIDLSyntaxError
-                else:
-                    self._structs.append(s)
-                continue
-            
-            elif token == 'union':
-                name_ = token_buf.pop()
-                u_ = self.union_by_name(name_)
-                u = union.IDLUnion(name_, self)
-                u.parse_tokens(token_buf, filepath=filepath)
-                if u_:
-                    if self._verbose: sys.stdout.write('# Error. Same Union Defined (%s)\n' % name_)
-                #    raise exception.InvalidIDLSyntaxError
-                else:
-                    self._unions.append(u)
-                continue
-
-            elif token == 'enum':
-                name_ = token_buf.pop()
-                s = enum.IDLEnum(name_, self)
-                s.parse_tokens(token_buf, filepath)
-                s_ = self.enum_by_name(name_)
-                if s_:
-                    if self._verbose: sys.stdout.write('# Error. Same Enum Defined (%s)\n' % name_)
-                #    raise InvalidIDLSyntaxError
-                else:
-                    self._enums.append(s)
-
-                continue
-
-            elif token == 'const':
-                values = []
-                while True:
-                    t = token_buf.pop()
-                    if t == ';':
-                        break
-                    values.append(t)
-                
-                if (values.__len__() < 3):
-                    raise exception.InvalidIDLSyntaxError("# Error Invalid syntax in constant definition")
-
-                value_ = values[-1]
-                name_ = values[-3]
-                typename = values[-2]
-                for t in values[:-3]:
-                    typename = typename + ' ' + t
-                typename = typename.strip()
-                s = const.IDLConst(name_, typename, value_, self, filepath=filepath)
-                s_ = self.const_by_name(name_)
-                if s_:
-                    if self._verbose: sys.stdout.write('# Error. Same Const Defined (%s)\n' % name_)
-                else:
-                    self._consts.append(s)
-                    
-                continue
-                                
-            elif token == '}':
-                token = token_buf.pop()
-                if not token == ';':
-                    if self._verbose: sys.stdout.write('# Error. No semi-colon after "}".\n')
-                    raise exception.InvalidIDLSyntaxError()
+            t = token_buf.pop()
+            if t == ';':
                 break
-            
-            if token == ';':
-                self._parse_block(block_tokens)
-                block_tokens = []
-                continue
-            
-            
-            block_tokens.append(token)
-            
-        self._post_process()
-
-
+            values.append(t)
+        
+        if (values.__len__() < 3):
+            raise exception.InvalidIDLSyntaxError("# Error Invalid syntax in constant definition")
+
+        value_ = values[-1]
+        name_ = values[-3]
+        typename = values[-2]
+        for t in values[:-3]:
+            typename = typename + ' ' + t
+        typename = typename.strip()
+        c = const.IDLConst(name_, typename, value_, self, filepath=filepath)
+        c._location = location
+        self._add_unique(self._consts, c, 'Const')
+
+    _keywords = {
+        'typedef' : _parse_typedef,
+        'struct' : _parse_struct,
+        'union' : _parse_union,
+        'enum' : _parse_enum,
+        'const' : _parse_const,
+        ';' : _parse_method,
+        '}' : node.IDLScope._parse_close,
+        }
 
     def _post_process(self):
         self.forEachMethod(lambda m : m.post_process())
 
-    def _parse_block(self, blocks):
+    def _parse_block(self, blocks, location=None):
         v = IDLMethod(self)
+        v._location = location
         v.parse_blocks(blocks, self.filepath)
-        self._methods.append(v)
+        self._add(self._methods, v)
 
     @property
     def methods(self):
         return self._methods
 
     def method_by_name(self, name):
-        for m in self.methods:
-            if name == m.name:
-                return m
-        return None
+        return self._methods.by_name(name)
 
     def forEachMethod(self, func):
         for m in self.methods:
@@ -1100,10 +470,7 @@ class IDLPrivateInterfaceSection(node.IDLNode):
         return self._structs
 
     def struct_by_name(self, name):
-        for s in self.structs:
-            if s.name == name:
-                return s
-        return None
+        return self._structs.by_name(name)
 
     def for_each_struct(self, func, filter=None):
         retval = []
@@ -1121,10 +488,7 @@ class IDLPrivateInterfaceSection(node.IDLNode):
         return self._unions
 
     def union_by_name(self, name):
-        for u in self.unionss:
-            if u.name == name:
-                return u
-        return None
+        return self._unions.by_name(name)
 
     def for_each_union(self, func, filter=None):
         retval = []
@@ -1142,10 +506,7 @@ class IDLPrivateInterfaceSection(node.IDLNode):
         return self._enums
 
     def enum_by_name(self, name):
-        for e in self.enums:
-            if e.name == name:
-                return e
-        return None
+        return self._enums.by_name(name)
 
     def for_each_enum(self, func):
         retval = []
@@ -1158,10 +519,7 @@ class IDLPrivateInterfaceSection(node.IDLNode):
         return self._consts
 
     def const_by_name(self, name):
-        for c in self.consts:
-            if c.name == name:
-                return c
-        return None
+        return self._consts.by_name(name)
 
     def for_each_const(self, func):
         retval = []
@@ -1175,10 +533,7 @@ class IDLPrivateInterfaceSection(node.IDLNode):
         return self._typedefs
 
     def typedef_by_name(self, name):
-        for t in self.typedefs:
-            if t.name == name:
-                return t
-        return None
+        return self._typedefs.by_name(name)
 
     def for_each_typedef(self, func):
         retval = []
@@ -1188,22 +543,30 @@ class IDLPrivateInterfaceSection(node.IDLNode):
     def find_types(self, full_typename):
         if type.is_primitive(full_typename):
             return [type.IDLType(full_typename, self)]
-        typenode = []
+        return self.root_node.symbols.find(full_typename, scope=self)
+
+
+class IDLPublicInterfaceSection(IDLInterfaceSection):
+    __slots__ = ()
+
+    _classname = 'IDLPublicInterfaceSection'
+
+
+class IDLProtectedInterfaceSection(IDLInterfaceSection):
+    __slots__ = ()
 
-        def parse_node(s, name=str(full_typename)):
-            if s.name == name.strip() or s.full_path == name.strip():
-                typenode.append(s)
+    _classname = 'IDLProtectedInterfaceSection'
 
-        def parse_interface(m):
-            #m.for_each_module(parse_module)
-            m.for_each_struct(parse_node)
-            m.for_each_typedef(parse_node)
-            m.for_each_enum(parse_node)
-            #m.for_each_interface(parse_function)
 
-        parse_interface(self)
+class IDLPrivateInterfaceSection(IDLInterfaceSection):
+    __slots__ = ()
 
-        return typenode
+    _classname = 'IDLPrivateInterfaceSection'
 
 
-       
+# Section classes by visibility.
+_sections = {
+    'public' : IDLPublicInterfaceSection,
+    'protected' : IDLProtectedInterfaceSection,
+    'private' : IDLPrivateInterfaceSection,
+    }
@@ -0,0 +1,141 @@
+import array, re
+
+# Token kinds
+DIRECTIVE = 1
+PUNCT = 2
+WORD = 3
+
+punctuations = '{}(),;'
+
+# Comments are matched outside of the group, so that findall() returns an
+# empty string for them and the token itself for anything else.
+_pattern = r'''
+    //[^\n]*                                     # line comment
+  | /\*.*?(?:\*/|\Z)                             # block comment
+  | ( ^[ \t]*\#[^\n/]*(?:/(?![/*])[^\n/]*)*      # preprocessor directive
+    | [{}(),;]                                   # punctuation
+    | [^\s{}(),;/]+(?:/(?![/*])[^\s{}(),;/]*)*   # any other word
+    | /
+    )
+'''
+_flags = re.MULTILINE | re.DOTALL | re.VERBOSE
+_scanner = re.compile(_pattern, _flags)
+_byte_scanner = re.compile(_pattern.encode('ascii'), _flags)
+_newline = re.compile('\n')
+_byte_newline = re.compile(b'\n')
+
+try:
+    _text_types = (str, unicode)
+except NameError:
+    _text_types = (str,)
+
+
+def tokenize(text, encoding='utf-8'):
+    """ Scan IDL source once and return the list of its tokens.
+    Comments are dropped, punctuation '{ } ( ) , ;' is split from the
+    surrounding words and every preprocessor line is returned as a single
+    token starting with '#'.
+    :param text: IDL source string, or bytes-like object such as a memory-mapped
+                 file. In that case only the tokens are decoded, never the comments
+                 nor the buffer as a whole.
+    :param encoding: Encoding of bytes-like sources.
+    :returns: List of token strings. Use kind() to classify them.
+    """
+    if isinstance(text, _text_types):
+        found = _scanner.findall(text)
+        tokens = []
+        append = tokens.append
+        for t in found:
+            if not t:
+                continue
+            if t[0] in ' \t#':
+                t = t.strip()
+            append(t)
+        return tokens
+    if isinstance(text, bytearray):
+        text = bytes(text) # Python 2 matches slices of it, which can not be hashed
+    found = _byte_scanner.findall(text)
+    # Keywords and type names repeat a lot: decode each distinct token once
+    # and share the resulting string.
+    decoded = {}
+    tokens = []
+    append = tokens.append
+    for b in found:
+        if not b:
+            continue
+        t = decoded.get(b)
+        if t is None:
+            t = b.decode(encoding)
+            if t[0] in ' \t#':
+                t = t.strip()
+            decoded[b] = t
+        append(t)
+    return tokens
+
+
+def offsets(text):
+    """ Return the start offset of every token tokenize() returns for text,
+    in the same order. Offsets are byte offsets for bytes-like sources.
+    This is the slow path used to resolve positions.
+    """
+    scanner = _scanner if isinstance(text, _text_types) else _byte_scanner
+    starts = array.array('L')
+    append = starts.append
+    for m in scanner.finditer(text):
+        t = m.group(1)
+        if t is None:
+            continue
+        append(m.start() + len(t) - len(t.lstrip()))
+    return starts
+
+
+def line_starts(text):
+    """ Return the offsets at which the lines of text start. """
+    newline = _newline if isinstance(text, _text_types) else _byte_newline
+    return [0] + [m.end() for m in newline.finditer(text)]
+
+
+def kind(token):
+    """ Return the kind (DIRECTIVE, PUNCT or WORD) of a token returned by tokenize(). """
+    if token[0] == '#':
+        return DIRECTIVE
+    if len(token) == 1 and token in punctuations:
+        return PUNCT
+    return WORD
+
+
+# Number of distinct tokens tokenize_lines() shares at most.
+_shared_tokens = 1024
+
+def tokenize_lines(lines):
+    """ Generator version of tokenize() consuming an iterable of lines
+    (e.g. an open file), so that the source never has to be held in memory
+    as a whole. Block comments may span several lines.
+    :param lines: Iterable of source lines.
+    """
+    # As in tokenize(), repeated tokens share one string. Only the recent
+    # ones are remembered, so that memory use does not grow with the source.
+    seen = {}
+    in_comment = False
+    for line in lines:
+        if in_comment:
+            end = line.find('*/')
+            if end < 0:
+                continue
+            line = line[end+2:]
+            in_comment = False
+        for m in _scanner.finditer(line):
+            t = m.group(1)
+            if t is None:
+                c = m.group()
+                if c[1] == '*' and (len(c) < 4 or not c.endswith('*/')):
+                    in_comment = True
+                continue
+            if t[0] in ' \t#':
+                t = t.strip()
+            shared = seen.get(t)
+            if shared is None:
+                if len(seen) >= _shared_tokens:
+                    seen.clear()
+                shared = seen[t] = t
+            yield shared
@@ -5,23 +5,26 @@ from . import interface
 global_namespace = '__global__'
 sep = '::'
 
-class IDLModule(node.IDLNode):
+class IDLModule(node.IDLScope):
+    __slots__ = ('_interfaces', '_modules')
+
+    _classname = 'IDLModule'
+    _kind = node.MODULE
+    _verbose = False
 
     def __init__(self, name=None, parent = None):
-        super(IDLModule, self).__init__('IDLModule', name, parent)
-        self._verbose = False
+        super(IDLModule, self).__init__(name, parent)
         if name is None:
             self._name = global_namespace
             
-        self._interfaces = []
-        self._modules = []
+        self._interfaces = node.IDLNodeList()
+        self._modules = node.IDLNodeList()
 
     @property
     def is_global(self):
         return self.name == global_namespace
         
-    @property
-    def full_path(self):
+    def _path(self):
         if self.parent is None:
             return '' # self.name
         else:
@@ -44,46 +47,42 @@ class IDLModule(node.IDLNode):
     
 
     def parse_tokens(self, token_buf, filepath=None):
-        self._filepath = filepath
+        self._open(token_buf, filepath)
         if not self.name == global_namespace:
             brace = token_buf.pop()
             if not brace == '{':
                 if self._verbose: sys.stdout.write('# Error. No brace "{".\n')
                 raise exception.InvalidIDLSyntaxError()
 
-        while True:
-            token = token_buf.pop()
-            if token == None:
-                if self.name == global_namespace:
-                    break
-                if self._verbose: sys.stdout.write('# Error. No brace "}".\n')
-                raise exception.InvalidIDLSyntaxError()
-            elif token == 'module':
-                name_ = token_buf.pop()
-                m = self.module_by_name(name_)
-                if m == None:
-                    m = IDLModule(name_, self)
-                    self._modules.append(m)
-                m.parse_tokens(token_buf, filepath=filepath)
-                
-            elif token == 'interface':
-                name_ = token_buf.pop()
-                i = self.interface_by_name(name_)
-                if i == None:
-                    i = interface.IDLInterface(name_, self)
-                    self._interfaces.append(i)
-                i.parse_tokens(token_buf, filepath=filepath)
-
-                
-            elif token == '}':
-                token = token_buf.pop()
-                if not token == ';':
-                    if self._verbose: sys.stdout.write('# Error. No semi-colon after "}".\n')
-                    raise exception.InvalidIDLSyntaxError()
-                break
-            
+        self._parse_declarations(token_buf, filepath)
         return True
 
+    def _parse_end(self):
+        if not self.name == global_namespace:
+            super(IDLModule, self)._parse_end()
+
+    def _parse_module(self, token_buf, filepath):
+        name_ = token_buf.pop()
+        m = self.module_by_name(name_)
+        if m == None:
+            m = IDLModule(name_, self)
+            self._modules.append(m)
+        m.parse_tokens(token_buf, filepath=filepath)
+
+    def _parse_interface(self, token_buf, filepath):
+        name_ = token_buf.pop()
+        i = self.interface_by_name(name_)
+        if i == None:
+            i = interface.IDLInterface(name_, self)
+            self._interfaces.append(i)
+        i.parse_tokens(token_buf, filepath=filepath)
+
+    _keywords = {
+        'module' : _parse_module,
+        'interface' : _parse_interface,
+        '}' : node.IDLScope._parse_close,
+        }
+
 
 
     @property
@@ -91,10 +90,7 @@ class IDLModule(node.IDLNode):
         return self._modules
 
     def module_by_name(self, name):
-        for m in self.modules:
-            if m.name == name:
-                return m
-        return None
+        return self._modules.by_name(name)
 
     def for_each_module(self, func):
         retval = []
@@ -107,10 +103,7 @@ class IDLModule(node.IDLNode):
         return self._interfaces
 
     def interface_by_name(self, name):
-        for i in self.interfaces:
-            if i.name == name:
-                return i
-        return None
+        return self._interfaces.by_name(name)
 
     def for_each_interface(self, func):
         retval = []
@@ -121,30 +114,7 @@ class IDLModule(node.IDLNode):
     def find_types(self, full_typename):
         if type.is_primitive(full_typename):
             return [type.IDLType(full_typename, self)]
-        typenode = []
-
-        def parse_node(s, name=str(full_typename)):
-            if s.name == name.strip() or s.full_path == name.strip():
-                typenode.append(s)
-
-        def parse_function(m):
-            typefull = m.find_types(full_typename)
-            if (typefull.__len__() > 0):
-                typenode.append(typefull)
-                
-                
-        def parse_module(m):
-            m.for_each_module(parse_module)
-            #m.for_each_struct(parse_node)
-            #m.for_each_typedef(parse_node)
-            #m.for_each_enum(parse_node)
-            #m.for_each_interface(parse_node)
-            m.for_each_interface(parse_function)
-
-
-        parse_module(self)
-
-        return typenode
+        return self.root_node.symbols.find(full_typename, scope=self)
 
 
     
\ No newline at end of file
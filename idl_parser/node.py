@@ -1,54 +1,193 @@
+import importlib, sys
+
+from . import exception
+
+# Node kinds. Every node class has one of these bits as kind, so that
+# node.kind & mask tests it against several kinds at once.
+CHANNEL = 1 << 0
+MODULE = 1 << 1
+INTERFACE = 1 << 2
+SECTION = 1 << 3
+METHOD = 1 << 4
+ARGUMENT = 1 << 5
+STRUCT = 1 << 6
+MEMBER = 1 << 7
+UNION = 1 << 8
+UNION_MEMBER = 1 << 9
+ENUM = 1 << 10
+ENUM_VALUE = 1 << 11
+CONST = 1 << 12
+TYPEDEF = 1 << 13
+VOID = 1 << 14
+PRIMITIVE = 1 << 15
+SEQUENCE = 1 << 16
+ARRAY = 1 << 17
+BASIC_TYPE = 1 << 18
+
+kinds = [1 << i for i in range(19)]
+
+# Masks
+TYPE = VOID | PRIMITIVE | SEQUENCE | ARRAY | BASIC_TYPE
+DECLARATION = STRUCT | UNION | ENUM | CONST | TYPEDEF
+
+
+class Dispatcher(object):
+    """ Table of handlers by node kind, for tree walkers.
+    Calling it with a node calls the handler of the node kind with the node
+    and the remaining arguments, and returns its result.
+    :param handlers: Dictionary of handlers by kind. A key can be a mask of
+                     several kinds; a single kind takes precedence over a mask.
+    :param default: Handler of the kinds without one. By default they return None.
+    """
+
+    def __init__(self, handlers, default=None):
+        self._table = {}
+        for mask in sorted(handlers.keys(), key=lambda k: -bin(k).count('1')):
+            for k in kinds:
+                if k & mask:
+                    self._table[k] = handlers[mask]
+        self._default = default or _no_handler
+
+    def __call__(self, node, *args):
+        return self._table.get(node._kind, self._default)(node, *args)
+
+
+def _no_handler(node, *args):
+    return None
+
+
+def _reindexing(method):
+    # Wraps a list method that changes the nodes of an IDLNodeList other than append().
+    def mutator(self, *args, **kwargs):
+        self._index = None
+        return method(self, *args, **kwargs)
+    mutator.__name__ = method.__name__
+    return mutator
+
+
+class IDLNodeList(list):
+    """ List of child nodes, in declaration order, indexed by name.
+    Nodes must be added once their name is known. When several nodes share
+    a name, by_name() returns the first one.
+    """
+    __slots__ = ('_index',)
+
+    def __init__(self, nodes=()):
+        super(IDLNodeList, self).__init__(nodes)
+        # Built on the first lookup. append() keeps it up to date, any other
+        # change drops it, to be built again.
+        self._index = None
+
+    def append(self, node):
+        super(IDLNodeList, self).append(node)
+        if self._index is not None:
+            self._index.setdefault(node._name, node)
+
+    extend = _reindexing(list.extend)
+    __iadd__ = _reindexing(list.__iadd__)
+    insert = _reindexing(list.insert)
+    remove = _reindexing(list.remove)
+    pop = _reindexing(list.pop)
+    sort = _reindexing(list.sort)
+    reverse = _reindexing(list.reverse)
+    __setitem__ = _reindexing(list.__setitem__)
+    __delitem__ = _reindexing(list.__delitem__)
+    __imul__ = _reindexing(list.__imul__)
+    if hasattr(list, 'clear'):
+        clear = _reindexing(list.clear)
+    if hasattr(list, '__setslice__'): # Python 2
+        __setslice__ = _reindexing(list.__setslice__)
+        __delslice__ = _reindexing(list.__delslice__)
+
+    def __reduce__(self):
+        # Pickled as its nodes only, the index being built again when needed.
+        # Python 2 would otherwise lose the slot.
+        return (IDLNodeList, (), None, iter(self))
+
+    def by_name(self, name):
+        if self._index is None:
+            # Built backwards, so that the first node of a name wins.
+            self._index = dict([(n._name, n) for n in reversed(self)])
+        return self._index.get(name)
+
+
 class IDLNode(object):
-    def __init__(self, classname, name, parent):
-        self._classname = classname
+    """ Base of the nodes of an IDL tree.
+    Nodes declare their attributes in __slots__ and keep per-class constants,
+    like the class name reported by classname, as class attributes.
+    """
+    __slots__ = ('_parent', '_name', '_filepath', '_location',
+                 '_full_path', '_full_path_name', '_root_node')
+
+    _classname = 'IDLNode'
+    _kind = 0
+    _verbose = True
+    sep = '::'
+
+    def __init__(self, name, parent):
         self._parent = parent
         self._name = name
         self._filepath = None
-        self.sep = '::'
+        self._location = None
+        # Cached full_path, with the name it was computed for, and root_node.
+        self._full_path = None
+        self._full_path_name = None
+        self._root_node = None
 
     @property
     def filepath(self):
         return self._filepath
 
+    @property
+    def position(self):
+        """ source.Position where this node is declared, or None if unknown. """
+        if self._location is None:
+            return None
+        return self.root_node.sources.position(self._location)
+
     @property
     def is_array(self):
-        return self._classname == 'IDLArray'
+        return (self._kind & ARRAY) != 0
     
     @property
     def is_void(self):
-        return self._classname == 'IDLVoid'
+        return (self._kind & VOID) != 0
 
     @property
     def is_struct(self):
-        return self._classname == 'IDLStruct'
+        return (self._kind & STRUCT) != 0
     
     @property
     def is_union(self):
-        return self._classname == 'IDLUnion'
+        return (self._kind & UNION) != 0
 
     @property
     def is_typedef(self):
-        return self._classname == 'IDLTypedef'
+        return (self._kind & TYPEDEF) != 0
 
     @property
     def is_sequence(self):
-        return self._classname == 'IDLSequence'
+        return (self._kind & SEQUENCE) != 0
 
     @property
     def is_primitive(self):
-        return self._classname == 'IDLPrimitive'
+        return (self._kind & PRIMITIVE) != 0
 
     @property
     def is_interface(self):
-        return self._classname == 'IDLInterface'
+        return (self._kind & INTERFACE) != 0
 
     @property
     def is_enum(self):
-        return self._classname == 'IDLEnum'
+        return (self._kind & ENUM) != 0
 
     @property
     def is_const(self):
-        return self._classname == 'IDLConst'
+        return (self._kind & CONST) != 0
+
+    @property
+    def kind(self):
+        return self._kind
 
     @property
     def classname(self):
@@ -83,6 +222,41 @@ class IDLNode(object):
     def parent(self):
         return self._parent
 
+    @parent.setter
+    def parent(self, value):
+        self._parent = value
+        self._invalidate()
+
+    def _invalidate(self):
+        """ Clear the cached full_path and root_node of this node and of the
+        nodes below it, after it has been moved in the tree.
+        """
+        self._full_path = None
+        self._root_node = None
+        for value in self._slot_values():
+            if isinstance(value, IDLNode):
+                value = [value]
+            elif not isinstance(value, list):
+                continue
+            for n in value:
+                if isinstance(n, IDLNode) and n._parent is self:
+                    n._invalidate()
+
+    def _slot_values(self):
+        for cls in type(self).__mro__:
+            for attr in cls.__dict__.get('__slots__', ()):
+                value = getattr(self, attr, None)
+                if value is not None:
+                    yield value
+
+    @property
+    def full_path(self):
+        """ Fully-qualified name of this node, computed once by _path(). """
+        if self._full_path is None or self._full_path_name is not self._name:
+            self._full_path_name = self._name
+            self._full_path = self._path()
+        return self._full_path
+
     def _name_and_type(self, blocks):
         type = ''
         name = blocks[-1]
@@ -104,14 +278,12 @@ class IDLNode(object):
 
     @property
     def root_node(self):
-        roots = []
-        def find_root(n):
-            if n.is_root:
-                roots.append(n)
-            else:
-                find_root(n.parent)
-        find_root(self)
-        return roots[0]
+        if self._root_node is None:
+            n = self
+            while n._parent is not None:
+                n = n._parent
+            self._root_node = n
+        return self._root_node
 
     def refine_typename(self, typ):
         global_module = self.root_node
@@ -125,14 +297,125 @@ class IDLNode(object):
             if len(typs) == 0:
                 return typ
             else:
-                def level_path(a):
-                    if isinstance(a, list):
-                        return level_path(a[0])
-                    return a.full_path
-
-                fullpath = level_path(typs).replace('::public','').replace('::protected','').replace('::private','')
+                fullpath = typs[0].full_path.replace('::public','').replace('::protected','').replace('::private','')
                 # Elimino i livelli di channel e module per il momento
                 type = fullpath[fullpath.rfind('::')+2:]
                 #interface = type[type.rfind('::')+2:]
                 fullpath = type
                 return fullpath
+
+
+class IDLScope(IDLNode):
+    """ Node made of declarations introduced by keywords, like a module.
+    Every token of the scope is looked up in the keywords table of its class:
+    the parser found, if any, parses the declaration, otherwise the token is
+    passed to _parse_token().
+    A scope can be opened several times, by several files: the locations where
+    it was opened are kept, in order, so that the declarations of a file can be
+    removed again (see incremental).
+    """
+    __slots__ = ('_openings',)
+
+    def __init__(self, name, parent):
+        super(IDLScope, self).__init__(name, parent)
+        self._openings = []
+
+    def _open(self, token_buf, filepath):
+        """ Start parsing the scope (again) at the current token. """
+        self._filepath = filepath
+        self._location = token_buf.location
+        if self._location is not None:
+            self._openings.append(self._location)
+
+    # Parsers of the declarations of the scope, by keyword, registered for this
+    # class. The ones registered for its base classes apply too.
+    _keywords = {}
+
+    @classmethod
+    def register_keyword(cls, keyword, parse):
+        """ Parse the declarations introduced by keyword in scopes of this class
+        and of its subclasses with parse, e.g. for site-specific declarations.
+        A keyword registered for a subclass takes precedence.
+        :param parse: Function called as parse(scope, token_buf, filepath) once the
+                      keyword has been popped from token_buf. It returns True if
+                      the declaration ended the scope.
+        """
+        keywords = dict(cls.__dict__.get('_keywords', {}))
+        keywords[keyword] = parse
+        cls._keywords = keywords
+        _keyword_tables.clear()
+
+    @classmethod
+    def unregister_keyword(cls, keyword):
+        """ Remove a keyword registered for this class. """
+        keywords = dict(cls.__dict__.get('_keywords', {}))
+        del keywords[keyword]
+        cls._keywords = keywords
+        _keyword_tables.clear()
+
+    @classmethod
+    def keywords(cls):
+        return list(cls._keyword_table().keys())
+
+    @classmethod
+    def _keyword_table(cls):
+        """ Parsers by keyword for scopes of this class, the ones registered for
+        its base classes included. Merged again once keywords change.
+        """
+        table = _keyword_tables.get(cls)
+        if table is None:
+            table = {}
+            for c in reversed(cls.__mro__):
+                table.update(c.__dict__.get('_keywords', {}))
+            _keyword_tables[cls] = table
+        return table
+
+    def _parse_declarations(self, token_buf, filepath):
+        keywords = self._keyword_table()
+        while True:
+            token = token_buf.pop()
+            if token == None:
+                self._parse_end()
+                return
+            parse = keywords.get(token)
+            if parse is None:
+                self._parse_token(token, token_buf)
+            elif parse(self, token_buf, filepath):
+                return
+
+    def _parse_token(self, token, token_buf):
+        """ Parse a token that is not a keyword. Ignored by default. """
+        pass
+
+    def _parse_end(self):
+        """ Called when the tokens end before the scope. """
+        if self._verbose: sys.stdout.write('# Error. No brace "}".\n')
+        raise exception.InvalidIDLSyntaxError()
+
+    def _parse_close(self, token_buf, filepath):
+        token = token_buf.pop()
+        if not token == ';':
+            if self._verbose: sys.stdout.write('# Error. No semi-colon after "}".\n')
+            raise exception.InvalidIDLSyntaxError()
+        return True
+
+
+# Keyword tables of the scope classes, see IDLScope._keyword_table().
+_keyword_tables = {}
+
+
+def node_class(module, name):
+    """ Return the node class named name in module if module is a module of
+    this package, else None, so that the classes named by files, e.g. cache
+    entries or snapshots, can be looked up without importing anything else.
+    """
+    package = __name__.rsplit('.', 1)[0]
+    if module != package and not module.startswith(package + '.'):
+        return None
+    try:
+        cls = getattr(importlib.import_module(module), name, None)
+    except ImportError:
+        return None
+    if isinstance(cls, type) and issubclass(cls, IDLNode):
+        return cls
+    return None
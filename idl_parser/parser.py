@@ -1,15 +1,69 @@
-import os, sys
+import collections, io, itertools, os, sys
 
-from . import  channel, module, token_buffer, exception
+from . import  channel, module, lexer, preprocessor, source, token_buffer, exception, node, cache, incremental, watch
 from . import type as idl_type
 
+
+# Python constructor expressions of types, by kind, for generate_constructor_python().
+def _array_constructor_python(typ):
+    return '[' + ', '.join([_constructor_python(typ.inner_type)] * typ.size) + ']'
+
+def _struct_constructor_python(typ):
+    code = typ.full_path + '('
+    for m in typ.members:
+        if m.type.is_primitive:
+            code = code + _constructor_python(m.type) + ', '
+        else:
+            code = code + _constructor_python(m.type.obj) + ', '
+    return code[:-2] + ')'
+
+_constructor_python = node.Dispatcher({
+    node.SEQUENCE : lambda typ: '[]',
+    node.ARRAY : _array_constructor_python,
+    node.PRIMITIVE : lambda typ: '0',
+    node.TYPEDEF : lambda typ: _constructor_python(typ.type),
+    node.STRUCT : _struct_constructor_python,
+    }, default=lambda typ: '')
+
+
 class IDLParser():
 
-    def __init__(self, idl_dirs=[]):
+    def __init__(self, idl_dirs=None, streaming=False, cache_dir=None):
+        """
+        :param idl_dirs: List of directory which contains IDL files.
+        :param streaming: If True, IDL files are tokenized line by line while being parsed
+                          instead of being loaded as a whole first.
+        :param cache_dir: Directory where parsed IDL files are cached (see cache), to be
+                          loaded instead of parsed again as long as neither they, the files
+                          they include nor the macros they are parsed with change. None disables it.
+        """
         #self._global_module = module.IDLModule()
         self._global_module = channel.IDLChannel()
-        self._dirs = idl_dirs
+        self._dirs = list(idl_dirs or [])
         self._verbose = False
+        self._streaming = streaming
+        # Macros defined by every IDL file parsed so far, and the ones it undefined, by real path.
+        self._parsed = {}
+        self._undefined = {}
+        # Path as given and id in global_module.sources of the same files, in parse order.
+        self._idl_files = collections.OrderedDict()
+        # Files update() has yet to parse again.
+        self._pending = []
+        self._defines = {}
+        self._include_graph = {}
+        # Include guard macro of the parsed files that have one, and the
+        # files marked with #pragma once, by real path.
+        self._guards = {}
+        self._once = set()
+        self._include_skips = {'already parsed': 0, 'include guard': 0, 'pragma once': 0}
+        self._index = source.DirectoryIndex()
+        self._cache = None if cache_dir is None else cache.ParseCache(cache_dir)
+        self._cache_stats = {'hits': 0, 'misses': 0}
+        # Includes met while parsing each cached file, as (path, skipped by its guard,
+        # macros at the directive, macros passed on, macros undefined) tuples, and the
+        # contents hashes of the files each one depends on, by real path.
+        self._unit_includes = {}
+        self._unit_deps = {}
         
     @property
     def global_module(self):
@@ -25,65 +79,336 @@ class IDLParser():
     def dirs(self):
         return self._dirs
 
-    def load(self, input_str, include_dirs=[], filepath=None):
-        self._dirs = self._dirs + include_dirs
-        lines = [l for l in input_str.replace('\t',' ').split('\n')]
-        self.parse_lines(lines, filepath=filepath)
+    @property
+    def include_graph(self):
+        """ Dictionary of the files included by each parsed IDL file, by real path. """
+        return self._include_graph
+
+    @property
+    def include_skips(self):
+        """ Number of times an IDL file was not parsed again, by reason. """
+        return self._include_skips
+
+    @property
+    def cache_stats(self):
+        """ Number of IDL files loaded from the cache (hits) and parsed (misses). """
+        return self._cache_stats
+
+    @property
+    def defines(self):
+        """ Dictionary of the predefined macros (see preprocessor). """
+        return self._defines
+
+    def load(self, input_str, include_dirs=None, filepath=None, defines=None):
+        """ Parse an IDL string.
+        :param defines: Predefined macros. Dictionary of names and values, or list of
+                        names or 'NAME=VALUE' strings.
+        :returns: global_module
+        """
+        self._dirs = self._dirs + list(include_dirs or [])
+        self._defines.update(preprocessor.macros_from(defines))
+        self.parse_text(input_str, filepath=filepath)
+        self.link()
         return self._global_module
 
-    def parse(self, idls=[], idl_dirs=[], except_files=[]):
+    def parse(self, idls=None, idl_dirs=None, except_files=None, defines=None):
         """ Parse IDL files. Result of parsing can be accessed via global_module property.
         :param idls: List of IDL files. Must be fullpath.
         :param idl_dirs: List of directory which contains target IDL files. Must be fullpath.
         :param except_files: List of IDL files that should be ignored. Do not have to use fullpath.
+        :param defines: Predefined macros. Dictionary of names and values, or list of
+                        names or 'NAME=VALUE' strings.
         :returns: None
         """
+        self._defines.update(preprocessor.macros_from(defines))
         self.for_each_idl(self.parse_idl, except_files=except_files, idls=idls, idl_dirs=idl_dirs)
-
-    def parse_idl(self, idl_path):
+        self.link()
+        if self._verbose:
+            for reason, count in sorted(self._include_skips.items()):
+                sys.stdout.write(' - Skipped (%s) : %d\n' % (reason, count))
+
+    def update(self, changed_paths):
+        """ Bring global_module up to date once IDL files changed, were added or
+        were deleted, without parsing the other files again.
+        What the changed files and the files including them, directly or not,
+        declared is removed from global_module. These files are then parsed
+        again, unless deleted, and the type references are linked again.
+        Their declarations come after the ones of the other files.
+        :param changed_paths: Paths of the changed IDL files. The ones never parsed are parsed.
+        :returns: List of the real paths of the files parsed again.
+        """
+        return self._update(changed_paths)[0]
+
+    def _update(self, changed_paths):
+        """ update(), also returning the list of the declarations removed (see incremental.prune). """
+        changed_paths = list(changed_paths) + self._pending
+        changed = [os.path.realpath(p) for p in changed_paths]
+        includers = {}
+        for key, included in self._include_graph.items():
+            for i in included:
+                includers.setdefault(i, set()).add(key)
+        # Files see the macros of the files they include, so they are parsed again too.
+        affected = set()
+        stack = list(changed)
+        while stack:
+            key = stack.pop()
+            if not key in affected:
+                affected.add(key)
+                stack.extend(includers.get(key, ()))
+
+        stale = [key for key in self._idl_files if key in affected]
+        sources = self._global_module.sources
+        paths = []
+        fileids = set()
+        for key in stale:
+            idl_path, fileid = self._idl_files.pop(key)
+            sources.file(fileid).invalidate()
+            paths.append(idl_path)
+            fileids.add(fileid)
+            del self._parsed[key]
+            del self._undefined[key]
+            self._include_graph.pop(key, None)
+            self._guards.pop(key, None)
+            self._once.discard(key)
+            self._unit_deps.pop(key, None)
+        removed = incremental.prune(self._global_module, fileids)
+
+        for key, path in zip(changed, changed_paths):
+            if not key in stale:
+                paths.append(path)
+        # Kept until parsed, so that files left when one can not be parsed are parsed next time.
+        self._pending = paths
+        while self._pending:
+            path = self._pending[0]
+            # Files already parsed again as the include of another one are skipped.
+            if os.path.exists(path) and not os.path.realpath(path) in self._parsed:
+                self.parse_idl(path)
+            self._pending.pop(0)
+        self.link()
+        return [key for key in self._idl_files if key in affected], removed
+
+    def watch(self, callback=None, interval=0.05, settle=0.02, stop=None):
+        """ Watch mode: poll the IDL directories and the parsed files, and update
+        global_module each time they change, until stop is set (see watch.Watcher).
+        :param callback: Function called as callback(declarations) after each update,
+                         with the set of the full paths of the declarations that changed.
+        :param interval: Seconds between two polls.
+        :param settle: Seconds changed files must stay the same before updating.
+        :param stop: threading.Event ending the watch. None watches forever.
+        """
+        watcher = watch.Watcher(self, [callback] if callback is not None else [],
+                                interval=interval, settle=settle)
+        watcher.run(stop)
+
+    def link(self):
+        """ Link phase: resolve the types referred to by members, arguments and
+        typedefs to their declarations, once. load() and parse() call it.
+        :returns: List of the type names that could not be resolved.
+        """
+        unresolved = self._global_module.link()
+        if len(unresolved) > 0:
+            names = []
+            for name in unresolved:
+                if not name in names:
+                    names.append(name)
+            sys.stdout.write('-- Can not find Data Types (%s)\n' % ', '.join(names))
+        return unresolved
+
+    def parse_idl(self, idl_path, defines=None):
+        """ Parse an IDL file into global_module.
+        Each file is parsed once per parser: files already parsed, for instance
+        as the include of another one, are skipped.
+        :param defines: Dictionary of the macros defined where the file is included
+                        (see preprocessor). Defaults to the predefined macros.
+        """
+        key = os.path.realpath(idl_path)
+        if key in self._parsed:
+            if self._verbose: sys.stdout.write(' - Already parsed IDL (%s)\n' % idl_path)
+            self._include_skips['already parsed'] += 1
+            return
         if self._verbose: sys.stdout.write(' - Parsing IDL (%s)\n' % idl_path)
-        f = open(idl_path, 'r')
-        lines = []
-        for line in f:
-            lines.append(line)
+        initial = dict(self._defines if defines is None else defines)
+        defines = dict(initial)
+        self._parsed[key] = {}
+        undefined = self._undefined[key] = set()
+        self._include_graph[key] = []
+        fileid = self._global_module.sources.add(idl_path)
+        self._idl_files[key] = (idl_path, fileid)
+        if self._cache is not None:
+            self._parse_cached(idl_path, key, fileid, defines, undefined)
+        else:
+            tokens = self._read_idl(idl_path)
+            tokens = self._detect_guard(key, tokens)
+            self.parse_tokens(tokens, fileid=fileid, defines=defines, undefined=undefined)
+        # Only the macros the file defined itself are passed on to its includers.
+        self._parsed[key] = dict([(name, value) for name, value in defines.items()
+                                  if not name in initial or initial[name] != value])
+
+    def _parse_cached(self, idl_path, key, fileid, defines, undefined):
+        """ Load an IDL file from the cache, or parse it as a unit and store it there.
+        Either way the unit is grafted into global_module.
+        """
+        name = self._cache.entry_name(key, self._cache_context(defines))
+        entry = self._cache.read(name)
+        if entry is not None and self._cache.is_current(entry['deps']):
+            skips = dict(self._include_skips)
+            if self._load_unit(key, entry, fileid):
+                if self._verbose: sys.stdout.write(' - Loaded IDL (%s) from cache\n' % idl_path)
+                defines.clear()
+                defines.update(entry['macros'])
+                undefined.clear()
+                undefined.update(entry['undefined'])
+                self._cache_stats['hits'] += 1
+                return
+            # Its includes have been parsed already: only forget they were met.
+            self._include_skips.update(skips)
+            self._include_graph[key] = []
+        self._cache_stats['misses'] += 1
+
+        unit = cache.new_unit(self._global_module)
+        self._unit_includes[key] = []
+        tokens = self._detect_guard(key, self._read_idl(idl_path))
+        self.parse_tokens(tokens, fileid=fileid, defines=defines, scope=unit, undefined=undefined)
+        includes = self._unit_includes.pop(key)
+        deps = {key: self._cache.file_hash(key)}
+        for path, guarded, macros, passed, undefined_ in includes:
+            included = os.path.realpath(path)
+            deps.update(self._unit_deps.get(included) or {included: self._cache.file_hash(included)})
+        self._unit_deps[key] = deps
+
+        data = cache.dumps(unit, fileid)
+        self._cache.write(name, {'deps': deps, 'includes': includes, 'macros': defines,
+                                 'undefined': sorted(undefined),
+                                 'guard': self._guards.get(key), 'once': key in self._once,
+                                 'lookups': unit.symbols.lookups, 'unit': data})
+        cache.graft(cache.loads(data, self._global_module), self._global_module, fileid)
+
+    def _load_unit(self, key, entry, fileid):
+        """ Replay the parse of a cached IDL file: parse the files it includes, or
+        count them as skipped, then graft its unit.
+        :returns: False if the unit can not be used.
+        """
+        current = True
+        for path, guarded, macros, passed, undefined in entry['includes']:
+            included = os.path.realpath(path)
+            if included in self._once:
+                self._include_skips['pragma once'] += 1
+            elif guarded and included in self._guards:
+                self._include_skips['include guard'] += 1
+            else:
+                self.parse_idl(path, macros)
+            self._include_graph[key].append(included)
+            # Files parsed already, e.g. by another includer, may pass on other macros.
+            if self._parsed[included] != passed or sorted(self._undefined[included]) != undefined:
+                current = False
+
+        if not current or not cache.is_current(entry['lookups'], self._global_module):
+            return False
+        try:
+            unit = cache.loads(entry['unit'], self._global_module)
+        except Exception:
+            return False
+        cache.graft(unit, self._global_module, fileid)
+        if entry['once']:
+            self._once.add(key)
+        elif entry['guard'] is not None:
+            self._guards[key] = entry['guard']
+        self._unit_deps[key] = entry['deps']
+        return True
+
+    def _cache_context(self, defines):
+        # Everything but the files that changes what parsing an IDL file gives,
+        # defines being the macros it is parsed with.
+        return (sorted(defines.items()), self._dirs, self._streaming, cache.keywords())
+
+    def _read_idl(self, idl_path):
+        """ Read stage: return the tokens of an IDL file, comments stripped.
+        In streaming mode they are read lazily, line by line.
+        """
+        if self._streaming:
+            return self._read_lines(idl_path)
+        with source.open_mapped(idl_path) as buf:
+            return lexer.tokenize(buf)
 
-        self.parse_lines(lines)
+    def _read_lines(self, idl_path):
+        # Decoded as UTF-8, as the memory-mapped files are.
+        with io.open(idl_path, 'r', encoding='utf-8') as f:
+            for t in lexer.tokenize_lines(f):
+                yield t
 
     def parse_lines(self, lines, filepath=None):
-
-        lines = self._clear_comments(lines)
-        lines = self._paste_include(lines)            
-        lines = self._clear_ifdef(lines)
-
-        self._token_buf = token_buffer.TokenBuffer(lines)
-
-        self._global_module.parse_tokens(self._token_buf, filepath=filepath)
+        self.parse_text('\n'.join([l.rstrip('\n') for l in lines]), filepath=filepath)
+
+    def parse_text(self, text, filepath=None):
+        fileid = self._global_module.sources.add(filepath, text)
+        self.parse_tokens(lexer.tokenize(text), filepath=filepath, fileid=fileid)
+
+    def parse_tokens(self, tokens, filepath=None, fileid=None, defines=None, scope=None, undefined=None):
+        """ Parse tokens returned by the lexer.
+        :param tokens: Iterable of tokens.
+        :param filepath: Filepath stored in the parsed nodes.
+        :param fileid: Id of the tokens source in global_module.sources, used to report positions.
+        :param defines: Dictionary of macros, updated with the ones the tokens define.
+                        Defaults to a copy of the predefined macros.
+        :param scope: Global channel to parse the tokens into. Defaults to global_module.
+        :param undefined: Set of macros, updated with the ones the tokens undefine
+                          and do not define again.
+        :returns: None
+        """
+        segments = []
+        tokens = self._preprocess(tokens, fileid, defines, segments, undefined)
+
+        if self._streaming:
+            token_buf = token_buffer.StreamingTokenBuffer(tokens, segments=segments)
+        else:
+            token_buf = token_buffer.TokenBuffer(tokens=list(tokens), segments=segments)
+
+        if scope is None:
+            scope = self._global_module
+        try:
+            scope.parse_tokens(token_buf, filepath=filepath)
+        except exception.InvalidIDLSyntaxError as e:
+            if e.position is None:
+                e.position = self._global_module.sources.position(token_buf.location)
+            raise
+
+    def _preprocess(self, tokens, fileid=None, defines=None, segments=None, undefined=None):
+        """ Chain the preprocessing stages over tokens. Each stage is a generator,
+        so tokens flow through one at a time without intermediate lists:
+        source markers -> conditional evaluation, includes included.
+        :param defines: Dictionary of the macros defined so far, shared by the stages.
+        :param segments: List filled with the token segments (see TokenBuffer).
+        :param undefined: Set filled with the macros undefined (see parse_tokens).
+        """
+        if defines is None:
+            defines = dict(self._defines)
+        if fileid is not None:
+            tokens = self._source_tokens(fileid, tokens)
+        tokens = self._clear_ifdef(tokens, segments, defines, undefined)
+        return tokens
 
     def includes(self, idl_path):
         included_filepaths = []
         included_filenames = []
-        f = open(idl_path, 'r')
-        lines = []
-        for line in f:
-            if line.find('#include') >= 0:
-                if line.find('"') >= 0:
-                    file = line[line.find('"')+1:line.rfind('"')].strip()
-                elif line.find('<') >= 0:
-                    file = line[line.find('<')+1:line.rfind('>')].strip()
-                included_filenames.append(file)
-        def get_fullpath(idl_path):
-            if os.path.basename(idl_path) in included_filenames:
-                included_filepaths.append(idl_path)
-                included_filenames.remove(os.path.basename(idl_path))
-
-        self.for_each_idl(get_fullpath)
-        if len(included_filenames) > 0:
-            raise exception.IDLGenericException()
-                
+        with open(idl_path, 'r') as f:
+            for line in f:
+                if line.find('#include') >= 0:
+                    if line.find('"') >= 0:
+                        file = line[line.find('"')+1:line.rfind('"')].strip()
+                    elif line.find('<') >= 0:
+                        file = line[line.find('<')+1:line.rfind('>')].strip()
+                    if not file in included_filenames:
+                        included_filenames.append(file)
+
+        index = self._index.index(self._dirs)
+        for file in included_filenames:
+            if not file in index:
+                raise exception.IDLGenericException()
+            included_filepaths.append(index[file])
         return included_filepaths
 
 
-    def for_each_idl(self, func, idl_dirs=[], except_files=[], idls=[]):
+    def for_each_idl(self, func, idl_dirs=None, except_files=None, idls=None):
         """ Parse IDLs and apply function.
         :param func: Function. IDL file fullpath will be passed to the function.
         :param idls: List of IDL files. Must be fullpath.
@@ -91,187 +416,238 @@ class IDLParser():
         :param except_files: List of IDL files that should be ignored. Do not have to use fullpath.
         :returns: None
         """
-        idl_dirs = self._dirs + idl_dirs
+        idl_dirs = self._dirs + list(idl_dirs or [])
         self._dirs = idl_dirs
-        idls_ = []
-        basenames_ = []
-        for idl_dir in idl_dirs:
-            for f in os.listdir(idl_dir):
-                if f.endswith('.idl'):
-                    if not f in except_files:
-                        path = os.path.join(idl_dir, f)
-                        if not f in basenames_:
-                            idls_.append(path)
-                            basenames_.append(os.path.basename(path))
-
-        idls_ = idls_ + idls
+        except_files = except_files or []
+        idls_ = [path for f, path in self._index.index(idl_dirs).items() if not f in except_files]
+
+        idls_ = idls_ + list(idls or [])
         for f in idls_:
             if self._verbose: sys.stdout.write(' - Apply function to %s\n' % f)
             func(f)
 
-    def _find_idl(self, filename, apply_func, idl_dirs=[]):
+    def _find_idl(self, filename, apply_func, idl_dirs=None):
         if self._verbose: sys.stdout.write(' --- Find %s\n' % filename)
         
-        global retval
-        retval = None
-        def func(filepath):
-            if os.path.basename(filepath) == filename:
-                global retval
-                retval = apply_func(filepath)
-                
-        self.for_each_idl(func, idl_dirs=idl_dirs)
-        return retval
-
-    def _paste_include(self, lines):
-        output_lines = []
-        for line in lines:
-            output_line = ''
-            if line.startswith('#include'):
-                def _include_paste(filepath):
-                    return filepath
-
-                if line.find('"') >= 7:
-                    filename = line[line.find('"')+1 : line.rfind('"')]
-                    if self._verbose: sys.stdout.write(' -- Includes %s\n' % filename)
-                    p = self._find_idl(filename, _include_paste)
-                    if p is None:
-                        sys.stdout.write(' # IDL (%s) can not be found.\n' % filename)
-                        raise exception.IDLFileNotFoundError()
-                    self.parse_idl(idl_path = p)
-
-                    inc_lines = []
-                    f = open(p, 'r')
-                    for l in f:
-                        inc_lines.append(l)
-                    inc_lines = self._clear_comments(inc_lines)
-                    inc_lines = self._paste_include(inc_lines)
-                    output_lines = output_lines + inc_lines
-
-                elif line.find('<') >= 7:
-                    filename = line[line.find('<')+1 : line.rfind('>')]
-                    if self._verbose: sys.stdout.write(' -- Includes %s\n' % filename)
-                    p = self._find_idl(filename, _include_paste)
-                    if p is None:
-                        sys.stdout.write(' # IDL (%s) can not be found.\n' % filename)
-                        raise exception.IDLFileNotFoundError()
-                    inc_lines = []
-
-                    self.parse_idl(idl_path = p)
-
-                    f = open(p, 'r')
-                    for l in f:
-                        inc_lines.append(l)
-                    inc_lines = self._clear_comments(inc_lines)
-                    inc_lines = self._paste_include(inc_lines)
-                    output_lines = output_lines + inc_lines
-
+        if idl_dirs:
+            self._dirs = self._dirs + list(idl_dirs)
+        path = self._index.find(filename, self._dirs)
+        if path is None:
+            return None
+        return apply_func(path)
+
+    def _source_tokens(self, fileid, tokens):
+        # Source markers tell _clear_ifdef where the tokens of a file start and end.
+        return itertools.chain([('#', fileid)], tokens, [('#', None)])
+
+    def _detect_guard(self, key, tokens):
+        """ Pass tokens through, recording whether the file they come from is
+        protected by #pragma once or by a classic include guard:
+        #ifndef X / #define X first and the matching #endif last.
+        """
+        once = False
+        macro = None
+        depth = 0
+        closed = False
+        index = 0
+        for token in tokens:
+            yield token
+            if token[0] != '#':
+                if index < 2 or closed:
+                    macro = None
             else:
-                output_line = line
-                
-            output_lines.append(output_line)
-
-        return output_lines
-
-
-
-    def _clear_comments(self, lines):
-        output_lines = []
-        in_comment = False
-
-        for line in lines:
-            line = line.strip()
-            output_line = ''
-            if line.find('//') >= 0:
-                line = line[:line.find('//')]
-
-            for token in line.split(' '):
-                
-                if in_comment and token.find('*/') >= 0:
-                    in_comment = False
-                    output_line = output_line + ' ' + token[token.find('*/')+2:].strip()
-
-                elif in_comment:
-                    continue
-
-                elif token.startswith('//'):
-                    break # ignore this line
-                
-                elif token.find('/*') >= 0:
-                    in_comment = True
-                    output_line = output_line + ' ' + token[0: token.find('/*')]
-                else:
-                    if token.find('{') >= 0:
-                        token = token.replace('{', ' { ')
-                    if token.find(';') >= 0:
-                        token = token.replace(';', ' ;')
-                    if token.find('(') >= 0:
-                        token = token.replace('(', ' ( ')
-                    token = token.replace(',', ' , ')
-                    token = token.replace(')', ' ) ')
-                    token = token.replace('}', ' } ')
-                    output_line = output_line + ' ' + token.strip()
-            if len(output_line.strip()) > 0:
-                output_lines.append(output_line.strip() + '\n')
-        
-        return output_lines
-
-    def _clear_ifdef(self, lines):
-        output_lines = []
-        def_tokens = []
-        global offset
-        offset = 0
-        def _parse(flag):
-            global offset
-            while offset < len(lines):
-                line = lines[offset]
-                if line.startswith('#define'):
-                    def_token = line.split(' ')[1]
-                    def_tokens.append(def_token)
-                    offset = offset + 1
-                elif line.startswith('#ifdef'):
-                    def_token = line.split(' ')[1]
-                    offset = offset + 1
-                    _parse(def_token in def_tokens)
-
-                elif line.startswith('#ifndef'):
-                    def_token = line.split(' ')[1]
-                    offset = offset + 1
-                    _parse(not def_token in def_tokens)
-
-                elif line.startswith('#endif'):
-                    offset = offset + 1
-                    return
-
+                words = token.split()
+                if words[0] == '#pragma' and words[1:] == ['once']:
+                    once = True
+                elif index == 0:
+                    if words[0] == '#ifndef' and len(words) == 2:
+                        macro = words[1]
+                elif index == 1:
+                    if words[0] != '#define' or words[1:2] != [macro]:
+                        macro = None
+                elif closed or (depth == 1 and words[0] in ('#else', '#elif')):
+                    macro = None
+
+                if words[0] in ('#if', '#ifdef', '#ifndef'):
+                    depth = depth + 1
+                elif words[0] == '#endif':
+                    depth = depth - 1
+                    if depth == 0:
+                        closed = True
+            index = index + 1
+
+        if once:
+            self._once.add(key)
+        elif macro is not None and closed:
+            self._guards[key] = macro
+
+    def _include(self, token, fileid=None, defines=None):
+        """ Parse the file an #include directive token includes with the macros
+        defines, unless it was parsed already. Its declarations go to global_module directly.
+        Files marked with #pragma once, or whose include guard is in defines, are
+        skipped without being opened again.
+        :param fileid: Id of the source of the directive, in global_module.sources.
+        :returns: Real path of the included file, or None if token names none.
+        """
+        def _include_paste(filepath):
+            return filepath
+
+        if token.find('"') >= 7:
+            filename = token[token.find('"')+1 : token.rfind('"')]
+        elif token.find('<') >= 7:
+            filename = token[token.find('<')+1 : token.rfind('>')]
+        else:
+            return None
+
+        if self._verbose: sys.stdout.write(' -- Includes %s\n' % filename)
+        p = self._find_idl(filename, _include_paste)
+        if p is None:
+            sys.stdout.write(' # IDL (%s) can not be found.\n' % filename)
+            raise exception.IDLFileNotFoundError(filename)
+        key = os.path.realpath(p)
+        guarded = defines is not None and self._guards.get(key) in defines
+        if key in self._once:
+            if self._verbose: sys.stdout.write(' -- Skip %s (pragma once)\n' % filename)
+            self._include_skips['pragma once'] += 1
+        elif guarded:
+            if self._verbose: sys.stdout.write(' -- Skip %s (include guard %s)\n' % (filename, self._guards[key]))
+            self._include_skips['include guard'] += 1
+        else:
+            self.parse_idl(idl_path = p, defines = defines)
+
+        includer = None
+        if fileid is not None:
+            includer = self._global_module.sources.file(fileid).filepath
+        if includer is not None:
+            includer = os.path.realpath(includer)
+            self._include_graph.setdefault(includer, []).append(key)
+            includes = self._unit_includes.get(includer)
+            if includes is not None:
+                includes.append((p, guarded, None if defines is None else dict(defines),
+                                 self._parsed[key], sorted(self._undefined[key])))
+        return key
+
+    def _clear_ifdef(self, tokens, segments=None, defines=None, undefined=None):
+        """ Conditional stage: evaluate #define, #undef, #if, #ifdef, #ifndef,
+        #elif, #else, #endif and #include, drop the tokens of inactive blocks and
+        substitute object-like macros in the others. Only the macros an included
+        file defines and undefines are passed on (see _include()): as its declarations
+        go to global_module, an #include between braces is an InvalidIDLSyntaxError.
+        :param defines: Dictionary of macros (see preprocessor), modified in place.
+        :param undefined: Set of the macros undefined and not defined again, modified in place.
+        """
+        macros = {} if defines is None else defines
+        # One [parent active, branch taken] pair per open #if block.
+        # Tokens are kept only while active.
+        blocks = []
+        active = True
+        # Source bookkeeping for token locations: the current file, the ordinal
+        # of its next token and the files it is nested in.
+        # A segment is recorded each time the output stops being a run of
+        # consecutive tokens of one file, i.e. only around directives.
+        files = []
+        fileid = None
+        ordinal = 0
+        count = 0
+        gap = True
+        # Braces open in the output: included files are parsed at file scope only.
+        depth = 0
+        for token in tokens:
+            if token[0] != '#':
+                if active:
+                    if macros and (token in macros or token.find('[') >= 0 or token.find('<') >= 0):
+                        expanded = preprocessor.expand(token, macros)
+                        if expanded != [token]:
+                            # Every token of the expansion is located at the macro.
+                            for t in expanded:
+                                if segments is not None and fileid is not None:
+                                    segments.append((count, fileid, ordinal))
+                                if t == '{':
+                                    depth = depth + 1
+                                elif t == '}':
+                                    depth = depth - 1
+                                yield t
+                                count = count + 1
+                            ordinal = ordinal + 1
+                            gap = True
+                            continue
+                    if gap:
+                        if segments is not None and fileid is not None:
+                            segments.append((count, fileid, ordinal))
+                        gap = False
+                    if token == '{':
+                        depth = depth + 1
+                    elif token == '}':
+                        depth = depth - 1
+                    yield token
+                    count = count + 1
+                ordinal = ordinal + 1
+                continue
+
+            gap = True
+            if isinstance(token, tuple):
+                if token[1] is None:
+                    fileid, ordinal = files.pop()
                 else:
-                    offset = offset + 1
-                    if flag:
-                        output_lines.append(line)
-
-        _parse(True)
-        return output_lines
-
+                    files.append((fileid, ordinal))
+                    fileid, ordinal = token[1], 0
+                continue
+            ordinal = ordinal + 1
+
+            try:
+                directive = token.split(None, 1)
+                name = directive[0]
+                argument = directive[1] if len(directive) > 1 else ''
+                if name == '#define' or name == '#undef':
+                    if active:
+                        macro = preprocessor.define(token, macros)
+                        if undefined is not None:
+                            if name == '#undef':
+                                undefined.add(macro)
+                            else:
+                                undefined.discard(macro)
+                elif name == '#include':
+                    if active:
+                        if depth > 0:
+                            raise exception.InvalidIDLSyntaxError('#include is only supported at file scope')
+                        key = self._include(token, fileid, macros)
+                        if key is not None:
+                            macros.update(self._parsed[key])
+                            for macro in self._undefined[key]:
+                                macros.pop(macro, None)
+                            if undefined is not None:
+                                undefined.difference_update(self._parsed[key])
+                                undefined.update(self._undefined[key])
+                elif name == '#ifdef' or name == '#ifndef' or name == '#if':
+                    if active:
+                        if name == '#if':
+                            taken = bool(preprocessor.evaluate(argument, macros))
+                        else:
+                            taken = (name == '#ifdef') == (argument in macros)
+                    else:
+                        taken = True
+                    blocks.append([active, taken])
+                    active = active and taken
+                elif name == '#elif':
+                    if blocks:
+                        block = blocks[-1]
+                        if block[0] and not block[1]:
+                            block[1] = active = bool(preprocessor.evaluate(argument, macros))
+                        else:
+                            active = False
+                elif name == '#else':
+                    if blocks:
+                        block = blocks[-1]
+                        active = block[0] and not block[1]
+                        block[1] = True
+                elif name == '#endif':
+                    if blocks:
+                        active = blocks.pop()[0]
+            except exception.InvalidIDLSyntaxError as e:
+                if e.position is None and fileid is not None:
+                    location = self._global_module.sources.location(fileid, ordinal - 1)
+                    e.position = self._global_module.sources.position(location)
+                raise
 
     def generate_constructor_python(self, typ):
-        code = ''
-        if typ.is_sequence:
-            code = code + '[]'
-        if typ.is_array:
-            code = code + '['
-            for i in range(typ.size):
-                code = code + self.generate_constructor_python(typ.inner_type)
-                if i != typ.size-1:
-                    code = code + ', '
-            code = code + ']'
-        elif typ.is_primitive:
-            code = code + '0'
-        elif typ.is_typedef:
-            code = code + self.generate_constructor_python(typ.type)
-        elif typ.is_struct:
-            code = code + typ.full_path + '('
-            for m in typ.members:
-                if m.type.is_primitive:
-                    code = code + self.generate_constructor_python(m.type) + ', '
-                else:
-                    code = code + self.generate_constructor_python(m.type.obj) + ', '
-            code = code[:-2] + ')'
-        return code.replace('::', '.')
+        return _constructor_python(typ).replace('::', '.')
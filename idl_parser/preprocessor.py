@@ -0,0 +1,254 @@
+import re
+
+from . import lexer, exception
+
+# Macros are kept in a dictionary mapping their name to the tuple of tokens
+# of their replacement list, or to None for function-like macros, which can
+# be tested with #ifdef or defined() but are never substituted.
+
+_identifier = re.compile(r'[A-Za-z_]\w*')
+_defined_operand = re.compile(r'\s*(?:\(\s*([A-Za-z_]\w*)\s*\)|([A-Za-z_]\w*))')
+_expression_token = re.compile(r'''
+    \s*(?:
+      (0[xX][0-9a-fA-F]+|\d+)[uUlL]*             # integer literal
+    | ([A-Za-z_]\w*)                             # identifier
+    | (&&|\|\||==|!=|<=|>=|<<|>>|[-+*/%()!~<>&|^?:])  # operator
+    )''', re.VERBOSE)
+
+# Binary operators by precedence, lowest first.
+_binary_precedence = {
+    '||': 1, '&&': 2, '|': 3, '^': 4, '&': 5,
+    '==': 6, '!=': 6, '<': 7, '<=': 7, '>': 7, '>=': 7,
+    '<<': 8, '>>': 8, '+': 9, '-': 9, '*': 10, '/': 10, '%': 10,
+}
+
+
+def _divide(a, b):
+    if b == 0:
+        raise exception.InvalidIDLSyntaxError('Division by zero in #if expression')
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+def _modulo(a, b):
+    return a - b * _divide(a, b)
+
+
+def _shift(shift):
+    def _checked(a, b):
+        if b < 0:
+            raise exception.InvalidIDLSyntaxError('Negative shift count in #if expression')
+        return shift(a, b)
+    return _checked
+
+
+_binary_operators = {
+    '|': lambda a, b: a | b,
+    '^': lambda a, b: a ^ b,
+    '&': lambda a, b: a & b,
+    '==': lambda a, b: int(a == b),
+    '!=': lambda a, b: int(a != b),
+    '<': lambda a, b: int(a < b),
+    '<=': lambda a, b: int(a <= b),
+    '>': lambda a, b: int(a > b),
+    '>=': lambda a, b: int(a >= b),
+    '<<': _shift(lambda a, b: a << b),
+    '>>': _shift(lambda a, b: a >> b),
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    '/': _divide,
+    '%': _modulo,
+}
+
+
+def define(directive, macros):
+    """ Apply a #define or #undef directive to macros.
+    :param directive: Directive token, e.g. '#define VERSION 4'.
+    :param macros: Dictionary of macros, modified in place.
+    :returns: Name of the macro.
+    """
+    words = directive.split(None, 2)
+    if len(words) < 2:
+        raise exception.InvalidIDLSyntaxError('Macro name missing in "%s"' % directive)
+    if words[0] == '#undef':
+        macros.pop(words[1], None)
+        return words[1]
+    name = words[1]
+    if name.find('(') >= 0:
+        name = name[:name.find('(')]
+        macros[name] = None
+        return name
+    macros[name] = tuple(lexer.tokenize(words[2])) if len(words) > 2 else ()
+    return name
+
+
+def macros_from(defines):
+    """ Build a dictionary of macros from predefined ones.
+    :param defines: Dictionary of macro names and values, or list of names or
+                    'NAME=VALUE' strings, as given to cpp -D.
+    """
+    macros = {}
+    if defines is None:
+        return macros
+    if isinstance(defines, dict):
+        items = defines.items()
+    else:
+        items = [(d.split('=', 1) + ['1'])[:2] if d.find('=') >= 0 else (d, '1') for d in defines]
+    for name, value in items:
+        define('#define %s %s' % (name, value), macros)
+    return macros
+
+
+def expand(token, macros, _seen=()):
+    """ Return the list of tokens a word token expands to.
+    Identifiers embedded in a word, like the size in 'data[SIZE]', are
+    substituted too, as long as the replacement is a single token.
+    """
+    body = macros.get(token, None) if token not in _seen else None
+    if body is not None:
+        seen = _seen + (token,)
+        tokens = []
+        for t in body:
+            tokens.extend(expand(t, macros, seen))
+        return tokens
+    if token in macros or token.find('[') < 0 and token.find('<') < 0:
+        return [token]
+
+    def _replace(m):
+        name = m.group()
+        if name in _seen or macros.get(name) is None:
+            return name
+        return ' '.join(expand(name, macros, _seen))
+    return [_identifier.sub(_replace, token)]
+
+
+class _Expression(object):
+    """ Precedence climbing evaluator of #if expressions. """
+
+    def __init__(self, text, macros):
+        self._text = text
+        self._tokens = self._tokenize(text, macros, ())
+        self._pos = 0
+        # Greater than 0 while parsing operands that are not evaluated,
+        # like the right-hand side of 0 && x.
+        self._skip = 0
+
+    def _error(self, msg):
+        return exception.InvalidIDLSyntaxError('%s in #if expression "%s"' % (msg, self._text))
+
+    def _tokenize(self, text, macros, seen):
+        tokens = []
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            m = _expression_token.match(text, pos)
+            if m is None:
+                raise self._error('Unexpected character %r' % text[pos:].strip()[:1])
+            pos = m.end()
+            number, name, op = m.groups()
+            if number is not None:
+                tokens.append(int(number, 16) if number[:2] in ('0x', '0X') else
+                              int(number, 8) if number[0] == '0' and len(number) > 1 else
+                              int(number))
+            elif name == 'defined':
+                m = _defined_operand.match(text, pos)
+                if m is None:
+                    raise self._error('Macro name missing after defined')
+                pos = m.end()
+                tokens.append(int((m.group(1) or m.group(2)) in macros))
+            elif name is not None:
+                body = macros.get(name)
+                if body is None or name in seen:
+                    tokens.append(0)
+                else:
+                    tokens.extend(self._tokenize(' '.join(body), macros, seen + (name,)))
+            else:
+                tokens.append(op)
+        return tokens
+
+    def _next(self):
+        if self._pos >= len(self._tokens):
+            raise self._error('Unexpected end')
+        t = self._tokens[self._pos]
+        self._pos = self._pos + 1
+        return t
+
+    def _peek(self):
+        if self._pos < len(self._tokens):
+            return self._tokens[self._pos]
+        return None
+
+    def evaluate(self):
+        value = self._conditional()
+        if self._pos != len(self._tokens):
+            raise self._error('Unexpected "%s"' % self._tokens[self._pos])
+        return value
+
+    def _conditional(self):
+        value = self._binary(1)
+        if self._peek() == '?':
+            self._next()
+            a = self._operand(self._conditional, not value)
+            if self._next() != ':':
+                raise self._error('Missing ":"')
+            b = self._operand(self._conditional, value)
+            value = a if value else b
+        return value
+
+    def _operand(self, parse, skip):
+        if skip:
+            self._skip = self._skip + 1
+        try:
+            return parse()
+        finally:
+            if skip:
+                self._skip = self._skip - 1
+
+    def _binary(self, min_precedence):
+        value = self._unary()
+        while True:
+            op = self._peek()
+            precedence = _binary_precedence.get(op, 0)
+            if precedence < min_precedence:
+                return value
+            self._next()
+            skip = (op == '&&' and not value) or (op == '||' and value)
+            rhs = self._operand(lambda: self._binary(precedence + 1), skip)
+            if self._skip and op in ('/', '%', '<<', '>>'):
+                # Not evaluated: may divide by zero or shift by a negative count.
+                value = 0
+            elif op == '&&':
+                value = int(bool(value) and bool(rhs))
+            elif op == '||':
+                value = int(bool(value) or bool(rhs))
+            else:
+                value = _binary_operators[op](value, rhs)
+
+    def _unary(self):
+        t = self._next()
+        if t == '(':
+            value = self._conditional()
+            if self._next() != ')':
+                raise self._error('Missing ")"')
+            return value
+        if t == '!':
+            return int(not self._unary())
+        if t == '~':
+            return ~self._unary()
+        if t == '-':
+            return -self._unary()
+        if t == '+':
+            return self._unary()
+        if t in _binary_precedence or t in (')', '?', ':'):
+            raise self._error('Unexpected "%s"' % t)
+        return t
+
+
+def evaluate(expression, macros):
+    """ Evaluate the integer expression of an #if or #elif directive.
+    Macros are substituted, defined(NAME) and defined NAME are supported and
+    any remaining identifier evaluates to 0, as in C.
+    :returns: Integer value of the expression.
+    """
+    return _Expression(expression, macros).evaluate()
@@ -0,0 +1,674 @@
+"""
+Binary snapshots of a parsed tree, see IDLChannel.save_snapshot() and
+IDLChannel.load_snapshot().
+
+A snapshot holds every node of the tree, type nodes and resolved type links
+included, so that loading it gives back the tree as it was parsed and linked.
+It is made of the magic, the version, then sections each stored as their
+length in bytes followed by their body:
+
+    string offsets  offset of every string of the snapshot in the strings, and their end
+    strings         all of them, as one UTF-8 blob
+    classes         per node class: its name, its number of nodes and of fields,
+                    and the name, column kind and column start of each field
+    nodes           one column per attribute of every node: parent, name, filepath,
+                    and the file id and token ordinal of the location
+    fields          one column per field of every class
+    root            the sources and symbol table of the root
+
+Nodes are grouped by class, the root first. Integers are little-endian
+int32. Strings, classes and nodes are referred to by index, and -1 stands
+for None. Columns of values of different sizes start with the offset of
+every value, so that any attribute of any node can be read without reading
+the rest: load(path, lazy=True) reads a tree that way, straight from the
+memory-mapped file, only creating the nodes that are reached.
+"""
+from __future__ import absolute_import
+
+import array, bisect, itertools, mmap, numbers, struct, sys
+
+from . import node, source, symbols, exception
+
+MAGIC = b'IDLSNAP\x00'
+VERSION = 2
+
+# Node attributes stored as the nodes columns.
+_columns = ('_parent', '_name', '_filepath', '_location')
+# Node attributes not stored: caches, parse state and the tables of the root.
+_skipped = ('_root_node', '_full_path', '_full_path_name', '_block_tokens', '_block_location',
+            '_sources', '_symbols', '_snapshot')
+
+# Kinds of field columns: one integer per node for nodes, strings, integers
+# and booleans, a count per node then the items for node lists and for
+# dictionaries of nodes by name, else tagged values.
+_NODES, _STRINGS, _INTS, _BOOLS, _NODE_LISTS, _NODE_DICTS, _VALUES = range(7)
+# Kinds of the columns whose values differ in size, stored after their offsets.
+_indexed = (_NODE_LISTS, _NODE_DICTS, _VALUES)
+
+# Tags of values
+_NONE, _FALSE, _TRUE, _INT, _BIG_INT, _STR, _BYTES, _NODE, _NODE_LIST, _LIST, _DICT = range(11)
+
+_string_types = (type(u''), type(''))
+# Types of the values that can not refer to nodes.
+_atoms = frozenset(_string_types + (bool, int, type(2**64), float))
+
+
+def _slots(cls):
+    slots = []
+    for c in reversed(cls.__mro__):
+        slots.extend(c.__dict__.get('__slots__', ()))
+    return slots
+
+def _fields(cls):
+    return [s for s in _slots(cls) if not s in _columns and not s in _skipped]
+
+def _is_string(v):
+    # Under Python 2, str is bytes.
+    return isinstance(v, _string_types) and (bytes is str or not isinstance(v, bytes))
+
+def _is_int(v):
+    return isinstance(v, numbers.Integral) and not isinstance(v, bool) and -2**31 <= v < 2**31
+
+def _kind(values):
+    """ Column kind of the values of a field. """
+    if all([v is None or isinstance(v, node.IDLNode) for v in values]):
+        return _NODES
+    if all([v is None or _is_string(v) for v in values]):
+        return _STRINGS
+    if all([v is True or v is False for v in values]):
+        return _BOOLS
+    if all([_is_int(v) for v in values]):
+        return _INTS
+    if all([type(v) is node.IDLNodeList for v in values]):
+        return _NODE_LISTS
+    if all([type(v) is dict and all([_is_string(k) and isinstance(x, node.IDLNode) for k, x in v.items()])
+            for v in values]):
+        return _NODE_DICTS
+    return _VALUES
+
+def _tobytes(a):
+    if sys.byteorder == 'big':
+        a = array.array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes() if hasattr(a, 'tobytes') else a.tostring()
+
+def _frombytes(data):
+    a = array.array('i')
+    if hasattr(a, 'frombytes'):
+        a.frombytes(data)
+    else:
+        a.fromstring(data)
+    if sys.byteorder == 'big':
+        a.byteswap()
+    return a.tolist()
+
+
+class _Writer(object):
+
+    def __init__(self):
+        self._strings = []
+        self._string_ids = {}
+        self._nodes = []
+        self._node_ids = {}
+
+    def string(self, s):
+        if s is None:
+            return -1
+        i = self._string_ids.get(s)
+        if i is None:
+            i = self._string_ids[s] = len(self._strings)
+            self._strings.append(s)
+        return i
+
+    def node(self, n):
+        if n is None:
+            return -1
+        return self._node_ids[id(n)]
+
+    def _discover(self, v):
+        # Add the nodes v refers to to the nodes to store.
+        if v is None or type(v) in _atoms:
+            return
+        if isinstance(v, node.IDLNode):
+            if not id(v) in self._node_ids:
+                self._node_ids[id(v)] = len(self._nodes)
+                self._nodes.append(v)
+        elif isinstance(v, (list, tuple)):
+            for x in v:
+                self._discover(x)
+        elif isinstance(v, dict):
+            for k, x in v.items():
+                self._discover(k)
+                self._discover(x)
+
+    def value(self, v, values):
+        if v is None:
+            values.append(_NONE)
+        elif v is True:
+            values.append(_TRUE)
+        elif v is False:
+            values.append(_FALSE)
+        elif isinstance(v, node.IDLNode):
+            values.append(_NODE)
+            values.append(self.node(v))
+        elif type(v) is node.IDLNodeList:
+            values.append(_NODE_LIST)
+            values.append(len(v))
+            values.extend([self.node(n) for n in v])
+        elif _is_string(v):
+            values.append(_STR)
+            values.append(self.string(v))
+        elif isinstance(v, bytes):
+            values.append(_BYTES)
+            values.append(self.string(v.decode('latin-1')))
+        elif _is_int(v):
+            values.append(_INT)
+            values.append(v)
+        elif isinstance(v, numbers.Integral):
+            values.append(_BIG_INT)
+            values.append(self.string(str(v)))
+        elif isinstance(v, (list, tuple)):
+            values.append(_LIST)
+            values.append(len(v))
+            for x in v:
+                self.value(x, values)
+        elif isinstance(v, dict):
+            values.append(_DICT)
+            values.append(len(v))
+            for k, x in v.items():
+                self.value(k, values)
+                self.value(x, values)
+        else:
+            raise TypeError('Can not store %r in a snapshot' % (v,))
+
+    def index(self, index, values):
+        # A dictionary of lists of nodes by name, as its size, its names, the
+        # sizes of its lists then their nodes.
+        names = list(index.keys())
+        values.append(len(names))
+        values.extend([self.string(k) for k in names])
+        values.extend([len(index[k]) for k in names])
+        for k in names:
+            values.extend([self.node(n) for n in index[k]])
+
+    def field(self, kind, v, values):
+        if kind == _NODE_LISTS:
+            ids = self._node_ids
+            values.extend([ids[id(n)] for n in v])
+        elif kind == _NODE_DICTS:
+            for k, n in v.items():
+                values.append(self.string(k))
+                values.append(self.node(n))
+        else:
+            self.value(v, values)
+
+    def write(self, root):
+        table = root.symbols
+        tables = ([(f.filepath, f._text) for f in root.sources._files],
+                  table._by_name, table._by_path, table._references, table._types)
+        self._discover(root)
+        self._discover(tables)
+
+        # Walk every node, including the ones discovered on the way, and
+        # gather the values of their fields by class.
+        classes = []
+        fields = {}
+        columns = {}
+        i = 0
+        while i < len(self._nodes):
+            n = self._nodes[i]
+            cls = type(n)
+            if not cls in fields:
+                classes.append(cls)
+                fields[cls] = _fields(cls)
+                columns[cls] = ([], [[] for f in fields[cls]])
+            nodes, values = columns[cls]
+            nodes.append(n)
+            self._discover(n._parent)
+            for field, column in zip(fields[cls], values):
+                v = getattr(n, field, None)
+                self._discover(v)
+                column.append(v)
+            i = i + 1
+
+        # Number the nodes class by class.
+        self._nodes = []
+        for cls in classes:
+            self._nodes.extend(columns[cls][0])
+        self._node_ids = dict([(id(n), i) for i, n in enumerate(self._nodes)])
+
+        ids = self._node_ids
+        parents = array.array('i', [-1 if n._parent is None else ids[id(n._parent)] for n in self._nodes])
+        names = array.array('i', [self.string(n._name) for n in self._nodes])
+        filepaths = array.array('i', [self.string(n._filepath) for n in self._nodes])
+        fileids = array.array('i', [-1 if n._location is None else n._location >> 32 for n in self._nodes])
+        ordinals = array.array('i', [0 if n._location is None else n._location & 0xffffffff
+                                     for n in self._nodes])
+
+        class_table = array.array('i')
+        field_columns = array.array('i')
+        for cls in classes:
+            nodes, values = columns[cls]
+            class_table.append(self.string('%s:%s' % (cls.__module__, cls.__name__)))
+            class_table.append(len(nodes))
+            class_table.append(len(fields[cls]))
+            for field, column in zip(fields[cls], values):
+                kind = _kind(column)
+                class_table.append(self.string(field))
+                class_table.append(kind)
+                class_table.append(len(field_columns))
+                if kind in _indexed:
+                    # Offsets of the value of each node, then the values.
+                    items = array.array('i')
+                    offsets = []
+                    for v in column:
+                        offsets.append(len(items))
+                        self.field(kind, v, items)
+                    offsets.append(len(items))
+                    start = len(field_columns) + len(offsets)
+                    field_columns.extend([start + o for o in offsets])
+                    field_columns.extend(items)
+                elif kind == _NODES:
+                    field_columns.extend([-1 if v is None else ids[id(v)] for v in column])
+                elif kind == _STRINGS:
+                    field_columns.extend([self.string(v) for v in column])
+                elif kind == _BOOLS:
+                    field_columns.extend([int(v) for v in column])
+                else:
+                    field_columns.extend(column)
+
+        root_values = array.array('i')
+        self.value(tables[0], root_values)
+        for index in [table._by_name, table._by_path]:
+            self.index(index, root_values)
+        self.value(tables[3:], root_values)
+
+        encoded = [s.encode('utf-8') for s in self._strings]
+        offsets = array.array('i', [0])
+        for s in encoded:
+            offsets.append(offsets[-1] + len(s))
+        sections = [_tobytes(offsets), b''.join(encoded), _tobytes(class_table),
+                    b''.join([_tobytes(c) for c in [parents, names, filepaths, fileids, ordinals]]),
+                    _tobytes(field_columns), _tobytes(root_values)]
+        chunks = [MAGIC, struct.pack('<i', VERSION)]
+        for section in sections:
+            chunks.append(struct.pack('<i', len(section)))
+            chunks.append(section)
+        return b''.join(chunks)
+
+
+class _Reader(object):
+    """ Reads tagged values from a list of integers. """
+
+    def __init__(self, values, strings, nodes, pos=0):
+        self._values = values
+        self._strings = strings
+        self._nodes = nodes
+        self.pos = pos
+
+    def value(self):
+        values = self._values
+        pos = self.pos
+        tag = values[pos]
+        if tag == _NODE:
+            self.pos = pos + 2
+            return self._nodes[values[pos + 1]]
+        if tag == _STR:
+            self.pos = pos + 2
+            return self._strings[values[pos + 1]]
+        if tag == _NONE:
+            self.pos = pos + 1
+            return None
+        if tag == _INT:
+            self.pos = pos + 2
+            return values[pos + 1]
+        if tag == _TRUE or tag == _FALSE:
+            self.pos = pos + 1
+            return tag == _TRUE
+        if tag == _NODE_LIST:
+            count = values[pos + 1]
+            self.pos = pos + 2 + count
+            nodes = self._nodes
+            return node.IDLNodeList([nodes[i] for i in values[pos + 2 : pos + 2 + count]])
+        if tag == _BIG_INT:
+            self.pos = pos + 2
+            return int(self._strings[values[pos + 1]])
+        if tag == _BYTES:
+            self.pos = pos + 2
+            return self._strings[values[pos + 1]].encode('latin-1')
+        if tag == _LIST:
+            self.pos = pos + 2
+            return [self.value() for i in range(values[pos + 1])]
+        if tag == _DICT:
+            self.pos = pos + 2
+            d = {}
+            for i in range(values[pos + 1]):
+                k = self.value()
+                d[k] = self.value()
+            return d
+        raise exception.InvalidSnapshotError('Invalid value tag %d' % tag)
+
+    def index(self):
+        # See _Writer.index()
+        values = self._values
+        pos = self.pos
+        size = values[pos]
+        names = [self._strings[i] for i in values[pos + 1 : pos + 1 + size]]
+        counts = values[pos + 1 + size : pos + 1 + 2 * size]
+        pos = pos + 1 + 2 * size
+        nodes = [self._nodes[i] for i in values[pos : pos + sum(counts)]]
+        index = {}
+        start = 0
+        for name, c in zip(names, counts):
+            index[name] = nodes[start : start + c]
+            start = start + c
+        self.pos = pos + sum(counts)
+        return index
+
+
+def _set(nodes, attr, values):
+    # Set attr of every node through the slot descriptor, without a Python loop.
+    for _ in map(attr.__set__, nodes, values):
+        pass
+
+
+def _sections(data):
+    """ Return the offset and length of every section of the snapshot data. """
+    if data[:len(MAGIC)] != MAGIC:
+        raise exception.InvalidSnapshotError('Not an IDL snapshot')
+    version = struct.unpack_from('<i', data, len(MAGIC))[0]
+    if version != VERSION:
+        raise exception.InvalidSnapshotError('Unsupported snapshot version %d' % version)
+    sections = []
+    offset = len(MAGIC) + 4
+    for i in range(6):
+        if offset + 4 > len(data):
+            raise exception.InvalidSnapshotError('Truncated snapshot')
+        length = struct.unpack_from('<i', data, offset)[0]
+        if length < 0 or offset + 4 + length > len(data):
+            raise exception.InvalidSnapshotError('Truncated snapshot')
+        sections.append((offset + 4, length))
+        offset = offset + 4 + length
+    return sections
+
+def _classes(class_table, strings):
+    """ Return the node class, first node, number of nodes and fields of every
+    class of a class table. Fields are given as (name, kind, start of the column).
+    """
+    classes = []
+    first = 0
+    i = 0
+    while i < len(class_table):
+        qualname = strings[class_table[i]]
+        module, _, name = qualname.partition(':')
+        # Only node classes of this package can be named by a snapshot.
+        cls = node.node_class(module, name)
+        if cls is None:
+            raise exception.InvalidSnapshotError('Not a node class: %s' % qualname)
+        count = class_table[i + 1]
+        end = i + 3 + 3 * class_table[i + 2]
+        fields = [(strings[f], k, start) for f, k, start in zip(class_table[i + 3 : end : 3],
+                                                               class_table[i + 4 : end : 3],
+                                                               class_table[i + 5 : end : 3])]
+        classes.append((cls, first, count, fields))
+        first = first + count
+        i = end
+    return classes
+
+def _root_tables(reader):
+    """ Return the SourceMap and the SymbolTable of the root, read by reader. """
+    files = reader.value()
+    by_name, by_path = reader.index(), reader.index()
+    references, types = reader.value()
+    sources = source.SourceMap()
+    for filepath, text in files:
+        sources.add(filepath, text)
+    table = symbols.SymbolTable()
+    table._by_name = by_name
+    table._by_path = by_path
+    table._references = references
+    table._types = types
+    return sources, table
+
+
+def dumps(root):
+    """ Return the snapshot of the tree of root as bytes. """
+    return _Writer().write(root.root_node)
+
+
+def loads(data):
+    """ Return the root of the tree stored in the snapshot data. """
+    sections = [data[offset : offset + length] for offset, length in _sections(data)]
+    offsets, blob, class_table, columns, field_columns, root_values = sections
+
+    offsets = _frombytes(offsets)
+    strings = [blob[a:b].decode('utf-8') for a, b in zip(offsets, offsets[1:])]
+
+    # Create the nodes, class by class.
+    classes = _classes(_frombytes(class_table), strings)
+    nodes = []
+    for cls, first, count, fields in classes:
+        nodes.extend(map(cls.__new__, itertools.repeat(cls, count)))
+
+    columns = _frombytes(columns)
+    count = len(nodes)
+    parents, names, filepaths, fileids, ordinals = [columns[c * count : (c + 1) * count] for c in range(5)]
+    base = node.IDLNode.__dict__
+    _set(nodes, base['_parent'], [None if p < 0 else nodes[p] for p in parents])
+    _set(nodes, base['_name'], [None if s < 0 else strings[s] for s in names])
+    _set(nodes, base['_filepath'], [None if s < 0 else strings[s] for s in filepaths])
+    _set(nodes, base['_location'], [None if f < 0 else (f << 32) | o for f, o in zip(fileids, ordinals)])
+
+    field_columns = _frombytes(field_columns)
+    reader = _Reader(field_columns, strings, nodes)
+    for cls, first, count, fields in classes:
+        instances = nodes[first : first + count]
+        for s in _slots(cls):
+            if s in _skipped:
+                _set(instances, getattr(cls, s), itertools.repeat(None, count))
+        for field, kind, start in fields:
+            if kind in _indexed:
+                offsets = field_columns[start : start + count + 1]
+                begin = offsets[0]
+                bounds = [(a - begin, b - begin) for a, b in zip(offsets, offsets[1:])]
+            if kind == _NODE_LISTS:
+                items = [nodes[j] for j in field_columns[begin : offsets[-1]]]
+                values = [node.IDLNodeList(items[a:b]) for a, b in bounds]
+            elif kind == _NODE_DICTS:
+                items = list(zip([strings[j] for j in field_columns[begin : offsets[-1] : 2]],
+                                 [nodes[j] for j in field_columns[begin + 1 : offsets[-1] : 2]]))
+                values = [dict(items[a // 2 : b // 2]) for a, b in bounds]
+            elif kind == _VALUES:
+                reader.pos = begin
+                values = [reader.value() for j in range(count)]
+            else:
+                column = field_columns[start : start + count]
+                if kind == _NODES:
+                    values = [None if j < 0 else nodes[j] for j in column]
+                elif kind == _STRINGS:
+                    values = [None if j < 0 else strings[j] for j in column]
+                elif kind == _BOOLS:
+                    values = [j == 1 for j in column]
+                else:
+                    values = column
+            _set(instances, getattr(cls, field), values)
+
+    root = nodes[0]
+    root._sources, root._symbols = _root_tables(_Reader(_frombytes(root_values), strings, nodes))
+    return root
+
+
+class _Ints(object):
+    """ Little-endian int32 array read in place from a buffer, by index or by slice. """
+
+    def __init__(self, data, offset, length):
+        self._data = data
+        self._offset = offset
+        self._length = length // 4
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._length)
+            values = struct.unpack_from('<%di' % max(stop - start, 0), self._data, self._offset + 4 * start)
+            return list(values[::step])
+        if i < 0 or i >= self._length:
+            raise exception.InvalidSnapshotError('Invalid snapshot index %d' % i)
+        return _int32.unpack_from(self._data, self._offset + 4 * i)[0]
+
+
+_int32 = struct.Struct('<i')
+
+
+class _Lookup(object):
+    # Gives get(i) as self[i], for _Reader.
+    def __init__(self, get):
+        self._get = get
+
+    def __getitem__(self, i):
+        return self._get(i)
+
+
+class _LazySlot(object):
+    """ Attribute of a lazy node, read from its snapshot on first access. """
+
+    def __init__(self, name, slot):
+        self._name = name
+        self._slot = slot
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+        try:
+            return self._slot.__get__(obj, cls)
+        except AttributeError:
+            tree, i = obj._snapshot
+            value = tree.field(i, self._name)
+            self._slot.__set__(obj, value)
+            return value
+
+    def __set__(self, obj, value):
+        self._slot.__set__(obj, value)
+
+
+def _lazy_class(cls):
+    """ Subclass of the node class cls whose attributes are read on first access. """
+    lazy = _lazy_classes.get(cls)
+    if lazy is None:
+        attrs = {'__slots__': ('_snapshot',), '__module__': cls.__module__}
+        for c in cls.__mro__:
+            for s in c.__dict__.get('__slots__', ()):
+                if not s in attrs:
+                    attrs[s] = _LazySlot(s, c.__dict__[s])
+        lazy = _lazy_classes[cls] = type(cls.__name__, (cls,), attrs)
+    return lazy
+
+_lazy_classes = {}
+
+
+class _LazyTree(object):
+    """ Nodes of a snapshot, created on first reference and filled attribute
+    by attribute on first access, straight from the (memory-mapped) data.
+    """
+
+    def __init__(self, data):
+        self._data = data
+        sections = _sections(data)
+        self._offsets = _Ints(data, *sections[0])
+        self._blob = sections[1][0]
+        self._strings = {}
+        self._columns = _Ints(data, *sections[3])
+        self._field_columns = _Ints(data, *sections[4])
+        self._root_values = _Ints(data, *sections[5])
+        offset, length = sections[2]
+        self._classes = _classes(_frombytes(data[offset : offset + length]), _Lookup(self.string))
+        self._firsts = [first for cls, first, count, fields in self._classes]
+        self._fields = [dict([(f, (k, start)) for f, k, start in fields])
+                        for cls, first, count, fields in self._classes]
+        self._count = sum([count for cls, first, count, fields in self._classes])
+        self._nodes = {}
+        self._tables = None
+
+    def string(self, i):
+        if i < 0:
+            return None
+        s = self._strings.get(i)
+        if s is None:
+            a, b = self._offsets[i : i + 2]
+            s = self._strings[i] = self._data[self._blob + a : self._blob + b].decode('utf-8')
+        return s
+
+    def node(self, i):
+        if i < 0:
+            return None
+        n = self._nodes.get(i)
+        if n is None:
+            if i >= self._count:
+                raise exception.InvalidSnapshotError('Invalid node index %d' % i)
+            cls = _lazy_class(self._classes[bisect.bisect_right(self._firsts, i) - 1][0])
+            n = self._nodes[i] = cls.__new__(cls)
+            n._snapshot = (self, i)
+        return n
+
+    def field(self, i, name):
+        """ Value of the attribute name of the node i. """
+        columns = self._columns
+        if name == '_parent':
+            return self.node(columns[i])
+        if name == '_name':
+            return self.string(columns[self._count + i])
+        if name == '_filepath':
+            return self.string(columns[2 * self._count + i])
+        if name == '_location':
+            fileid = columns[3 * self._count + i]
+            return None if fileid < 0 else (fileid << 32) | columns[4 * self._count + i]
+        if name == '_sources' or name == '_symbols':
+            if self._tables is None:
+                self._tables = _root_tables(_Reader(self._root_values, _Lookup(self.string), _Lookup(self.node)))
+            return self._tables[name == '_symbols']
+        c = bisect.bisect_right(self._firsts, i) - 1
+        if not name in self._fields[c]:
+            return None
+        kind, start = self._fields[c][name]
+        values = self._field_columns
+        j = start + i - self._firsts[c]
+        if kind == _NODES:
+            return self.node(values[j])
+        if kind == _STRINGS:
+            return self.string(values[j])
+        if kind == _BOOLS:
+            return values[j] == 1
+        if kind == _INTS:
+            return values[j]
+        a, b = values[j : j + 2]
+        if kind == _NODE_LISTS:
+            return node.IDLNodeList([self.node(k) for k in values[a:b]])
+        if kind == _NODE_DICTS:
+            items = values[a:b]
+            return dict([(self.string(k), self.node(n)) for k, n in zip(items[::2], items[1::2])])
+        return _Reader(values, _Lookup(self.string), _Lookup(self.node), a).value()
+
+
+def save(root, path):
+    """ Write the snapshot of the tree of root to the file path. """
+    data = dumps(root)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def load(path, lazy=False):
+    """ Return the root of the tree stored in the snapshot file path.
+    :param lazy: If True, the file is memory-mapped and nodes are only read
+                 from it when first accessed. The file must not change while
+                 the tree is in use.
+    """
+    with open(path, 'rb') as f:
+        if not lazy:
+            return loads(f.read())
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, EnvironmentError):
+            raise exception.InvalidSnapshotError('Can not map %s' % path)
+    return _LazyTree(data).node(0)
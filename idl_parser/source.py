@@ -0,0 +1,150 @@
+import bisect, collections, contextlib, mmap, os
+
+from . import lexer
+
+
+@contextlib.contextmanager
+def open_mapped(filepath):
+    """ Map an IDL file in memory, read-only, for lexer.tokenize().
+    The mapping and the file are closed when leaving the context.
+    """
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0: # Empty files can not be mapped
+            yield b''
+            return
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield buf
+        finally:
+            buf.close()
+
+
+class DirectoryIndex(object):
+    """ Index of the IDL files found in lists of directories.
+    A directory is listed again only when its modification time changes.
+    """
+
+    def __init__(self):
+        self._listings = {}
+        self._indexes = {}
+
+    def _listing(self, idl_dir, mtime):
+        cached = self._listings.get(idl_dir)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, [f for f in os.listdir(idl_dir) if f.endswith('.idl')])
+            self._listings[idl_dir] = cached
+        return cached[1]
+
+    def index(self, idl_dirs):
+        """ Return an OrderedDict of the IDL files in idl_dirs, basename to path.
+        When several directories hold the same basename, the first one wins.
+        The result is shared: do not modify it.
+        """
+        key = tuple(idl_dirs)
+        mtimes = tuple([os.stat(d).st_mtime for d in key])
+        cached = self._indexes.get(key)
+        if cached is not None and cached[0] == mtimes:
+            return cached[1]
+        index = collections.OrderedDict()
+        for idl_dir, mtime in zip(key, mtimes):
+            for f in self._listing(idl_dir, mtime):
+                if not f in index:
+                    index[f] = os.path.join(idl_dir, f)
+        self._indexes[key] = (mtimes, index)
+        return index
+
+    def find(self, filename, idl_dirs):
+        """ Return the path of the IDL file named filename in idl_dirs, or None. """
+        return self.index(idl_dirs).get(filename)
+
+
+class Position(object):
+    __slots__ = ('filepath', 'fileid', 'offset', 'line', 'column')
+
+    def __init__(self, filepath, fileid, offset, line, column):
+        self.filepath = filepath
+        self.fileid = fileid
+        self.offset = offset
+        self.line = line
+        self.column = column
+
+    def __str__(self):
+        return '%s:%d:%d' % (self.filepath or '<string>', self.line, self.column)
+
+    def __repr__(self):
+        return 'Position(%s)' % self
+
+
+class SourceFile(object):
+    """ One IDL source known to a SourceMap.
+    Token offsets and line starts are only computed when a position inside
+    the file is requested. Sources read from disk are re-read at that time
+    instead of being kept in memory, and their offsets are byte offsets.
+    """
+
+    def __init__(self, fileid, filepath=None, text=None):
+        self.fileid = fileid
+        self.filepath = filepath
+        self._text = text
+        self._offsets = None
+        self._line_starts = None
+
+    @property
+    def text(self):
+        if self._text is not None:
+            return self._text
+        with open(self.filepath, 'rb') as f:
+            return f.read()
+
+    def invalidate(self):
+        """ Forget the offsets computed, once the file has changed on disk. """
+        self._offsets = None
+        self._line_starts = None
+
+    def _load(self):
+        text = self.text
+        self._offsets = lexer.offsets(text)
+        self._line_starts = lexer.line_starts(text)
+
+    def position(self, ordinal):
+        if self._offsets is None:
+            self._load()
+        if ordinal < len(self._offsets):
+            offset = self._offsets[ordinal]
+        else:
+            offset = self._line_starts[-1]
+        line = bisect.bisect_right(self._line_starts, offset)
+        column = offset - self._line_starts[line-1] + 1
+        return Position(self.filepath, self.fileid, offset, line, column)
+
+
+class SourceMap(object):
+    """ Registry of the sources parsed into one IDLChannel tree.
+    A location is a single integer packing a file id and the ordinal of a
+    token in that file; it is resolved to a Position on demand.
+    """
+
+    def __init__(self):
+        self._files = []
+        self._ids = {}
+
+    def add(self, filepath=None, text=None):
+        if text is None and filepath in self._ids:
+            return self._ids[filepath]
+        fileid = len(self._files)
+        self._files.append(SourceFile(fileid, filepath, text))
+        if text is None:
+            self._ids[filepath] = fileid
+        return fileid
+
+    def file(self, fileid):
+        return self._files[fileid]
+
+    @staticmethod
+    def location(fileid, ordinal):
+        return (fileid << 32) | ordinal
+
+    def position(self, location):
+        if location is None:
+            return None
+        return self._files[location >> 32].position(location & 0xffffffff)
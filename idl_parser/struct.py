@@ -5,15 +5,17 @@ from . import type as idl_type
 
 
 class IDLMember(node.IDLNode):
+    __slots__ = ('_type', '_annotation')
+
+    _classname = 'IDLMember'
+    _kind = node.MEMBER
+
     def __init__(self, parent):
-        super(IDLMember, self).__init__('IDLMember', '', parent)
-        self._verbose = True
+        super(IDLMember, self).__init__('', parent)
         self._type = None
         self._annotation = ''
-        self.sep = '::'
     
-    @property
-    def full_path(self):
+    def _path(self):
         return self.parent.full_path + self.sep + self.name
 
     def parse_blocks(self, blocks, filepath=None):
@@ -49,12 +51,6 @@ class IDLMember(node.IDLNode):
 
     @property
     def type(self):
-        if self._type.classname == 'IDLBasicType': # Struct
-            typs = self.root_node.find_types(self._type.name)
-            if len(typs) == 0:
-                print('-- Can not find Data Type (%s)\n' % self._type.name)
-                #raise exception.InvalidDataTypeException(self._type.name)
-            #return typs[0]
         return self._type
     
     @type.setter
@@ -80,15 +76,16 @@ class IDLMember(node.IDLNode):
               
 
 class IDLStruct(node.IDLNode):
+    __slots__ = ('_members',)
+
+    _classname = 'IDLStruct'
+    _kind = node.STRUCT
     
     def __init__(self, name, parent):
-        super(IDLStruct, self).__init__('IDLStruct', name.strip(), parent)
-        self._verbose = True
-        self._members = []
-        self.sep = '::'
+        super(IDLStruct, self).__init__(name.strip(), parent)
+        self._members = node.IDLNodeList()
         
-    @property
-    def full_path(self):
+    def _path(self):
         return (self.parent.full_path + self.sep + self.name).strip()
 
     def to_simple_dic(self, quiet=False, full_path=False, recursive=False, member_only=False):
@@ -111,12 +108,14 @@ class IDLStruct(node.IDLNode):
     
     def parse_tokens(self, token_buf, filepath=None):
         self._filepath = filepath
+        self._location = token_buf.location
         brace = token_buf.pop()
         if not brace == '{':
             if self._verbose: sys.stdout.write('# Error. No brace "{".\n')
             raise exception.InvalidIDLSyntaxError()
         
         block_tokens = []        
+        block_location = None
         while True:
 
             token = token_buf.pop()
@@ -141,17 +140,20 @@ class IDLStruct(node.IDLNode):
                 break
             
             if token == ';':
-                self._parse_block(block_tokens)
+                self._parse_block(block_tokens, block_location)
                 block_tokens = []
                 continue
+            if not block_tokens:
+                block_location = token_buf.location
             block_tokens.append(token)
 
         self._post_process()
         
         
             
-    def _parse_block(self, blocks):
+    def _parse_block(self, blocks, location=None):
         v = IDLMember(self)
+        v._location = location
         v.parse_blocks(blocks, self.filepath)
         self._members.append(v)
     
@@ -163,10 +165,7 @@ class IDLStruct(node.IDLNode):
         return self._members
 
     def member_by_name(self, name):
-        for m in self._members:
-            if m.name == name:
-                return m
-        return None
+        return self._members.by_name(name)
     
     def forEachMember(self, func):
         for m in self._members:
@@ -0,0 +1,80 @@
+class SymbolTable(object):
+    """ Type declarations (structs, unions, typedefs and enums) of an IDLChannel
+    tree, indexed by short name and by fully-qualified name.
+    It is filled while the declarations are parsed, so that finding a type
+    is a dictionary access instead of a walk of the whole tree.
+    """
+
+    def __init__(self):
+        self._by_name = {}
+        self._by_path = {}
+        # IDLBasicTypes waiting to be resolved by link().
+        self._references = []
+        # Shared instances of the types that do not refer to declarations,
+        # by type name (see type.IDLType).
+        self._types = {}
+
+    def add(self, node):
+        self._by_name.setdefault(node.name, []).append(node)
+        self._by_path.setdefault(node.full_path, []).append(node)
+
+    def remove(self, node):
+        """ Remove the declaration node, if it was added. """
+        for index, key in [(self._by_name, node.name), (self._by_path, node.full_path)]:
+            nodes = [n for n in index.get(key, ()) if n is not node]
+            if nodes:
+                index[key] = nodes
+            else:
+                index.pop(key, None)
+
+    def find(self, name, scope=None):
+        """ Return the list of declarations whose name or full path is name,
+        in declaration order.
+        :param scope: Node to restrict the search to. Defaults to the whole tree.
+        """
+        name = name.strip()
+        if name.find('::') >= 0:
+            nodes = self._by_path.get(name, [])
+        else:
+            nodes = self._by_name.get(name, [])
+        if scope is None or scope.is_root:
+            return list(nodes)
+        return [n for n in nodes if _is_inside(n, scope)]
+
+    def interned_type(self, name):
+        return self._types.get(name)
+
+    def intern_type(self, name, typ):
+        """ Register typ as the shared instance of the type name.
+        :returns: The shared instance.
+        """
+        return self._types.setdefault(name, typ)
+
+    def add_reference(self, typ):
+        self._references.append(typ)
+
+    def remove_references(self, types):
+        """ Stop resolving the IDLBasicTypes types, e.g. once their declarations are removed. """
+        ids = set([id(t) for t in types])
+        self._references = [t for t in self._references if not id(t) in ids]
+
+    def link(self):
+        """ Resolve the type references added since the last call.
+        References that can not be resolved are kept for the next call.
+        :returns: List of the names that could not be resolved.
+        """
+        references = self._references
+        self._references = [t for t in references if not t.link()]
+        return [t.name for t in self._references]
+
+    def __len__(self):
+        return sum([len(nodes) for nodes in self._by_path.values()])
+
+
+def _is_inside(node, scope):
+    n = node.parent
+    while n is not None:
+        if n is scope:
+            return True
+        n = n.parent
+    return False
@@ -1,25 +1,65 @@
+import bisect, sys
+
+from . import lexer, source
 
 
 class TokenBuffer():
-    
-    def __init__(self, lines):
-        self._tokens = []
+
+    def __init__(self, lines=None, tokens=None, segments=None):
+        """
+        :param lines: Source lines to tokenize, if tokens is not given.
+        :param tokens: List of tokens.
+        :param segments: List of (token index, file id, ordinal) tuples, each telling
+                         that tokens from that index on are consecutive tokens of a
+                         source file. Used to compute the location of tokens.
+        """
+        if tokens is None:
+            tokens = lexer.tokenize('\n'.join(lines))
+        self._tokens = tokens
         self._token_offset = 0
-        for line in lines:
-            ts = line.split(' ')
-            for t in ts:
-                if len(t.strip()) != 0:
-                    self._tokens.append(t.strip())
+        self._segments = segments
 
     @property
     def t_debug(self):
         return self._tokens
 
+    @property
+    def location(self):
+        """ Location of the last popped token (see source.SourceMap) or None. """
+        return self._location(self._token_offset - 1)
+
+    def _location(self, index):
+        if not self._segments or index < 0:
+            return None
+        start, fileid, ordinal = self._segments[bisect.bisect_right(self._segments, (index, sys.maxsize)) - 1]
+        return source.SourceMap.location(fileid, ordinal + index - start)
+
     def pop(self):
         if len(self._tokens) == self._token_offset:
             return None
-        t = self._tokens[self._token_offset].strip()
+        t = self._tokens[self._token_offset]
         self._token_offset = self._token_offset + 1
-        return t.strip()
+        return t
+
+
+class StreamingTokenBuffer(TokenBuffer):
+    """ TokenBuffer pulling tokens on demand from an iterator, so that no
+    token is kept in memory once popped.
+    """
 
-    
+    def __init__(self, tokens, segments=None):
+        self._iter = iter(tokens)
+        self._segments = segments
+        self._popped = 0
+
+    @property
+    def t_debug(self):
+        return []
+
+    @property
+    def location(self):
+        return self._location(self._popped - 1)
+
+    def pop(self):
+        self._popped = self._popped + 1
+        return next(self._iter, None)
@@ -61,70 +61,136 @@ primitive = [
 
 
 forbidden = ['unsigned','byte','octet']
- 
 
-           
+primitive_words = frozenset(primitive)
+forbidden_words = frozenset(forbidden)
+
+# Kinds of type spellings returned by classify()
+VOID = 1
+SEQUENCE = 2
+ARRAY = 3
+FORBIDDEN = 4
+PRIMITIVE = 5
+BASIC = 6
+
+# Memoised results of _words() and classify(), by type spelling. They are
+# shared by every parser, so they are emptied once they hold _memo_size
+# spellings, not to grow with all the types ever parsed.
+_word_flags = {}
+_classified = {}
+_memo_size = 4096
+
+
+def _memoise(memo, name, value):
+    if len(memo) >= _memo_size:
+        memo.clear()
+    memo[name] = value
+
+
+def _words(name):
+    flags = _word_flags.get(name)
+    if flags is None:
+        words = name.split(' ')
+        flags = (not primitive_words.isdisjoint(words), not forbidden_words.isdisjoint(words))
+        _memoise(_word_flags, name, flags)
+    return flags
+
 def is_primitive(name):
-    for n in name.split(' '):
-        if n in primitive:
-            return True
-    return False
+    """ True if a word of the type spelling name is a primitive, e.g. 'int32_t'. """
+    return _words(name)[0]
 
 def is_forbidden(name):
-    for n in name.split(' '):
-        if n in forbidden:
-            return True
-    return False
+    """ True if a word of the type spelling name is forbidden, e.g. 'unsigned long'. """
+    return _words(name)[1]
+
+def classify(name):
+    """ Return the kind of type the spelling name denotes, as IDLType() sees it:
+    VOID, SEQUENCE, ARRAY, FORBIDDEN, PRIMITIVE or BASIC (a declared type).
+    """
+    kind = _classified.get(name)
+    if kind is None:
+        if name == 'void':
+            kind = VOID
+        elif name.find('sequence') >= 0:
+            kind = SEQUENCE
+        elif name.find('[') >= 0:
+            kind = ARRAY
+        elif is_forbidden(name):
+            kind = FORBIDDEN
+        elif is_primitive(name):
+            kind = PRIMITIVE
+        else:
+            kind = BASIC
+        _memoise(_classified, name, kind)
+    return kind
 
 def IDLType(name, parent):
-    if name == 'void':
+    """ Return the type named name, as used by parent.
+    Primitives, void, and sequences and arrays of those are immutable: a single
+    instance of each is shared by the whole tree of parent.
+    """
+    types = parent.root_node.symbols
+    typ = types.interned_type(name)
+    if typ is not None:
+        return typ
+    typ = _new_type(name, parent)
+    if _is_shared(typ):
+        typ = types.intern_type(name, typ)
+    return typ
+
+def _is_shared(typ):
+    if typ.is_sequence or typ.is_array:
+        return _is_shared(typ.inner_type)
+    return typ.is_primitive or typ.is_void
+
+def _new_type(name, parent):
+    kind = classify(name)
+    if kind == VOID:
         return IDLVoid(name, parent)
-    elif name.find('sequence') >= 0:
+    elif kind == SEQUENCE:
         return IDLSequence(name, parent)
-    elif name.find('[') >= 0:
+    elif kind == ARRAY:
         return IDLArray(name, parent)
     
-    if is_forbidden(name):
+    if kind == FORBIDDEN:
         raise exception.InvalidIDLSyntaxError("-- ERROR: Cannot use type %s in SmOptics IDL file !!!" %(name))
     
-    if is_primitive(name):
+    if kind == PRIMITIVE:
         return IDLPrimitive(name, parent)
 
     return IDLBasicType(name, parent)
 
 class IDLTypeBase(node.IDLNode):
-    def __init__(self, classname, name, parent):
-        super(IDLTypeBase, self).__init__(classname, name, parent.root_node)
-        self._is_sequence = False
-        self._is_primitive = False
+    __slots__ = ()
+
+    def __init__(self, name, parent):
+        super(IDLTypeBase, self).__init__(name, parent.root_node)
 
     def __str__(self):
         return self.name
 
-    @property
-    def is_sequence(self):
-        return self._is_sequence
 
-    @property
-    def is_primitive(self):
-        return self._is_primitive
+class IDLVoid(IDLTypeBase):
+    __slots__ = ()
 
+    _classname = 'IDLVoid'
+    _kind = node.VOID
 
-class IDLVoid(IDLTypeBase):
     def __init__(self, name, parent):
-        super(IDLVoid, self).__init__('IDLVoid', name, parent.root_node)
-        self._verbose = True
+        super(IDLVoid, self).__init__(name, parent.root_node)
 
 class IDLSequence(IDLTypeBase):
+    __slots__ = ('_type',)
+
+    _classname = 'IDLSequence'
+    _kind = node.SEQUENCE
+
     def __init__(self, name, parent):
-        super(IDLSequence, self).__init__('IDLSequence', name, parent.root_node)
-        self._verbose = True
+        super(IDLSequence, self).__init__(name, parent.root_node)
         if name.find('sequence<') < 0:
             raise exception.InvalidIDLSyntaxError("-- IDL sequence must have syntax: sequence<T>")
         typ_ = name[name.find('<')+1 : name.find('>')]
         self._type = IDLType(typ_, parent)
-        self._is_primitive = False #self.inner_type.is_primitive
-        self._is_sequence = True
 
     @property
     def inner_type(self):
@@ -153,8 +219,7 @@ class IDLSequence(IDLTypeBase):
     def type(self):
         return self._type
 
-    @property
-    def full_path(self):
+    def _path(self):
         return self.parent.full_path + sep + self.name
 
     def to_simple_dic(self, quiet=False, full_path=False, recursive=False, member_only=False):
@@ -188,10 +253,14 @@ class IDLSequence(IDLTypeBase):
         return dic
 
 class IDLArray(IDLTypeBase):
+    __slots__ = ('_size', '_type')
+
+    _classname = 'IDLArray'
+    _kind = node.ARRAY
+
     def __init__(self, name, parent):
-        super(IDLArray, self).__init__('IDLArray', name.strip(), parent.root_node)
+        super(IDLArray, self).__init__(name.strip(), parent.root_node)
 
-        self._verbose = True
         if name.find('[') < 0:
             raise exception.InvalidIDLSyntaxError()
         primitive_type_name = name[:name.find('[')]
@@ -199,9 +268,6 @@ class IDLArray(IDLTypeBase):
         inner_type_name = primitive_type_name + name[name.find(']')+1:]
         self._size = int(size)
         self._type = IDLType(inner_type_name.strip(), parent)
-        self._is_primitive = False #self.inner_type.is_primitive
-        self._is_sequence = False
-        self._is_array = True
 
 
     @property
@@ -248,8 +314,7 @@ class IDLArray(IDLTypeBase):
     def type(self):
         return self._type
 
-    @property
-    def full_path(self):
+    def _path(self):
         return self.parent.full_path + sep + self.name
 
     def to_simple_dic(self, quiet=False, full_path=False, recursive=False, member_only=False):
@@ -284,24 +349,39 @@ class IDLArray(IDLTypeBase):
 
         
 class IDLPrimitive(IDLTypeBase):
+    __slots__ = ()
+
+    _classname = 'IDLPrimitive'
+    _kind = node.PRIMITIVE
+
     def __init__(self, name, parent):
-        super(IDLPrimitive, self).__init__('IDLPrimitive', name, parent.root_node)
-        self._verbose = True
-        self._is_primitive = True
+        super(IDLPrimitive, self).__init__(name, parent.root_node)
 
 class IDLBasicType(IDLTypeBase):
+    __slots__ = ('_obj',)
+
+    _classname = 'IDLBasicType'
+    _kind = node.BASIC_TYPE
+
     def __init__(self, name, parent):
-        super(IDLBasicType, self).__init__('IDLBasicType', name, parent.root_node)
-        self._verbose = True
+        super(IDLBasicType, self).__init__(name, parent.root_node)
         #if self.name.find('['):
         #    self._name = self.name[self.name.find('[')+1:]
         self._name = self.refine_typename(self.name)
-        
+        self._obj = None
+        self.root_node.symbols.add_reference(self)
+
+    def link(self):
+        """ Resolve the declaration this type refers to.
+        :returns: False if it can not be found (yet).
+        """
+        typs = self.root_node.find_types(self.name)
+        if len(typs) > 0:
+            self._obj = typs[0]
+        return self._obj is not None
+
     @property
     def obj(self):
-        global_module = self.root_node
-        typs = global_module.find_types(self.name)
-        if len(typs) == 0:
-            return None
-        else:
-            return typs[0]
+        if self._obj is None:
+            self.link()
+        return self._obj
@@ -3,14 +3,16 @@ from . import type as idl_type
 sep = '::'
 
 class IDLTypedef(node.IDLNode):
+    __slots__ = ('_type',)
+
+    _classname = 'IDLTypedef'
+    _kind = node.TYPEDEF
     
     def __init__(self, parent):
-        super(IDLTypedef, self).__init__('IDLTypedef', '', parent)
-        self._verbose = True
+        super(IDLTypedef, self).__init__('', parent)
         self._type = None
 
-    @property
-    def full_path(self):
+    def _path(self):
         return self.parent.full_path + sep + self.name
 
     def to_simple_dic(self, quiet=False, full_path=False, recursive=False, member_only=False):
@@ -39,9 +41,9 @@ class IDLTypedef(node.IDLNode):
 
     @property
     def type(self):
-        if self._type.classname == 'IDLBasicType': # Struct
-            if self.root_node.find_types(self._type.name).__len__() > 0:
-                return self.root_node.find_types(self._type.name)[0]
+        if self._type.kind == node.BASIC_TYPE: # Struct
+            if self._type.obj is not None:
+                return self._type.obj
         return self._type
 
     def get_type(self, extract_typedef=False):
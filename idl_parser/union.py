@@ -10,15 +10,17 @@ from . import type as idl_type
 
 
 class IDLUnionMember(node.IDLNode):
+    __slots__ = ('_type', '_annotation')
+
+    _classname = 'IDLUnionMember'
+    _kind = node.UNION_MEMBER
+
     def __init__(self, parent):
-        super(IDLUnionMember, self).__init__('IDLUnionMember', '', parent)
-        self._verbose = True
+        super(IDLUnionMember, self).__init__('', parent)
         self._type = None
         self._annotation = ''
-        self.sep = '::'
     
-    @property
-    def full_path(self):
+    def _path(self):
         return self.parent.full_path + self.sep + self.name
 
     def parse_blocks(self, blocks, filepath=None):
@@ -54,12 +56,6 @@ class IDLUnionMember(node.IDLNode):
 
     @property
     def type(self):
-        if self._type.classname == 'IDLBasicType': # Struct
-            typs = self.root_node.find_types(self._type.name)
-            if len(typs) == 0:
-                print('-- Can not find Data Type (%s)\n' % self._type.name)
-                #raise exception.InvalidDataTypeException(self._type.name)
-            #return typs[0]
         return self._type
     
 
@@ -81,15 +77,16 @@ class IDLUnionMember(node.IDLNode):
               
 
 class IDLUnion(node.IDLNode):
+    __slots__ = ('_members',)
+
+    _classname = 'IDLUnion'
+    _kind = node.UNION
     
     def __init__(self, name, parent):
-        super(IDLUnion, self).__init__('IDLUnion', name.strip(), parent)
-        self._verbose = True
-        self._members = []
-        self.sep = '::'
+        super(IDLUnion, self).__init__(name.strip(), parent)
+        self._members = node.IDLNodeList()
         
-    @property
-    def full_path(self):
+    def _path(self):
         return (self.parent.full_path + self.sep + self.name).strip()
 
     def to_simple_dic(self, quiet=False, full_path=False, recursive=False, member_only=False):
@@ -112,12 +109,14 @@ class IDLUnion(node.IDLNode):
     
     def parse_tokens(self, token_buf, filepath=None):
         self._filepath = filepath
+        self._location = token_buf.location
         brace = token_buf.pop()
         if not brace == '{':
             if self._verbose: sys.stdout.write('# Error. No brace "{".\n')
             raise exception.InvalidIDLSyntaxError()
         
         block_tokens = []        
+        block_location = None
         while True:
 
             token = token_buf.pop()
@@ -133,15 +132,18 @@ class IDLUnion(node.IDLNode):
                 break
             
             if token == ';':
-                self._parse_block(block_tokens)
+                self._parse_block(block_tokens, block_location)
                 block_tokens = []
                 continue
+            if not block_tokens:
+                block_location = token_buf.location
             block_tokens.append(token)
 
         self._post_process()
             
-    def _parse_block(self, blocks):
+    def _parse_block(self, blocks, location=None):
         v = IDLUnionMember(self)
+        v._location = location
         v.parse_blocks(blocks, self.filepath)
         self._members.append(v)
     
@@ -153,10 +155,7 @@ class IDLUnion(node.IDLNode):
         return self._members
 
     def member_by_name(self, name):
-        for m in self._members:
-            if m.name == name:
-                return m
-        return None
+        return self._members.by_name(name)
     
     
     def forEachMember(self, func):
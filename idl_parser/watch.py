@@ -0,0 +1,110 @@
+"""
+Watch mode, see IDLParser.watch().
+
+The IDL directories of a parser and the files it parsed are polled: a file
+changed when its modification time or its size did, so that no file system
+notification library is needed. Changes are batched until the files settle,
+then the parser is updated with them (see IDLParser.update()).
+"""
+import os, sys, time
+
+from . import incremental
+
+
+class Watcher(object):
+    """ Keeps a parser up to date with its IDL files, and calls back with the
+    full paths of the declarations that changed each time it updates it.
+    Callbacks are called as callback(declarations), from the thread running
+    the watcher, which is the only one that may use the parser meanwhile.
+    """
+
+    def __init__(self, parser, callbacks=(), interval=0.05, settle=0.02, on_error=None):
+        """
+        :param interval: Seconds between two polls of the files.
+        :param settle: Seconds the files must stay the same once changed before
+                       the parser is updated, so that a file being saved in
+                       several writes, or several files, make one update.
+        :param on_error: Function called as on_error(paths, error) when the changed
+                         files can not be parsed, whatever the exception raised.
+                         By default the error is written out.
+                         Either way the files are parsed again once they change again.
+        """
+        self._parser = parser
+        self._callbacks = list(callbacks)
+        self.interval = interval
+        self.settle = settle
+        self._on_error = on_error
+        self._stats = self._scan()
+
+    def add_callback(self, callback):
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        self._callbacks.remove(callback)
+
+    def _scan(self):
+        """ Return the modification time and size of the watched files, by path. """
+        paths = set([idl_path for idl_path, fileid in self._parser._idl_files.values()])
+        for idl_dir in self._parser.dirs:
+            try:
+                paths.update([os.path.join(idl_dir, f) for f in os.listdir(idl_dir) if f.endswith('.idl')])
+            except OSError:
+                pass
+        stats = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            stats[path] = (st.st_mtime, st.st_size)
+        return stats
+
+    def poll(self):
+        """ Return the set of the paths of the files created, changed or deleted since the last poll. """
+        stats = self._scan()
+        changed = set([p for p in set(stats) | set(self._stats) if stats.get(p) != self._stats.get(p)])
+        self._stats = stats
+        return changed
+
+    def refresh(self, paths):
+        """ Update the parser with the changed files paths, then call the callbacks
+        if declarations changed.
+        :returns: Set of the full paths of the declarations that changed.
+        """
+        parser = self._parser
+        try:
+            reparsed, removed = parser._update(paths)
+        except Exception as e:
+            # Files being saved may be read half written, and fail in any way:
+            # watching goes on, they are parsed again once they change again.
+            if self._on_error is not None:
+                self._on_error(paths, e)
+            else:
+                sys.stdout.write('# Error. Can not parse %s (%s)\n' % (', '.join(sorted(paths)), e))
+            return set()
+        fileids = set([parser._idl_files[key][1] for key in reparsed])
+        changed = incremental.changes(removed, incremental.declarations(parser.global_module, fileids))
+        if changed:
+            for callback in list(self._callbacks):
+                callback(changed)
+        return changed
+
+    def run(self, stop=None):
+        """ Poll the files and refresh the parser until the threading.Event stop is set, or forever. """
+        while stop is None or not stop.is_set():
+            changed = self.poll()
+            if changed:
+                while True:
+                    self._sleep(self.settle, stop)
+                    more = self.poll()
+                    if not more:
+                        break
+                    changed.update(more)
+                self.refresh(changed)
+            self._sleep(self.interval, stop)
+
+    def _sleep(self, seconds, stop):
+        if stop is None:
+            time.sleep(seconds)
+        else:
+            stop.wait(seconds)
@@ -26,6 +26,6 @@ setup(name='idl_parser',
         'Programming Language :: Python',
         'Topic :: Scientific/Engineering',
         ],
-      test_suite = "tests.module_test.suite",
+      test_suite = "tests.suite",
       #package_dir = {'': 'src'}
     )
@@ -1 +1,11 @@
+import unittest
+
 from . import module_test
+from . import parser_test
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTests(module_test.suite())
+    suite.addTests(parser_test.suite())
+    return suite
@@ -0,0 +1,979 @@
+import io, os, pickle, sys, shutil, tempfile, threading, time
+import unittest
+from idl_parser import parser, preprocessor, source, exception, node, module, channel, watch, cache, lexer, token_buffer
+from idl_parser import type as idl_type
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
+
+
+diamond_dir = 'idls/diamond'
+guards_dir = 'idls/guards'
+preprocessor_idl_path = 'idls/preprocessor_test.idl'
+
+
+class CountingParser(parser.IDLParser):
+    def __init__(self, *args, **kwargs):
+        parser.IDLParser.__init__(self, *args, **kwargs)
+        self.parse_count = 0
+
+    def parse_tokens(self, tokens, *args, **kwargs):
+        self.parse_count = self.parse_count + 1
+        return parser.IDLParser.parse_tokens(self, tokens, *args, **kwargs)
+
+
+class IncludeTestFunctions(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def _interface(self, m, name):
+        return m.module_by_name('diamond').interface_by_name(name)
+
+    def test_diamond_include(self):
+        for streaming in [False, True]:
+            parser_ = CountingParser(idl_dirs=[diamond_dir], streaming=streaming)
+            parser_.parse_idl(os.path.join(diamond_dir, 'top.idl'))
+            self.assertEqual(parser_.parse_count, 4)
+
+            m = parser_.global_module
+            base = self._interface(m, 'base_types').public_by_name('public')
+            self.assertEqual([s.name for s in base.structs], ['Base'])
+            top = self._interface(m, 'top_types').public_by_name('public')
+            self.assertEqual([s.name for s in top.structs], ['Top'])
+
+            graph = parser_.include_graph
+            base_path = os.path.realpath(os.path.join(diamond_dir, 'base.idl'))
+            self.assertEqual(graph[os.path.realpath(os.path.join(diamond_dir, 'left.idl'))], [base_path])
+            self.assertEqual(graph[os.path.realpath(os.path.join(diamond_dir, 'right.idl'))], [base_path])
+
+    def test_parse_directory(self):
+        parser_ = CountingParser()
+        parser_.parse(idl_dirs=[os.path.abspath(diamond_dir)])
+        self.assertEqual(parser_.parse_count, 4)
+
+    def test_include_guards(self):
+        for streaming in [False, True]:
+            parser_ = CountingParser(idl_dirs=[guards_dir], streaming=streaming)
+            parser_.parse_idl(os.path.join(guards_dir, 'main.idl'))
+            self.assertEqual(parser_.parse_count, 3)
+            self.assertEqual(parser_.include_skips['include guard'], 1)
+            self.assertEqual(parser_.include_skips['pragma once'], 1)
+            self.assertEqual(parser_.include_skips['already parsed'], 0)
+
+    def test_error_position_after_include(self):
+        d = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(d, 'inc.idl'), 'w') as f:
+                f.write('module inc { interface i { public: {\n  struct A { long @0 a; };\n}; }; };\n')
+            with open(os.path.join(d, 'main.idl'), 'w') as f:
+                f.write('#include "inc.idl"\nmodule m {\n  interface j {\n    public: {\n    };\n'
+                        '    struct B { long @0 b; }\n  };\n};\n')
+            for streaming in [False, True]:
+                parser_ = parser.IDLParser(idl_dirs=[d], streaming=streaming)
+                try:
+                    parser_.parse_idl(os.path.join(d, 'main.idl'))
+                    self.fail('InvalidIDLSyntaxError not raised')
+                except exception.InvalidIDLSyntaxError as e:
+                    self.assertEqual(str(e.position), '%s:7:3' % os.path.join(d, 'main.idl'))
+        finally:
+            shutil.rmtree(d)
+
+    def test_include_in_scope(self):
+        d = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(d, 'inc.idl'), 'w') as f:
+                f.write('interface X { public: { struct A { long @0 a; }; }; };\n')
+            with open(os.path.join(d, 'main.idl'), 'w') as f:
+                f.write('module m {\n#include "inc.idl"\n  interface i { public: { }; };\n};\n')
+            for streaming in [False, True]:
+                parser_ = parser.IDLParser(idl_dirs=[d], streaming=streaming)
+                try:
+                    parser_.parse_idl(os.path.join(d, 'main.idl'))
+                    self.fail('InvalidIDLSyntaxError not raised')
+                except exception.InvalidIDLSyntaxError as e:
+                    self.assertEqual(str(e.position), '%s:2:1' % os.path.join(d, 'main.idl'))
+        finally:
+            shutil.rmtree(d)
+
+    def test_directory_index(self):
+        dirs = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+        try:
+            index = source.DirectoryIndex()
+            self.assertEqual(index.find('a.idl', dirs), None)
+            for d in reversed(dirs):
+                open(os.path.join(d, 'a.idl'), 'w').close()
+                os.utime(d, (0, os.stat(d).st_mtime + 10))
+            self.assertEqual(index.find('a.idl', dirs), os.path.join(dirs[0], 'a.idl'))
+            self.assertEqual(list(index.index(dirs).keys()), ['a.idl'])
+        finally:
+            for d in dirs:
+                shutil.rmtree(d)
+
+
+class _Mkdir(object):
+    # Unpickled as a call to os.mkdir(path).
+    def __init__(self, path):
+        self._path = path
+
+    def __reduce__(self):
+        return (os.mkdir, (self._path,))
+
+
+class CacheTestFunctions(unittest.TestCase):
+    def setUp(self):
+        self._root = tempfile.mkdtemp()
+        self._dir = os.path.join(self._root, 'idls')
+        self._cache_dir = os.path.join(self._root, 'cache')
+        shutil.copytree(diamond_dir, self._dir)
+
+    def tearDown(self):
+        shutil.rmtree(self._root)
+
+    def _parse(self):
+        parser_ = CountingParser(idl_dirs=[self._dir], cache_dir=self._cache_dir)
+        parser_.parse_idl(os.path.join(self._dir, 'top.idl'))
+        parser_.link()
+        return parser_
+
+    def _structs(self, parser_):
+        structs = []
+        for i in parser_.global_module.module_by_name('diamond').interfaces:
+            for s in i.public_by_name('public').structs:
+                members = [m.type.name if m.type.is_primitive else m.type.obj.full_path for m in s.members]
+                structs.append((s.full_path, str(s.position), members))
+        return structs
+
+    def test_warm_parse(self):
+        expected = CountingParser(idl_dirs=[self._dir])
+        expected.parse_idl(os.path.join(self._dir, 'top.idl'))
+        expected.link()
+
+        cold = self._parse()
+        self.assertEqual(cold.cache_stats, {'hits': 0, 'misses': 4})
+        warm = self._parse()
+        self.assertEqual(warm.cache_stats, {'hits': 4, 'misses': 0})
+        self.assertEqual(warm.parse_count, 0)
+        for parser_ in [cold, warm]:
+            self.assertEqual(self._structs(parser_), self._structs(expected))
+            self.assertEqual(parser_.include_graph, expected.include_graph)
+            self.assertEqual(parser_.include_skips, expected.include_skips)
+            self.assertEqual(len(parser_.global_module.symbols), 4)
+            # Units share the primitive types of the tree they are loaded into.
+            base = parser_.global_module.symbols.find('Base')[0]
+            self.assertTrue(base.member_by_name('value').type is parser_.global_module.symbols._types['long'])
+
+    def test_untrusted_entries(self):
+        self._parse()
+        marker = os.path.join(self._root, 'marker')
+        for name in os.listdir(self._cache_dir):
+            with open(os.path.join(self._cache_dir, name), 'wb') as f:
+                pickle.dump(_Mkdir(marker), f, 2)
+        parser_ = self._parse()
+        self.assertFalse(os.path.exists(marker))
+        self.assertEqual(parser_.cache_stats, {'hits': 0, 'misses': 4})
+        self.assertRaises(pickle.UnpicklingError, cache.loads, pickle.dumps(_Mkdir(marker), 2),
+                          parser_.global_module)
+        self.assertFalse(os.path.exists(marker))
+
+    def test_invalidation(self):
+        self._parse()
+        # Files including a changed one are parsed again, as they may use its macros,
+        # and so are the ones included after it.
+        with open(os.path.join(self._dir, 'left.idl'), 'a') as f:
+            f.write('#define LEFT\n')
+        self.assertEqual(self._parse().cache_stats, {'hits': 1, 'misses': 3})
+        self.assertEqual(self._parse().cache_stats, {'hits': 4, 'misses': 0})
+
+        parser_ = CountingParser(idl_dirs=[self._dir], cache_dir=self._cache_dir)
+        parser_.parse(idls=[os.path.join(self._dir, 'top.idl')], defines=['LEFT'])
+        self.assertEqual(parser_.cache_stats, {'hits': 0, 'misses': 4})
+
+
+class UpdateTestFunctions(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        for f in os.listdir(diamond_dir):
+            shutil.copy(os.path.join(diamond_dir, f), self._dir)
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def _path(self, filename):
+        return os.path.join(self._dir, filename)
+
+    def _interface(self, parser_, name):
+        return parser_.global_module.module_by_name('diamond').interface_by_name(name)
+
+    def test_update(self):
+        parser_ = CountingParser(idl_dirs=[self._dir])
+        parser_.parse()
+        top = self._interface(parser_, 'top_types').public_by_name('public').struct_by_name('Top')
+        with open(self._path('right.idl'), 'w') as f:
+            f.write('module diamond { interface right_types { public: {\n'
+                    '  struct Other { long @0 a; };\n'
+                    '  struct Right { Other @0 other; };\n'
+                    '}; }; };\n')
+
+        parser_.parse_count = 0
+        reparsed = parser_.update([self._path('right.idl')])
+        # top.idl includes right.idl: it is parsed again, left.idl and base.idl are not.
+        self.assertEqual(sorted(reparsed), [os.path.realpath(self._path(f)) for f in ['right.idl', 'top.idl']])
+        self.assertEqual(parser_.parse_count, 2)
+
+        m = parser_.global_module
+        right = self._interface(parser_, 'right_types').public_by_name('public')
+        self.assertEqual([s.name for s in right.structs], ['Other', 'Right'])
+        self.assertEqual(right.struct_by_name('Right').members[0].type.obj.full_path,
+                         'diamond::right_types::public::Other')
+        self.assertEqual(len(m.symbols.find('Top')), 1)
+        self.assertFalse(m.symbols.find('Top')[0] is top)
+        self.assertEqual(str(right.struct_by_name('Right').position), '%s:3:10' % self._path('right.idl'))
+        self.assertEqual(len(m.symbols), 5)
+
+    def test_relink(self):
+        parser_ = parser.IDLParser(idl_dirs=[self._dir])
+        parser_.parse()
+        with open(self._path('user.idl'), 'w') as f:
+            f.write('module diamond { interface user_types { public: { struct User { Left @0 left; }; }; }; };\n')
+        self.assertEqual(parser_.update([self._path('user.idl')]), [os.path.realpath(self._path('user.idl'))])
+        user = self._interface(parser_, 'user_types').public_by_name('public').struct_by_name('User')
+        left = user.members[0].type.obj
+
+        # user.idl does not include left.idl, but its references to it are linked again.
+        with open(self._path('left.idl'), 'a') as f:
+            f.write('\n')
+        parser_.update([self._path('left.idl')])
+        self.assertFalse(user.members[0].type.obj is left)
+        self.assertTrue(user.members[0].type.obj is parser_.global_module.symbols.find('Left')[0])
+
+        os.remove(self._path('user.idl'))
+        parser_.update([self._path('user.idl')])
+        self.assertEqual(self._interface(parser_, 'user_types'), None)
+        self.assertEqual(parser_.global_module.symbols.find('User'), [])
+
+
+class WatchTestFunctions(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        for f in os.listdir(diamond_dir):
+            shutil.copy(os.path.join(diamond_dir, f), self._dir)
+        self._parser = parser.IDLParser(idl_dirs=[self._dir])
+        self._parser.parse()
+        self._changes = []
+        self._errors = []
+        self._watcher = watch.Watcher(self._parser, [self._changes.append],
+                                      on_error=lambda paths, e: self._errors.append(paths))
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def _write(self, filename, old, new):
+        path = os.path.join(self._dir, filename)
+        with open(path) as f:
+            text = f.read()
+        with open(path, 'w') as f:
+            f.write(text.replace(old, new))
+        return path
+
+    def test_refresh(self):
+        self.assertEqual(self._watcher.poll(), set())
+        path = self._write('base.idl', 'long @0 value;', 'long @0 value; double @1 scale;')
+        changed = self._watcher.poll()
+        self.assertEqual(changed, set([path]))
+        # left, right and top include base: only Base changed in them.
+        self.assertEqual(self._watcher.refresh(changed), set(['diamond::base_types::public::Base']))
+        self.assertEqual(self._changes, [set(['diamond::base_types::public::Base'])])
+        base = self._parser.global_module.symbols.find('Base')[0]
+        self.assertEqual([m.name for m in base.members], ['value', 'scale'])
+        self.assertEqual(self._watcher.poll(), set())
+
+    def test_error(self):
+        path = self._write('left.idl', 'struct Left {', 'struct Left')
+        self.assertEqual(self._watcher.refresh(self._watcher.poll()), set())
+        self.assertEqual(self._errors, [set([path])])
+        self._write('left.idl', 'struct Left', 'struct Left {')
+        self._watcher.refresh(self._watcher.poll())
+        top = self._parser.global_module.symbols.find('Top')[0]
+        self.assertEqual(top.members[0].type.obj.full_path, 'diamond::left_types::public::Left')
+
+    def test_read_error(self):
+        # Any error reading a file, here a file saved half way through a character.
+        path = os.path.join(self._dir, 'left.idl')
+        with open(path, 'rb') as f:
+            data = f.read()
+        with open(path, 'wb') as f:
+            f.write(data.replace(b'struct Left', b'struct Left\xe2\x82'))
+        self.assertEqual(self._watcher.refresh(self._watcher.poll()), set())
+        self.assertEqual(self._errors, [set([path])])
+        with open(path, 'wb') as f:
+            f.write(data.replace(b'struct Left', b'struct Left\xe2\x82\xac'))
+        self.assertTrue(u'diamond::left_types::public::Left\u20ac' in self._watcher.refresh(self._watcher.poll()))
+        self.assertEqual(len(self._errors), 1)
+
+    def test_watch(self):
+        stop = threading.Event()
+        thread = threading.Thread(target=self._parser.watch,
+                                  kwargs={'callback': self._changes.append, 'stop': stop})
+        thread.start()
+        try:
+            time.sleep(0.1)
+            self._write('right.idl', 'struct Right {', 'struct Right { long @1 n;')
+            deadline = time.time() + 5
+            while not self._changes and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            stop.set()
+            thread.join()
+        self.assertEqual(self._changes, [set(['diamond::right_types::public::Right'])])
+
+
+class SnapshotTestFunctions(unittest.TestCase):
+    def setUp(self):
+        self._root = tempfile.mkdtemp()
+        self._path = os.path.join(self._root, 'diamond.snap')
+
+    def tearDown(self):
+        shutil.rmtree(self._root)
+
+    def test_round_trip(self):
+        parser_ = parser.IDLParser(idl_dirs=[diamond_dir])
+        parser_.parse_idl(os.path.join(diamond_dir, 'top.idl'))
+        parser_.link()
+        m = parser_.global_module
+        m.save_snapshot(self._path)
+        loaded = channel.IDLChannel.load_snapshot(self._path)
+
+        self.assertEqual(len(loaded.symbols), len(m.symbols))
+        self.assertTrue(loaded.symbols.find('diamond::top_types::public::Top')[0].root_node is loaded)
+        for i in loaded.module_by_name('diamond').interfaces:
+            expected = m.module_by_name('diamond').interface_by_name(i.name)
+            for s, e in zip(i.public_by_name('public').structs, expected.public_by_name('public').structs):
+                self.assertEqual((s.full_path, str(s.position)), (e.full_path, str(e.position)))
+                for member in s.members:
+                    if not member.type.is_primitive:
+                        self.assertTrue(member.type.obj.root_node is loaded)
+                        self.assertEqual(member.type.obj.full_path,
+                                         e.member_by_name(member.name).type.obj.full_path)
+
+    def test_lazy(self):
+        parser_ = parser.IDLParser(idl_dirs=[diamond_dir])
+        parser_.parse_idl(os.path.join(diamond_dir, 'top.idl'))
+        parser_.link()
+        parser_.global_module.save_snapshot(self._path)
+        loaded = channel.IDLChannel.load_snapshot(self._path, lazy=True)
+
+        self.assertTrue(isinstance(loaded, channel.IDLChannel))
+        i = loaded.module_by_name('diamond').interface_by_name('top_types')
+        s = i.public_by_name('public').struct_by_name('Top')
+        self.assertEqual(s.full_path, 'diamond::top_types::public::Top')
+        self.assertEqual([m.type.obj.full_path for m in s.members],
+                         ['diamond::left_types::public::Left', 'diamond::right_types::public::Right'])
+        self.assertEqual(s.member_by_name('left').type.obj.member_by_name('base').type.obj.name, 'Base')
+        self.assertEqual(str(s.position), str(parser_.global_module.symbols.find('Top')[0].position))
+        self.assertEqual(len(loaded.symbols), 4)
+
+    def test_invalid(self):
+        with open(self._path, 'wb') as f:
+            f.write(b'not a snapshot')
+        self.assertRaises(exception.InvalidSnapshotError, channel.IDLChannel.load_snapshot, self._path)
+
+    def test_foreign_classes(self):
+        parser_ = parser.IDLParser(idl_dirs=[diamond_dir])
+        parser_.parse_idl(os.path.join(diamond_dir, 'top.idl'))
+        parser_.global_module.save_snapshot(self._path)
+        with open(self._path, 'rb') as f:
+            data = f.read()
+        self.assertTrue(b'idl_parser.module:IDLModule' in data)
+        # Class names of the same length, outside the package or not of a node.
+        for qualname in [b'multiprocessing:get_context', b'idl_parser.parser:IDLParser']:
+            with open(self._path, 'wb') as f:
+                f.write(data.replace(b'idl_parser.module:IDLModule', qualname))
+            for lazy in [False, True]:
+                self.assertRaises(exception.InvalidSnapshotError, channel.IDLChannel.load_snapshot,
+                                  self._path, lazy)
+
+
+lexer_text = (u'module m { // line comment\n'
+              u'  struct S { long @0 a; }; /* block\n'
+              u'  comment */\n'
+              u'#pragma x\n'
+              u'};\n'
+              u'#define A 1\n')
+
+
+class LexerTestFunctions(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def test_tokenize(self):
+        tokens = lexer.tokenize(lexer_text)
+        self.assertEqual(tokens, ['module', 'm', '{', 'struct', 'S', '{', 'long', '@0', 'a', ';', '}', ';',
+                                  '#pragma x', '}', ';', '#define A 1'])
+        self.assertEqual([lexer.kind(t) for t in ['#define A 1', '{', ';', 'struct', '@0']],
+                         [lexer.DIRECTIVE, lexer.PUNCT, lexer.PUNCT, lexer.WORD, lexer.WORD])
+
+        # Bytes-like sources give the same tokens, decoded.
+        self.assertEqual(lexer.tokenize(lexer_text.encode('utf-8')), tokens)
+        self.assertEqual(lexer.tokenize(bytearray(lexer_text.encode('utf-8'))), tokens)
+        self.assertEqual(lexer.tokenize(bytearray(u'struct Donn\xe9es;'.encode('utf-8'))),
+                         [u'struct', u'Donn\xe9es', u';'])
+        self.assertEqual(lexer.tokenize(bytearray(u'struct Donn\xe9es;'.encode('latin-1')), encoding='latin-1'),
+                         [u'struct', u'Donn\xe9es', u';'])
+
+    def test_offsets(self):
+        tokens = lexer.tokenize(lexer_text)
+        offsets = lexer.offsets(lexer_text)
+        self.assertEqual(len(offsets), len(tokens))
+        for t, offset in zip(tokens, offsets):
+            self.assertTrue(lexer_text.startswith(t, offset))
+        self.assertEqual(list(lexer.offsets(lexer_text.encode('utf-8'))), list(offsets))
+
+        # Byte offsets count the bytes of non-ASCII characters.
+        text = u'struct \xe9 a;'
+        self.assertEqual(list(lexer.offsets(text)), [0, 7, 9, 10])
+        self.assertEqual(list(lexer.offsets(text.encode('utf-8'))), [0, 7, 10, 11])
+
+    def test_line_starts(self):
+        self.assertEqual(lexer.line_starts(lexer_text), [0, 27, 63, 76, 86, 89, 101])
+        self.assertEqual(lexer.line_starts(lexer_text.encode('utf-8')), [0, 27, 63, 76, 86, 89, 101])
+        self.assertEqual(lexer.line_starts(u''), [0])
+        self.assertEqual(lexer.line_starts(u'a\n\nb'), [0, 2, 3])
+
+    def test_tokenize_lines(self):
+        texts = [lexer_text,
+                 u'/* a\n\n b */ module m /**/ { /* c */ };\n',
+                 u'struct S { /* one\n two */ long @0 a; /* three */ long @1 b; /*\n*/ };\n']
+        for text in texts:
+            self.assertEqual(list(lexer.tokenize_lines(text.splitlines(True))), lexer.tokenize(text))
+
+        # Repeated tokens share one string.
+        tokens = list(lexer.tokenize_lines(['long a;\n', 'long b;\n']))
+        self.assertTrue(tokens[0] is tokens[3])
+
+    def test_streaming_token_buffer(self):
+        segments = [(0, 1, 0), (3, 2, 5)]
+        tokens = lexer.tokenize(lexer_text)
+        buf = token_buffer.TokenBuffer(tokens=tokens, segments=segments)
+        streaming = token_buffer.StreamingTokenBuffer(lexer.tokenize_lines(lexer_text.splitlines(True)), segments)
+        self.assertEqual(streaming.location, None)
+        for t in tokens:
+            self.assertEqual(streaming.pop(), buf.pop())
+            self.assertEqual(streaming.location, buf.location)
+        self.assertEqual(streaming.location, source.SourceMap.location(2, 5 + len(tokens) - 4))
+        self.assertEqual(streaming.pop(), None)
+
+
+class SourceTestFunctions(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def test_streaming_non_ascii(self):
+        path = os.path.join(self._dir, 'utf8.idl')
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(u'module m { interface i { public: {\n'
+                    u'  /* \u2192 */ struct Donn\xe9es { long @0 \xe9t\xe9; };\n'
+                    u'}; }; };\n')
+        for streaming in [False, True]:
+            parser_ = parser.IDLParser(streaming=streaming)
+            parser_.parse_idl(path)
+            s = parser_.global_module.module_by_name('m').interface_by_name('i').public_by_name('public').structs[0]
+            self.assertEqual(s.name, u'Donn\xe9es')
+            self.assertEqual(s.members[0].name, u'\xe9t\xe9')
+            # Columns count bytes: the arrow takes three.
+            self.assertEqual(str(s.position), '%s:2:20' % path)
+
+    def test_open_mapped(self):
+        path = os.path.join(self._dir, 'empty.idl')
+        open(path, 'w').close()
+        with source.open_mapped(path) as buf:
+            self.assertEqual(buf, b'')
+            self.assertEqual(lexer.tokenize(buf), [])
+
+        path = os.path.join(self._dir, 'utf8.idl')
+        text = u'module m { /* \u2192 */ struct Donn\xe9es { long @0 \xe9t\xe9; }; };\n'
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        with source.open_mapped(path) as buf:
+            self.assertEqual(lexer.tokenize(buf), lexer.tokenize(text))
+            self.assertEqual(list(lexer.offsets(buf)), list(lexer.offsets(text.encode('utf-8'))))
+            self.assertEqual(len(buf), len(text.encode('utf-8')))
+        # The mapping is closed once out of the context.
+        self.assertRaises(ValueError, buf.read, 1)
+
+        parser_ = parser.IDLParser()
+        parser_.parse_idl(path)
+        self.assertEqual(parser_.global_module.module_by_name('m').name, 'm')
+
+    def test_source_map(self):
+        path = os.path.join(self._dir, 'a.idl')
+        with open(path, 'w') as f:
+            f.write('module a {\n  interface i { };\n};\n')
+        sources = source.SourceMap()
+        fileid = sources.add(path)
+        self.assertEqual(sources.add(path), fileid)
+        text_id = sources.add(text=u'module b {\n};\n')
+        self.assertNotEqual(text_id, fileid)
+        self.assertEqual(sources.add(text=u'module b {\n};\n'), text_id + 1)
+
+        location = sources.location(text_id, 3)
+        self.assertEqual(location >> 32, text_id)
+        self.assertEqual(location & 0xffffffff, 3)
+        self.assertEqual(sources.position(None), None)
+
+        p = sources.position(sources.location(fileid, 4))
+        self.assertEqual((p.filepath, p.fileid, p.offset, p.line, p.column), (path, fileid, 23, 2, 13))
+        self.assertEqual(str(p), '%s:2:13' % path)
+        self.assertEqual(str(sources.position(sources.location(fileid, 0))), '%s:1:1' % path)
+        self.assertEqual(str(sources.position(location)), '<string>:2:1')
+        # Ordinals past the last token resolve to the start of the last line.
+        self.assertEqual(str(sources.position(sources.location(fileid, 100))), '%s:4:1' % path)
+
+        # Offsets are computed again once the file changed.
+        with open(path, 'w') as f:
+            f.write('\n\nmodule a {\n};\n')
+        self.assertEqual(str(sources.position(sources.location(fileid, 0))), '%s:1:1' % path)
+        sources.file(fileid).invalidate()
+        self.assertEqual(str(sources.position(sources.location(fileid, 0))), '%s:3:1' % path)
+
+
+class SymbolTableTestFunctions(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def test_find_types(self):
+        parser_ = parser.IDLParser(idl_dirs=[diamond_dir])
+        parser_.parse_idl(os.path.join(diamond_dir, 'top.idl'))
+        m = parser_.global_module
+        base = m.find_types('Base')
+        self.assertEqual(len(base), 1)
+        self.assertTrue(base[0].is_struct)
+        self.assertEqual(base[0].full_path, 'diamond::base_types::public::Base')
+        self.assertEqual(m.find_types('diamond::base_types::public::Base'), base)
+
+        diamond = m.module_by_name('diamond')
+        self.assertEqual(diamond.find_types('Base'), base)
+        self.assertEqual(diamond.interface_by_name('left_types').find_types('Base'), [])
+        self.assertEqual(m.find_types('Unknown'), [])
+        self.assertEqual(len(m.symbols), 4)
+
+    def test_link(self):
+        parser_ = parser.IDLParser()
+        parser_.parse_text('module m { interface i { public: {\n' +
+                           'struct A { B @0 b; Unknown1 @1 u; };\n' +
+                           'struct B { sequence<A> @0 a; Unknown2 @1 u; };\n' +
+                           '}; }; };\n')
+        self.assertEqual(parser_.link(), ['Unknown1', 'Unknown2'])
+        section = parser_.global_module.module_by_name('m').interface_by_name('i').public_by_name('public')
+        a = section.struct_by_name('A')
+        b = section.struct_by_name('B')
+        self.assertTrue(a.member_by_name('b').type.obj is b)
+        self.assertTrue(b.member_by_name('a').type.inner_type.obj is a)
+        self.assertEqual(a.member_by_name('u').type.obj, None)
+
+    def test_shared_types(self):
+        m = parser.IDLParser().load('module m { interface i { public: {\n' +
+                                    'struct A { long @0 x; long @1 y; sequence<long> @2 s; };\n' +
+                                    'struct B { long @0 x; sequence<long> @1 s; sequence<A> @2 a; };\n' +
+                                    'typedef double D1[2];\n' +
+                                    'typedef double D2[2];\n' +
+                                    'long f @0 (in long p);\n' +
+                                    '}; }; };\n')
+        section = m.module_by_name('m').interface_by_name('i').public_by_name('public')
+        a = section.struct_by_name('A')
+        b = section.struct_by_name('B')
+        self.assertTrue(a.member_by_name('x').type is a.member_by_name('y').type)
+        self.assertTrue(a.member_by_name('x').type is b.member_by_name('x').type)
+        self.assertTrue(a.member_by_name('x').type is section.method_by_name('f').returns)
+        self.assertTrue(m.find_types('long')[0] is a.member_by_name('x').type)
+        self.assertTrue(a.member_by_name('s').type is b.member_by_name('s').type)
+        self.assertTrue(a.member_by_name('s').type.inner_type is a.member_by_name('x').type)
+        self.assertTrue(section.typedef_by_name('D1').type is section.typedef_by_name('D2').type)
+        self.assertTrue(section.typedef_by_name('D1').type.is_array)
+        self.assertTrue(b.member_by_name('a').type.inner_type.obj is a)
+        self.assertFalse(parser.IDLParser().load('').find_types('long')[0] is m.find_types('long')[0])
+
+
+class TypeTestFunctions(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def test_classify(self):
+        self.assertEqual(idl_type.classify('int32_t'), idl_type.PRIMITIVE)
+        self.assertEqual(idl_type.classify('unsigned long'), idl_type.FORBIDDEN)
+        self.assertEqual(idl_type.classify('sequence<long>'), idl_type.SEQUENCE)
+        self.assertEqual(idl_type.classify('long [3]'), idl_type.ARRAY)
+        self.assertEqual(idl_type.classify('void'), idl_type.VOID)
+        self.assertEqual(idl_type.classify('m::Time'), idl_type.BASIC)
+        self.assertTrue(idl_type.is_primitive('long'))
+        self.assertFalse(idl_type.is_primitive('Time'))
+        self.assertTrue(idl_type.is_forbidden('unsigned long'))
+        self.assertTrue('wstring' in idl_type.primitive_words)
+
+    def test_classify_memo_bounded(self):
+        for i in range(idl_type._memo_size + 10):
+            self.assertEqual(idl_type.classify('m::T%d' % i), idl_type.BASIC)
+        self.assertTrue(len(idl_type._classified) <= idl_type._memo_size)
+        self.assertTrue(len(idl_type._word_flags) <= idl_type._memo_size)
+        self.assertEqual(idl_type.classify('long'), idl_type.PRIMITIVE)
+
+
+class NodeTestFunctions(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def test_cached_paths(self):
+        m = parser.IDLParser().load('module a { module b { interface i { public: {\n' +
+                                    'struct S { long @0 x; };\n' +
+                                    '}; }; }; };\nmodule c { };\n')
+        a = m.module_by_name('a')
+        b = a.module_by_name('b')
+        s = m.find_types('S')[0]
+        self.assertEqual(s.full_path, 'a::b::i::public::S')
+        self.assertTrue(s.root_node is m)
+
+        b.parent = m.module_by_name('c')
+        self.assertEqual(s.full_path, 'c::b::i::public::S')
+        self.assertEqual(s.member_by_name('x').full_path, 'c::b::i::public::S::x')
+        self.assertTrue(s.root_node is m)
+
+    def test_name_index(self):
+        m = parser.IDLParser().load('module a { interface i { public: {\n' +
+                                    'struct B { long @0 x; };\n' +
+                                    'struct A { long @0 y; };\n' +
+                                    'struct B { double @0 z; };\n' +
+                                    'typedef sequence<A> ASeq;\n' +
+                                    'long f @0 (in long p, out double q);\n' +
+                                    '}; }; };\n')
+        section = m.module_by_name('a').interface_by_name('i').public_by_name('public')
+        self.assertEqual([s.name for s in section.structs], ['B', 'A'])
+        self.assertEqual(section.struct_by_name('B').member_by_name('x').name, 'x')
+        self.assertEqual(section.typedef_by_name('ASeq').name, 'ASeq')
+        self.assertEqual(section.method_by_name('f').argument_by_name('q').direction, 'out')
+        self.assertTrue(section.union_by_name('B') is None)
+
+    def test_name_index_mutations(self):
+        root = channel.IDLChannel()
+        a, b, c, b2 = [module.IDLModule(name, root) for name in ['a', 'b', 'c', 'b']]
+        nodes = node.IDLNodeList([a, b])
+        self.assertTrue(nodes.by_name('b') is b)
+        nodes.append(c)
+        self.assertTrue(nodes.by_name('c') is c)
+        nodes.insert(0, b2)
+        self.assertTrue(nodes.by_name('b') is b2)
+        nodes.remove(b2)
+        self.assertTrue(nodes.by_name('b') is b)
+        del nodes[1]
+        self.assertTrue(nodes.by_name('b') is None)
+        nodes[0] = b
+        self.assertEqual((nodes.by_name('a'), nodes.by_name('b')), (None, b))
+        nodes[1:] = [a]
+        self.assertEqual((nodes.by_name('a'), nodes.by_name('c')), (a, None))
+        nodes.extend([c])
+        nodes += [b2]
+        self.assertTrue(nodes.by_name('c') is c)
+        self.assertTrue(nodes.pop() is b2)
+        self.assertTrue(nodes.by_name('b') is b)
+        nodes.pop(0)
+        self.assertTrue(nodes.by_name('b') is None)
+        self.assertEqual([n.name for n in nodes], ['a', 'c'])
+
+    def test_name_index_pickle(self):
+        m = parser.IDLParser().load('module a { interface i { }; };\nmodule b { };\n')
+        self.assertTrue(m.module_by_name('b') is not None)
+        loaded = pickle.loads(pickle.dumps(m, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual([n.name for n in loaded.modules], ['a', 'b'])
+        self.assertTrue(loaded.module_by_name('b') is loaded.modules[1])
+        # A single node is unpickled with append(), several ones with extend().
+        self.assertEqual(loaded.module_by_name('a').interface_by_name('i').name, 'i')
+
+    def test_sections(self):
+        m = parser.IDLParser().load('module a { interface i {\n' +
+                                    'public: { struct P { long @0 x; }; long f @0 (in long p); };\n' +
+                                    'private: { struct Q { long @0 y; }; enum P { A, B }; const long C = 1; };\n' +
+                                    'protected: { union R { long @0 z; }; typedef sequence<P> S; };\n' +
+                                    'public: { struct T { long @0 w; }; };\n' +
+                                    '}; };\n')
+        i = m.module_by_name('a').interface_by_name('i')
+        self.assertEqual(len(i.publics), 1)
+        public = i.public_by_name('public')
+        self.assertEqual(public.visibility, 'public')
+        self.assertEqual(public.classname, 'IDLPublicInterfaceSection')
+        self.assertEqual(i.private_by_name('private').classname, 'IDLPrivateInterfaceSection')
+        self.assertEqual([s.name for s in public.structs], ['P', 'T'])
+        self.assertTrue(i.declaration_by_name('P') is public.struct_by_name('P'))
+        self.assertTrue(i.declaration_by_name('f') is public.method_by_name('f'))
+        self.assertTrue(i.declaration_by_name('C') is i.private_by_name('private').const_by_name('C'))
+        self.assertTrue(i.declaration_by_name('R').is_union)
+        self.assertTrue(i.declaration_by_name('S').is_typedef)
+        self.assertEqual(i.declaration_by_name('x'), None)
+
+    def test_keywords(self):
+        services = []
+        def parse_service(scope, token_buf, filepath):
+            services.append((scope.name, token_buf.pop()))
+            while token_buf.pop() != ';':
+                pass
+        module.IDLModule.register_keyword('service', parse_service)
+        try:
+            self.assertTrue('service' in module.IDLModule.keywords())
+            self.assertFalse('service' in channel.IDLChannel.keywords())
+            m = parser.IDLParser().load('module a { service S { x y z }; interface i { public: {\n' +
+                                        'struct T { long @0 w; };\n' +
+                                        '}; }; };\n')
+        finally:
+            module.IDLModule.unregister_keyword('service')
+        self.assertEqual(services, [('a', 'S')])
+        self.assertEqual(m.find_types('T')[0].full_path, 'a::i::public::T')
+        self.assertFalse('service' in module.IDLModule.keywords())
+
+    def test_base_keywords(self):
+        services = []
+        def parse_service(scope, token_buf, filepath):
+            services.append((scope.classname, token_buf.pop()))
+            while token_buf.pop() != ';':
+                pass
+        node.IDLScope.register_keyword('service', parse_service)
+        try:
+            for cls in [channel.IDLChannel, module.IDLModule]:
+                self.assertTrue('service' in cls.keywords())
+            parser.IDLParser().load('service A { };\nmodule a { service B { }; };\n')
+            # A keyword registered for a subclass takes precedence.
+            module.IDLModule.register_keyword('service', lambda scope, token_buf, filepath: None)
+            try:
+                parser.IDLParser().load('service C { };\nmodule a { service D { }; };\n')
+            finally:
+                module.IDLModule.unregister_keyword('service')
+            parser.IDLParser().load('module a { service E { }; };\n')
+        finally:
+            node.IDLScope.unregister_keyword('service')
+        self.assertEqual(services, [('IDLChannel', 'A'), ('IDLModule', 'B'), ('IDLChannel', 'C'), ('IDLModule', 'E')])
+        self.assertFalse('service' in module.IDLModule.keywords())
+
+    def test_slots(self):
+        m = parser.IDLParser().load('module a { interface i { public: {\n' +
+                                    'struct S { long @0 x; sequence<S> @1 y; double @2 z[4]; };\n' +
+                                    'enum E { A, B };\n' +
+                                    'const long C = 1;\n' +
+                                    'typedef S T;\n' +
+                                    'void f @0 (in T p);\n' +
+                                    '}; }; };\n')
+        section = m.module_by_name('a').interface_by_name('i').public_by_name('public')
+        s = section.struct_by_name('S')
+        nodes = [m, m.module_by_name('a'), section.parent, section, s, section.enums[0],
+                 section.enums[0].values[0], section.consts[0], section.typedefs[0],
+                 section.methods[0], section.methods[0].arguments[0]]
+        nodes = nodes + s.members + [v.type for v in s.members]
+        for n in nodes:
+            self.assertFalse(hasattr(n, '__dict__'), n.classname)
+        self.assertEqual(s.classname, 'IDLStruct')
+        self.assertEqual(s.member_by_name('y').type.classname, 'IDLSequence')
+        self.assertTrue(s.member_by_name('x').type.is_primitive)
+
+    def test_kinds(self):
+        parser_ = parser.IDLParser()
+        m = parser_.load('module a { interface i { public: {\n' +
+                         'struct S { long @0 x; sequence<long> @1 y; };\n' +
+                         'typedef double D[2];\n' +
+                         'typedef S T;\n' +
+                         'struct U { T @0 t; D @1 d; };\n' +
+                         '}; }; };\n')
+        section = m.module_by_name('a').interface_by_name('i').public_by_name('public')
+        s = section.struct_by_name('S')
+        self.assertEqual(s.kind, node.STRUCT)
+        self.assertTrue(s.is_struct)
+        self.assertFalse(s.is_union)
+        self.assertTrue(s.member_by_name('y').type.kind & node.TYPE)
+        self.assertFalse(s.kind & node.TYPE)
+
+        describe = node.Dispatcher({node.TYPE : lambda n: 'type',
+                                    node.DECLARATION : lambda n: 'declaration',
+                                    node.SEQUENCE : lambda n: 'sequence'})
+        self.assertEqual(describe(s), 'declaration')
+        self.assertEqual(describe(s.member_by_name('x').type), 'type')
+        self.assertEqual(describe(s.member_by_name('y').type), 'sequence')
+        self.assertEqual(describe(section), None)
+
+        self.assertEqual(parser_.generate_constructor_python(section.struct_by_name('U')),
+                         'a.i.public.U(a.i.public.S(0, []), [0, 0])')
+
+
+class PreprocessorTestFunctions(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def _structs(self, defines=None):
+        parser_ = parser.IDLParser()
+        m = parser_.load(open(preprocessor_idl_path, 'r').read(), defines=defines)
+        section = m.module_by_name('pp').interface_by_name('i').public_by_name('public')
+        return dict([(s.name, s) for s in section.structs])
+
+    def test_conditionals(self):
+        self.assertEqual(sorted(self._structs().keys()), ['B', 'G'])
+        structs = self._structs(defines=['FEATURE', 'EXTRA=2'])
+        self.assertEqual(sorted(structs.keys()), ['A', 'E', 'G'])
+        self.assertEqual(structs['A'].member_by_name('a').type.name, 'long')
+        self.assertEqual(structs['A'].member_by_name('b[3]').type.name, 'double')
+        self.assertEqual(structs['E'].member_by_name('e').type.name, 'sequence<long>')
+
+    def test_expressions(self):
+        macros = preprocessor.macros_from({'VERSION': 4, 'X': ''})
+        self.assertEqual(preprocessor.evaluate('defined(X) && VERSION > 3', macros), 1)
+        self.assertEqual(preprocessor.evaluate('defined Y || VERSION * 2 == 8', macros), 1)
+        self.assertEqual(preprocessor.evaluate('(1 << 4) | 0x1', macros), 17)
+        self.assertEqual(preprocessor.evaluate('-7 / 2', macros), -3)
+        self.assertEqual(preprocessor.evaluate('UNDEFINED ? 1 / UNDEFINED : 5', macros), 5)
+        self.assertRaises(exception.InvalidIDLSyntaxError, preprocessor.evaluate, '1 +', macros)
+        self.assertRaises(exception.InvalidIDLSyntaxError, preprocessor.evaluate, '1 << -1', macros)
+        self.assertRaises(exception.InvalidIDLSyntaxError, preprocessor.evaluate, '8 >> (0 - 2)', macros)
+        self.assertEqual(preprocessor.evaluate('0 && (1 << -1)', macros), 0)
+        try:
+            parser.IDLParser().load('module m {\n#if 1 >> -1\n#endif\n};\n')
+            self.fail('InvalidIDLSyntaxError not raised')
+        except exception.InvalidIDLSyntaxError as e:
+            self.assertEqual((e.position.line, e.position.column), (2, 1))
+
+    def test_undef_in_include(self):
+        d = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(d, 'inc.idl'), 'w') as f:
+                f.write('#undef FEATURE\n#define OTHER\n#undef OTHER\n#undef EXTRA\n#define EXTRA 3\n')
+            with open(os.path.join(d, 'main.idl'), 'w') as f:
+                f.write('#define FEATURE\n#define OTHER\n#include "inc.idl"\n'
+                        'module m { interface i { public: {\n'
+                        '#ifdef FEATURE\nstruct A { long @0 a; };\n#endif\n'
+                        '#ifdef OTHER\nstruct B { long @0 b; };\n#endif\n'
+                        '#if EXTRA == 3\nstruct C { long @0 c; };\n#endif\n'
+                        '}; }; };\n')
+            for kwargs in [{}, {'streaming': True}, {'cache_dir': os.path.join(d, 'cache')},
+                           {'cache_dir': os.path.join(d, 'cache')}]:
+                parser_ = parser.IDLParser(idl_dirs=[d], **kwargs)
+                parser_.parse(idls=[os.path.join(d, 'main.idl')], defines=['FEATURE'])
+                section = parser_.global_module.module_by_name('m').interface_by_name('i').public_by_name('public')
+                self.assertEqual([s.name for s in section.structs], ['C'])
+        finally:
+            shutil.rmtree(d)
+
+    def test_includer_macros(self):
+        d = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(d, 'inc.idl'), 'w') as f:
+                f.write('#ifdef USE_X\n#define INC_X\nmodule x { };\n#else\nmodule y { };\n#endif\n')
+            for name, text in [('main_x.idl', '#define USE_X\n#include "inc.idl"\n'),
+                               ('main_y.idl', '#include "inc.idl"\n')]:
+                with open(os.path.join(d, name), 'w') as f:
+                    f.write(text + 'module m { interface %s { public: {\n' % name[:-4] +
+                            '#ifdef INC_X\nstruct A { long @0 a; };\n#endif\n'
+                            '#ifdef USE_X\nstruct B { long @0 b; };\n#endif\n'
+                            '}; }; };\n')
+            cache_dir = os.path.join(d, 'cache')
+            for kwargs in [{}, {'streaming': True}, {'cache_dir': cache_dir}, {'cache_dir': cache_dir}]:
+                # The header is parsed with the macros of its first includer ...
+                for name, modules in [('main_x.idl', ['x']), ('main_y.idl', ['y'])]:
+                    parser_ = parser.IDLParser(idl_dirs=[d], **kwargs)
+                    parser_.parse_idl(os.path.join(d, name))
+                    m = parser_.global_module
+                    self.assertEqual(sorted([n.name for n in m.modules]), sorted(['m'] + modules))
+                # ... and only passes on the ones it defines.
+                parser_ = parser.IDLParser(idl_dirs=[d], **kwargs)
+                parser_.parse_idl(os.path.join(d, 'main_x.idl'))
+                parser_.parse_idl(os.path.join(d, 'main_y.idl'))
+                m = parser_.global_module.module_by_name('m')
+                self.assertEqual([[s.name for s in i.public_by_name('public').structs] for i in m.interfaces],
+                                 [['A', 'B'], ['A']])
+        finally:
+            shutil.rmtree(d)
+
+    def test_include_in_inactive_block(self):
+        d = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(d, 'extra.idl'), 'w') as f:
+                f.write('#define EXTRA\nmodule extra { interface x { public: { struct X { long @0 x; }; }; }; };\n')
+            with open(os.path.join(d, 'main.idl'), 'w') as f:
+                f.write('#ifdef NOPE\n#include "missing.idl"\n#endif\n'
+                        '#if defined(USE_EXTRA)\n#include "extra.idl"\n#elif 0\n#include "missing.idl"\n'
+                        '#else\n#define NO_EXTRA\n#endif\n'
+                        'module m { interface i { public: {\n'
+                        '#ifdef EXTRA\nstruct A { long @0 a; };\n#endif\n'
+                        '#ifdef NO_EXTRA\nstruct B { long @0 b; };\n#endif\n'
+                        '}; }; };\n')
+            for kwargs in [{}, {'streaming': True}, {'cache_dir': os.path.join(d, 'cache')}]:
+                for defines, structs in [(None, ['B']), (['USE_EXTRA'], ['A'])]:
+                    parser_ = parser.IDLParser(idl_dirs=[d], **kwargs)
+                    parser_.defines.update(preprocessor.macros_from(defines))
+                    parser_.parse_idl(os.path.join(d, 'main.idl'))
+                    m = parser_.global_module
+                    section = m.module_by_name('m').interface_by_name('i').public_by_name('public')
+                    self.assertEqual([s.name for s in section.structs], structs)
+                    self.assertEqual(m.module_by_name('extra') is not None, defines is not None)
+                    self.assertEqual(len(parser_.include_graph[os.path.realpath(os.path.join(d, 'main.idl'))]),
+                                     0 if defines is None else 1)
+        finally:
+            shutil.rmtree(d)
+
+
+class ThreadTestFunctions(unittest.TestCase):
+    def setUp(self):
+        self._root = tempfile.mkdtemp()
+        self._dirs = []
+        # Every set uses the same file names, so that parsers sharing any
+        # state would mix up their includes, macros or declarations.
+        for i in range(16):
+            d = os.path.join(self._root, 'set%d' % i)
+            os.mkdir(d)
+            with open(os.path.join(d, 'common.idl'), 'w') as f:
+                f.write('#ifndef COMMON_IDL\n#define COMMON_IDL\n#define SET%d\n' % i +
+                        'module m { interface common { public: { struct Common%d { long @0 a; }; }; }; };\n' % i +
+                        '#endif\n')
+            with open(os.path.join(d, 'main.idl'), 'w') as f:
+                f.write('#include "common.idl"\n' +
+                        'module m { interface main { public: {\n' +
+                        '#ifdef SET%d\n struct Main%d { Common%d @0 c; };\n#endif\n' % (i, i, i) +
+                        '}; }; };\n')
+            self._dirs.append(d)
+
+    def tearDown(self):
+        shutil.rmtree(self._root)
+
+    def _parse(self, index, streaming):
+        parser_ = parser.IDLParser(streaming=streaming)
+        parser_.parse(idl_dirs=[self._dirs[index]])
+        m = parser_.global_module.module_by_name('m')
+        names = []
+        for name in ['common', 'main']:
+            section = m.interface_by_name(name).public_by_name('public')
+            names = names + [s.name for s in section.structs]
+        return names
+
+    @unittest.skipIf(ThreadPoolExecutor is None, 'concurrent.futures is not available')
+    def test_concurrent_parsers(self):
+        tasks = [(i % len(self._dirs), i % 2 == 1) for i in range(128)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda t: self._parse(*t), tasks))
+        for (index, streaming), names in zip(tasks, results):
+            self.assertEqual(names, ['Common%d' % index, 'Main%d' % index])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTests(unittest.makeSuite(IncludeTestFunctions))
+    suite.addTests(unittest.makeSuite(CacheTestFunctions))
+    suite.addTests(unittest.makeSuite(UpdateTestFunctions))
+    suite.addTests(unittest.makeSuite(WatchTestFunctions))
+    suite.addTests(unittest.makeSuite(SnapshotTestFunctions))
+    suite.addTests(unittest.makeSuite(LexerTestFunctions))
+    suite.addTests(unittest.makeSuite(SourceTestFunctions))
+    suite.addTests(unittest.makeSuite(SymbolTableTestFunctions))
+    suite.addTests(unittest.makeSuite(TypeTestFunctions))
+    suite.addTests(unittest.makeSuite(NodeTestFunctions))
+    suite.addTests(unittest.makeSuite(PreprocessorTestFunctions))
+    suite.addTests(unittest.makeSuite(ThreadTestFunctions))
+    return suite